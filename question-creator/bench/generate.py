@@ -0,0 +1,91 @@
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "creator"))
+
+from data import Answer, Category, Question
+from inout import iter_gift_parts
+
+WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit", "sed", "do", "eiusmod",
+         "tempor", "incididunt", "ut", "labore", "et", "dolore", "magna", "aliqua", "Übung", "Frage", "Antwort")
+TAGS = ("b", "i", "code", "p")
+SPECIAL_CHARS = "~=#{}:\\\n"
+
+
+def random_text(rng: random.Random, length: int, special_density: float, html: bool) -> str:
+    # words (optionally wrapped in HTML tags) until the length is reached, where each word
+    # is followed by a special GIFT character with the given probability
+    parts = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        if html and rng.random() < 0.1:
+            tag = rng.choice(TAGS)
+            word = f"<{tag}>{word}</{tag}>"
+        if rng.random() < special_density:
+            word += rng.choice(SPECIAL_CHARS)
+        parts.append(word)
+        size += len(word) + 1
+    return " ".join(parts)
+
+
+def generate_questions(n: int, min_answers: int = 2, max_answers: int = 6, multi_ratio: float = 0.5,
+                       special_density: float = 0.05, n_categories: int = 20, category_switch: float = 0.1,
+                       text_length: int = 200, seed: int = 0) -> list[Question]:
+    # deterministic (for the same arguments) list of questions; the category changes with the
+    # given probability between two questions, so there are runs of questions of the same
+    # category, as is usually the case in actual files
+    rng = random.Random(seed)
+    categories = [Category(f"bench/category {i}") for i in range(n_categories)]
+    category = rng.choice(categories)
+    questions = []
+    for i in range(n):
+        if rng.random() < category_switch:
+            category = rng.choice(categories)
+        n_answers = rng.randint(min_answers, max_answers)
+        if rng.random() < multi_ratio:
+            mode = Question.MODE_MULTI
+            correct = set(rng.sample(range(n_answers), rng.randint(1, max(1, n_answers - 1))))
+        else:
+            mode = Question.MODE_SINGLE
+            correct = {rng.randrange(n_answers)}
+        text = random_text(rng, rng.randint(text_length // 2, text_length * 3 // 2), special_density, html=True)
+        answers = [Answer(random_text(rng, rng.randint(5, 40), special_density, html=False), j in correct)
+                   for j in range(n_answers)]
+        title = f"Question {i + 1}" if rng.random() < 0.5 else ""
+        questions.append(Question(category=category, title=title, text=text, answers=answers, mode=mode))
+    return questions
+
+
+def generate_gift(n: int, **kwargs) -> str:
+    return "".join(iter_gift_parts(generate_questions(n, **kwargs)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic GIFT file.")
+    parser.add_argument("file", type=str, help="File to write the questions to.")
+    parser.add_argument("-n", type=int, default=10_000, help="Number of questions.")
+    parser.add_argument("--min-answers", type=int, default=2, help="Minimum number of answers per question.")
+    parser.add_argument("--max-answers", type=int, default=6, help="Maximum number of answers per question.")
+    parser.add_argument("--multi-ratio", type=float, default=0.5, help="Fraction of questions with mode 'multi'.")
+    parser.add_argument("--special-density", type=float, default=0.05, help="Probability of a special GIFT "
+                                                                            "character after a word.")
+    parser.add_argument("--categories", type=int, default=20, help="Number of categories.")
+    parser.add_argument("--category-switch", type=float, default=0.1, help="Probability of a category change "
+                                                                           "between two questions.")
+    parser.add_argument("--text-length", type=int, default=200, help="Average length of the question texts.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random number generator.")
+    args = parser.parse_args()
+    
+    gift = generate_gift(args.n, min_answers=args.min_answers, max_answers=args.max_answers,
+                         multi_ratio=args.multi_ratio, special_density=args.special_density,
+                         n_categories=args.categories, category_switch=args.category_switch,
+                         text_length=args.text_length, seed=args.seed)
+    with open(args.file, "w", encoding="utf8") as f:
+        f.write(gift)
+
+
+if __name__ == "__main__":
+    main()
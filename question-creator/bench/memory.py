@@ -0,0 +1,66 @@
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "creator"))
+
+from data import Answer, Category, Question
+
+
+# plain (dict-backed) classes with the same attributes as the data model, which are used as
+# reference; a new category object is created for each question, as is the case whenever
+# questions are edited in the GUI
+class DictCategory:
+    
+    def __init__(self, name):
+        self.name = name
+
+
+class DictAnswer:
+    
+    def __init__(self, text, correct):
+        self.text = text
+        self.correct = correct
+
+
+class DictQuestion:
+    
+    def __init__(self, category, title, text, answers, mode):
+        self.category = category
+        self.title = title
+        self.text = text
+        self.answers = answers
+        self.mode = mode
+
+
+def create_bank(n: int, category_cls, answer_cls, question_cls, n_categories: int = 20, n_answers: int = 4):
+    # the strings are created beforehand and shared by both variants, so only the memory
+    # of the data model itself is measured
+    category_names = [f"category {i}" for i in range(n_categories)]
+    texts = [f"question {i}" for i in range(n)]
+    answer_texts = [f"answer {i}" for i in range(n_answers)]
+    tracemalloc.start()
+    bank = [question_cls(category_cls(category_names[i % n_categories]), "", texts[i],
+                         [answer_cls(answer_texts[j], j == 0) for j in range(n_answers)], Question.MODE_SINGLE)
+            for i in range(n)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return bank, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=100_000, help="Number of questions.")
+    args = parser.parse_args()
+    
+    _, dict_size = create_bank(args.n, DictCategory, DictAnswer, DictQuestion)
+    _, slots_size = create_bank(args.n, Category, Answer, Question)
+    print(f"{args.n} questions")
+    print(f"dict-backed model:  {dict_size / args.n:7.1f} bytes/question")
+    print(f"current data model: {slots_size / args.n:7.1f} bytes/question "
+          f"({100 * (1 - slots_size / dict_size):.1f}% less)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "creator"))
+
+from data import Question, handle_special_gift_chars
+from generate import generate_gift
+from inout import iter_blocks, parse_gift, read_gift, write_gift
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def create_benchmarks(file: str, gift: str) -> dict[str, tuple[Callable[[], None], Callable[[], None], int]]:
+    # name -> (setup, benchmark, number of processed items), where only the benchmark itself
+    # is measured; the setup is called before each run (e.g., to reset cached results)
+    questions = list(parse_gift(io.StringIO(gift)))
+    blocks = [block for _, block in iter_blocks(io.StringIO(gift)) if not block.startswith("$CATEGORY:")]
+    answer_blocks = [a for block in blocks for a in Question._tokenize(block)[2]]
+    texts = [q.text for q in questions] + [a.text for q in questions for a in q.answers]
+    escaped_texts = [handle_special_gift_chars(t, escape=True) for t in texts]
+    pristine = list(parse_gift(io.StringIO(gift)))  # never changed, so they are written as their source
+    out_file = file + ".out"
+    
+    def reset_cache():
+        for q in questions:
+            q._changed()
+    
+    def no_setup():
+        pass
+    
+    return {
+        "read_gift": (no_setup, lambda: read_gift(file), len(questions)),
+        "Question.from_str": (no_setup, lambda: [Question.from_str(b) for b in blocks], len(blocks)),
+        "Question._extract_mode_and_answer": (no_setup, lambda: [Question._extract_mode_and_answer(a)
+                                                                 for a in answer_blocks], len(answer_blocks)),
+        "handle_special_gift_chars (escape)": (no_setup, lambda: [handle_special_gift_chars(t, escape=True)
+                                                                  for t in texts], len(texts)),
+        "handle_special_gift_chars (extract)": (no_setup, lambda: [handle_special_gift_chars(t, escape=False)
+                                                                   for t in escaped_texts], len(texts)),
+        "Question.to_gift_format": (reset_cache, lambda: [q.to_gift_format() for q in questions], len(questions)),
+        "write_gift": (reset_cache, lambda: write_gift(out_file, questions), len(questions)),
+        "write_gift (verbatim)": (no_setup, lambda: write_gift(out_file, pristine), len(pristine)),
+    }
+
+
+def measure(setup: Callable[[], None], benchmark: Callable[[], None], repeat: int) -> tuple[float, int]:
+    # returns the best time of all runs (the least disturbed one) and the peak memory, which is
+    # measured in a separate run, since tracing the allocations slows down the benchmark
+    best = float("inf")
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        benchmark()
+        best = min(best, time.perf_counter() - start)
+    setup()
+    tracemalloc.start()
+    benchmark()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    # returns all regressions, i.e., throughput decreased or peak memory increased by more
+    # than the threshold (percentage) compared to the baseline
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        if result["throughput"] < base["throughput"] * (1 - threshold / 100):
+            regressions.append(f"{name}: throughput {result['throughput']:,.0f}/s "
+                               f"(baseline: {base['throughput']:,.0f}/s)")
+        if result["peak_bytes"] > base["peak_bytes"] * (1 + threshold / 100):
+            regressions.append(f"{name}: peak memory {result['peak_bytes'] / 2 ** 20:.1f} MiB "
+                               f"(baseline: {base['peak_bytes'] / 2 ** 20:.1f} MiB)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the hot paths of parsing and writing GIFT files based "
+                                                 "on a synthetic file (see generate.py).")
+    parser.add_argument("-n", type=int, default=10_000, help="Number of questions.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Number of runs per benchmark (best is used).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated file.")
+    parser.add_argument("--special-density", type=float, default=0.05, help="Probability of a special GIFT "
+                                                                            "character after a word.")
+    parser.add_argument("--text-length", type=int, default=200, help="Average length of the question texts.")
+    parser.add_argument("-b", "--baseline", type=str, default=DEFAULT_BASELINE, help="Baseline file (JSON).")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as new baseline.")
+    parser.add_argument("-t", "--threshold", type=float, default=20.0, help="Maximum regression (in percent) "
+                                                                             "compared to the baseline.")
+    args = parser.parse_args()
+    
+    config = {"n": args.n, "seed": args.seed, "special_density": args.special_density,
+              "text_length": args.text_length}
+    gift = generate_gift(args.n, special_density=args.special_density, text_length=args.text_length,
+                         seed=args.seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        file = os.path.join(directory, "bench.txt")
+        with open(file, "w", encoding="utf8") as f:
+            f.write(gift)
+        for name, (setup, benchmark, n_items) in create_benchmarks(file, gift).items():
+            seconds, peak = measure(setup, benchmark, args.repeat)
+            results[name] = {"items": n_items, "seconds": seconds, "throughput": n_items / seconds,
+                             "peak_bytes": peak}
+            print(f"{name:<38} {n_items:>8} items {seconds * 1000:>9.1f} ms {n_items / seconds:>12,.0f}/s "
+                  f"{peak / 2 ** 20:>8.1f} MiB")
+    
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf8") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+        print(f"baseline stored in '{args.baseline}'")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"no baseline found ('{args.baseline}'), use --save-baseline to create one")
+        return
+    with open(args.baseline, encoding="utf8") as f:
+        baseline = json.load(f)
+    if baseline["config"] != config:
+        print(f"baseline was created with a different configuration ({baseline['config']}), skipping comparison")
+        return
+    regressions = compare(results, baseline["results"], args.threshold)
+    if regressions:
+        print(f"regressions (more than {args.threshold}%):")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"no regressions (more than {args.threshold}%)")
+
+
+if __name__ == "__main__":
+    main()
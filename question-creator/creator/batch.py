@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import inout
+import instrumentation
+from cache import ParseCache
+
+
+class BatchSummary:
+    
+    def __init__(self, results: list[tuple[str, int, Optional[str]]], seconds: float):
+        self.results = results
+        self.seconds = seconds
+        self.n_files = len(results)
+        self.n_questions = sum(n for _, n, _ in results)
+        self.errors = [(file, error) for file, _, error in results if error is not None]
+    
+    def __str__(self):
+        seconds = max(self.seconds, 1e-9)
+        lines = [f"Error in '{file}':\n{error}\n" for file, error in self.errors]
+        lines.append(f"{self.n_files} files ({len(self.errors)} with errors), {self.n_questions} questions "
+                     f"in {self.seconds:.2f}s ({self.n_files / seconds:.1f} files/s, "
+                     f"{self.n_questions / seconds:.1f} questions/s)")
+        return "\n".join(lines)
+
+
+def find_files(directory, pattern: str = "*.txt") -> list[str]:
+    return sorted(str(p) for p in Path(directory).rglob(pattern) if p.is_file())
+
+
+def process_file(file, out_file=None, encoding="utf8", use_cache: bool = False) -> tuple[str, int, Optional[str]]:
+    # only validates the file if there is no output file, otherwise, the file is also written
+    # again (normalization); returns the file, the number of questions and the error (if any)
+    try:
+        if use_cache:
+            questions = ParseCache().read_gift(file, encoding)
+            n_questions = len(questions)
+        elif out_file is None:
+            n_questions = sum(1 for _ in inout.iter_gift(file, encoding))
+        else:
+            questions = inout.read_gift(file, encoding)
+            n_questions = len(questions)
+        if out_file is not None:
+            os.makedirs(os.path.dirname(out_file) or ".", exist_ok=True)
+            inout.write_gift(out_file, questions, encoding, verbatim=False)
+    except (ValueError, OSError, UnicodeDecodeError) as e:
+        return file, 0, str(e)
+    return file, n_questions, None
+
+
+def _process_file_instrumented(*args) -> tuple[tuple[str, int, Optional[str]], tuple[dict, dict]]:
+    # worker processes pass their timings and counters on to the main process (see run_batch);
+    # they start from scratch for each file, since the results of each file are merged separately
+    instrumentation.reset()
+    return process_file(*args), instrumentation.snapshot()
+
+
+def run_batch(directory, out_dir=None, jobs: int = None, pattern: str = "*.txt", encoding="utf8",
+              use_cache: bool = False, mp_context: multiprocessing.context.BaseContext = None) -> BatchSummary:
+    # each file is processed by one of the worker processes (started with the default start
+    # method unless "mp_context" is given); the output files (if any) keep their paths relative
+    # to the input directory
+    files = find_files(directory, pattern)
+    if out_dir is None:
+        out_files = [None] * len(files)
+    else:
+        out_files = [os.path.join(out_dir, os.path.relpath(f, directory)) for f in files]
+    jobs = jobs or os.cpu_count() or 1
+    start = time.perf_counter()
+    # the instrumentation is enabled in the workers as well, independent of the start method
+    initializer = instrumentation.init_worker if instrumentation.enabled else None
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=mp_context, initializer=initializer) as executor:
+        # several files per task to reduce the communication overhead for many small files
+        chunksize = max(1, len(files) // (jobs * 4))
+        args = (files, out_files, [encoding] * len(files), [use_cache] * len(files))
+        if instrumentation.enabled:
+            results = []
+            for result, (timings, counters) in executor.map(_process_file_instrumented, *args, chunksize=chunksize):
+                results.append(result)
+                instrumentation.merge(timings, counters)
+        else:
+            results = list(executor.map(process_file, *args, chunksize=chunksize))
+    return BatchSummary(results, time.perf_counter() - start)
@@ -0,0 +1,137 @@
+import gc
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+import zlib
+from typing import Optional
+
+import inout
+import instrumentation
+from data import Answer, Category, Question, QuestionBank
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "question-creator")
+
+
+class ParseCache:
+    # must be increased whenever the parsing or the stored format changes, so that
+    # entries created by an older version are never used
+    VERSION = 2
+    
+    def __init__(self, directory=None, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = default_cache_dir() if directory is None else directory
+        self.max_bytes = max_bytes
+    
+    @instrumentation.timed("ParseCache.read_gift")
+    def read_gift(self, file, encoding="utf8") -> QuestionBank:
+        # the cheap key (path + size + modification time) is checked first; it only points to
+        # the actual entry, which is keyed by the content hash, so files with the same content
+        # (e.g., copies or files which were touched without changes) share one entry
+        stat = os.stat(file)
+        path_key = self._hash(f"{os.path.abspath(file)}\0{stat.st_size}\0{stat.st_mtime_ns}\0{encoding}")
+        content_key = self._load(f"k-{path_key}")
+        if content_key is not None:
+            questions = self._load_questions(content_key)
+            if questions is not None:
+                return questions
+        with open(file, "rb") as f:
+            content = f.read()
+        content_key = self._hash(encoding, content)
+        questions = self._load_questions(content_key)
+        if questions is None:
+            questions = QuestionBank(inout.parse_gift(io.TextIOWrapper(io.BytesIO(content), encoding=encoding)))
+            self._store(f"c-{content_key}", [(None if q.category is None else q.category.name, q.title, q.text,
+                                              q.mode, [(a.text, a.correct) for a in q.answers], q.source)
+                                             for q in questions])
+        self._store(f"k-{path_key}", content_key)
+        self._evict()
+        return questions
+    
+    def clear(self):
+        for entry in self._entries():
+            self._remove(entry.path)
+    
+    def _load_questions(self, content_key: str) -> Optional[QuestionBank]:
+        # creating lots of objects at once repeatedly triggers the cyclic garbage collector,
+        # which is pointless here (nothing can be collected) but dominates the loading time
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            data = self._load(f"c-{content_key}")
+            if data is None:
+                return None
+            return QuestionBank(Question(category=None if category_name is None else Category(category_name),
+                                         title=title, text=text, answers=[Answer(*a) for a in answers], mode=mode,
+                                         source=source)
+                                for category_name, title, text, mode, answers, source in data)
+        finally:
+            if gc_enabled:
+                gc.enable()
+    
+    @staticmethod
+    def _hash(*parts):
+        h = hashlib.sha256(str(ParseCache.VERSION).encode())
+        for part in parts:
+            h.update(part if isinstance(part, bytes) else part.encode())
+        return h.hexdigest()
+    
+    def _load(self, name: str):
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                data = pickle.loads(zlib.decompress(f.read()))
+            # mark the entry as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, TypeError, zlib.error, pickle.UnpicklingError):
+            # a corrupt entry is just treated like a missing one
+            self._remove(path)
+            return None
+        return data
+    
+    def _store(self, name: str, data):
+        # the cache is only an optimization, so any error is ignored; entries are written
+        # to a temporary file first, so readers never see partially written entries
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix="tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL), 1))
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except OSError:
+            pass
+    
+    def _entries(self) -> list[os.DirEntry]:
+        try:
+            return [e for e in os.scandir(self.directory) if e.is_file()]
+        except OSError:
+            return []
+    
+    def _evict(self):
+        # least recently used entries (oldest modification time, see _load) are removed
+        # until the total size of the cache is within the limit again
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+    
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,5 +1,11 @@
+import bisect
+import heapq
 import re
-from typing import Optional
+import weakref
+from collections.abc import MutableSequence, Sequence
+from typing import Iterable, Iterator, Optional
+
+import instrumentation
 
 
 class Category:
@@ -7,8 +13,23 @@ class Category:
     MODULE_PATTERN = "$CATEGORY: $module$/top/"  # expected format: "$CATEGORY: $module$/top/<category name>"
     PATTERNS = [COURSE_PATTERN, MODULE_PATTERN]
     
-    def __init__(self, name: str):
-        self.name = name
+    __slots__ = ("_name", "__weakref__")
+    
+    # categories are interned, i.e., there is only a single category object per name (as
+    # long as it is used anywhere), which is returned whenever a category is created
+    _instances: "weakref.WeakValueDictionary[str, Category]" = weakref.WeakValueDictionary()
+    
+    def __new__(cls, name: str):
+        category = cls._instances.get(name)
+        if category is None:
+            category = super().__new__(cls)
+            category._name = name
+            cls._instances[name] = category
+        return category
+    
+    @property
+    def name(self) -> str:
+        return self._name
     
     @staticmethod
     def extract_category_pattern(s: str) -> Optional[str]:
@@ -36,16 +57,51 @@ class Category:
         return self.name
     
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, Category):
             return self.name == other.name
         return NotImplemented
+    
+    def __hash__(self):
+        return hash(self._name)
+    
+    def __reduce__(self):
+        # unpickling must go through __new__ as well (interning)
+        return Category, (self._name,)
 
 
 class Answer:
+    __slots__ = ("_question", "_text", "_correct")
     
     def __init__(self, text: str, correct: bool):
-        self.text = text
-        self.correct = correct
+        self._question = None  # the question this answer belongs to (which is notified about changes)
+        self._text = text
+        self._correct = correct
+    
+    @property
+    def text(self) -> str:
+        return self._text
+    
+    @text.setter
+    def text(self, text: str):
+        if text != self._text:
+            self._text = text
+            self._changed()
+    
+    @property
+    def correct(self) -> bool:
+        return self._correct
+    
+    @correct.setter
+    def correct(self, correct: bool):
+        if correct != self._correct:
+            self._correct = correct
+            self._changed()
+    
+    def _changed(self):
+        if self._question is not None:
+            self._question._changed()
     
     def to_gift_format(self):
         return escape_special_gift_chars(self.text)
@@ -64,108 +120,250 @@ class Question:
     MODE_MULTI = "multi"
     MODES = (MODE_SINGLE, MODE_MULTI)
     
+    # weak references are used by QuestionStore to find questions which are still in use
+    __slots__ = ("_gift", "_source", "_category", "_title", "_text", "_answers", "_mode", "__weakref__")
+    
     def __init__(self, category: Category = None, title: str = "", text: str = "",
-                 answers: list[Answer] = None, mode: str = ""):
-        # TODO: convert to properties to integrate checks also when attributes are set afterwards
-        if not answers:
-            raise ValueError(f"At least one answer must be provided.\n\n{title}\n\n{text}")
-        if not text:
-            raise ValueError(f"Main question text must not be empty.\n\n{title}\n\n" +
-                             "\n".join(str(a) for a in answers))
-        if mode == Question.MODE_SINGLE and len([a for a in answers if a.correct]) != 1:
-            raise ValueError(f"Exactly one answer must be set as correct if mode is '{mode}'." +
-                             f"\n\n{title}\n\n{text}\n\n" + "\n".join(str(a) for a in answers))
-        self.category = category
-        self.title = title
-        self.text = text
-        self.answers = answers
-        self.mode = mode
+                 answers: list[Answer] = None, mode: str = "", validate: bool = True, source: str = None):
+        # cached result of to_gift_format, which is reset whenever any attribute (including
+        # the answers) changes, so only changed questions must be converted again
+        self._gift = None
+        self._source = None
+        self._category = category
+        self._title = title
+        self._text = text
+        self._answers = ()
+        self._mode = mode
+        self.answers = answers or ()
+        # TODO: integrate checks into the property setters to also check attributes that are set afterwards
+        if validate:
+            problems = check_question(self)
+            if problems:
+                raise ValueError("\n".join(message for _, message in problems) + f"\n\n{self}")
+        # set last, since assigning the answers above counts as change
+        self._source = source
+    
+    @property
+    def category(self) -> Optional[Category]:
+        return self._category
+    
+    @category.setter
+    def category(self, category: Optional[Category]):
+        # the category is not part of the GIFT format of the question itself (it is written as
+        # separate block, see inout.iter_gift_parts), so the question stays pristine
+        self._category = category
+    
+    @property
+    def title(self) -> str:
+        return self._title
+    
+    @title.setter
+    def title(self, title: str):
+        if title != self._title:
+            self._title = title
+            self._changed()
+    
+    @property
+    def text(self) -> str:
+        return self._text
+    
+    @text.setter
+    def text(self, text: str):
+        if text != self._text:
+            self._text = text
+            self._changed()
+    
+    # the answers are stored as tuple, so they cannot be changed in-place without notice; to
+    # add or remove answers, a new sequence of answers must be assigned
+    @property
+    def answers(self) -> tuple[Answer, ...]:
+        return self._answers
+    
+    @answers.setter
+    def answers(self, answers: list[Answer]):
+        answers = tuple(answers)
+        # equal answers are not replaced, so the cached GIFT format remains valid
+        if len(answers) == len(self._answers) and all([a1 == a2 for a1, a2 in zip(self._answers, answers)]):
+            return
+        for a in self._answers:
+            a._question = None
+        for a in answers:
+            a._question = self
+        self._answers = answers
+        self._changed()
+    
+    @property
+    def mode(self) -> str:
+        return self._mode
+    
+    @mode.setter
+    def mode(self, mode: str):
+        if mode != self._mode:
+            self._mode = mode
+            self._changed()
+    
+    # the original GIFT block (without trailing newlines) the question was parsed from, as long as
+    # the question is pristine, i.e., it was not changed since then; pristine questions are written
+    # exactly as they were read (see inout.iter_gift_parts), so unchanged questions keep their
+    # formatting and saving does not have to convert them
+    @property
+    def source(self) -> Optional[str]:
+        return self._source
+    
+    @property
+    def pristine(self) -> bool:
+        return self._source is not None
+    
+    def _changed(self):
+        self._gift = None
+        self._source = None
+    
+    def copy(self) -> "Question":
+        # copy including the cached GIFT format and the source; the answers are copied as well,
+        # since they notify their question about changes (see Answer._changed)
+        question = Question.__new__(Question)
+        question._gift = self._gift
+        question._source = self._source
+        question._category = self._category
+        question._title = self._title
+        question._text = self._text
+        question._answers = tuple(Answer(a.text, a.correct) for a in self._answers)
+        for a in question._answers:
+            a._question = question
+        question._mode = self._mode
+        return question
     
     @staticmethod
-    def from_str(s: str) -> "Question":
-        # ensure that the question contains opening and closing braces
-        open_brace = re.search(r"(?<!\\){", s)
-        close_brace = re.search(r"(?<!\\)}", s)
-        if not open_brace or not close_brace:
-            raise ValueError("Invalid GIFT question format (must include '{' and '}').\n\n" +
-                             f"Question text block:\n{s}")
-        
-        # title handling
-        match = re.search("::.+::", s)
-        title = match.group() if match else ""
-        if title:
-            # skip the (optional) title so only the main question remains
-            s = s.split(title, maxsplit=1)[1]
-            # remove the double colons in ::<title>::
-            title = title[2:-2]
-        
-        # processing of optional [html] start of a question text
-        if s.startswith("[html]"):
-            s = s[6:]
-        
-        # splitting question into text and answers based on opening and closing braces
-        parts = re.split(open_brace.re.pattern, s)
-        if len(parts) != 2:
-            raise ValueError(r"More than one '{' without preceding escape character '\'." + "\n\n" +
-                             f"Question text block:\n{s}")
-        text, answers_block = parts
+    @instrumentation.timed("Question.from_str")
+    def from_str(s: str, validate: bool = True) -> "Question":
+        title, text, answer_blocks = Question._tokenize(s)
         text = extract_special_gift_chars(text)
-        parts = re.split(close_brace.re.pattern, answers_block)
-        if len(parts) != 2:
-            raise ValueError(r"more than one '}' without preceding escape character '\'" + "\n\n" +
-                             f"Question text block:\n{s}")
-        # TODO: currently relies on answers being separated by newline characters
-        modes_and_answers = [Question._extract_mode_and_answer(a) for a in parts[0].split("\n") if a.strip()]
+        modes_and_answers = [Question._extract_mode_and_answer(a) for a in answer_blocks]
         
         # infer question mode from answers; if the returned mode is None --> True, if the
         # returned mode is not None (e.g., %<percentage>%) --> False
         # TODO: very simple heuristic
         is_single = {mode is None for mode, _ in modes_and_answers}
-        if len(is_single) != 1:
+        if len(is_single) > 1:
             raise ValueError("Answers have mixed modes but all answer modes must be the same.\n\n" +
                              f"Question text block:\n{s}")
-        # the single element in "is_single" is either True (--> mode=single) or not (--> mode=multi)
-        mode = Question.MODE_SINGLE if is_single.pop() else Question.MODE_MULTI
+        # the single element in "is_single" is either True (--> mode=single) or not (--> mode=multi);
+        # without any answers, the mode does not matter (the question itself will raise an error)
+        mode = Question.MODE_MULTI if False in is_single else Question.MODE_SINGLE
         answers = [answer for _, answer in modes_and_answers]
         
         # do not use the title if it is the same as the text
-        return Question(title="" if title == text else title.strip(), text=text.strip(), answers=answers, mode=mode)
+        return Question(title="" if title == text else title.strip(), text=text.strip(), answers=answers, mode=mode,
+                        validate=validate, source=s.rstrip("\n"))
+    
+    # the only tokens which are relevant for the structure of a question are title delimiters,
+    # opening/closing braces and answer markers (group 1); any other text, including escaped
+    # characters, is consumed by the regex itself, so it never reaches the Python loop below;
+    # the text in front of a token can always be consumed entirely, and the end of the string
+    # is an (empty) token as well, so matching never fails and never backtracks
+    _TOKEN_RE = re.compile(r"(?:[^\\:{}=~]+|\\.?|:(?!:))*(::|[{}=~]|\Z)", re.DOTALL)
+    
+    @staticmethod
+    def _tokenize(s: str) -> tuple[str, str, list[str]]:
+        # single pass over the question block which splits it into the (raw) title, the (raw)
+        # main question text without the optional [html] start and the (raw) answer blocks,
+        # where each answer block starts with its answer marker ('=' or '~')
+        pos = len(s) - len(s.lstrip())
+        title = ""
+        state = "title" if s.startswith("::", pos) else "text"
+        text_start = pos + 2 if state == "title" else pos
+        text = ""
+        answers_start = answer_start = -1
+        answer_blocks = []
+        for match in Question._TOKEN_RE.finditer(s, text_start):
+            token = match.group(1)
+            if not token:
+                break
+            if state == "title":
+                if token == "::":
+                    title = s[text_start:match.start(1)]
+                    text_start = match.end()
+                    state = "text"
+                elif token == "{":
+                    # the title was never closed, so there is no title at all
+                    text_start = pos
+                    state = "text"
+            if state == "text":
+                if token == "{":
+                    text = s[text_start:match.start(1)]
+                    # processing of optional [html] start of a question text
+                    if text.lstrip().startswith("[html]"):
+                        text = text.lstrip()[6:]
+                    answers_start = match.end()
+                    state = "answers"
+                elif token == "}":
+                    raise ValueError(r"'}' without preceding '{' (and without escape character '\')." + "\n\n" +
+                                     f"Question text block:\n{s}")
+            elif state == "answers":
+                if token == "=" or token == "~" or token == "}":
+                    if answer_start != -1:
+                        answer_blocks.append(s[answer_start:match.start(1)])
+                    elif s[answers_start:match.start(1)].strip():
+                        # there is something before the first answer marker, which is
+                        # passed on as answer block, so it is reported as invalid answer
+                        answer_blocks.append(s[answers_start:match.start(1)])
+                    answer_start = match.start(1)
+                    if token == "}":
+                        state = "end"
+                elif token == "{":
+                    raise ValueError(r"More than one '{' without preceding escape character '\'." + "\n\n" +
+                                     f"Question text block:\n{s}")
+            elif state == "end":
+                if token == "{" or token == "}":
+                    raise ValueError(f"More than one '{token}' without preceding escape character '\\'.\n\n" +
+                                     f"Question text block:\n{s}")
+        if state != "end":
+            raise ValueError("Invalid GIFT question format (must include '{' and '}').\n\n" +
+                             f"Question text block:\n{s}")
+        return title, text, answer_blocks
     
     @staticmethod
     def _extract_mode_and_answer(s):
-        # TODO: very simple heuristic
-        match = re.search(r"[=~](%.+%)?(\[moodle])?", s)
-        if not match:
+        a = s.lstrip()
+        if not a or a[0] not in "=~":
             raise ValueError("Invalid GIFT answer format (expected '=' or '~' at start).\n\n" +
                              f"Answer text block:\n{s}")
-        mode = match.group()
-        # skip the mode so only the main answer remains
-        text = s.split(mode, maxsplit=1)[1]
-        text = extract_special_gift_chars(text)
+        # skip the mode (answer marker + optional %<percentage>% + optional [moodle]) so only
+        # the main answer remains
+        i = 1
+        percentage = None
+        if a.startswith("%", 1):
+            end = a.find("%", 2)
+            if end != -1 and "\n" not in a[2:end]:
+                percentage = a[1:end + 1]
+                i = end + 1
+        if a.startswith("[moodle]", i):
+            i += 8
+        text = extract_special_gift_chars(a[i:])
         # TODO: very simple heuristic
-        # group(1) yields the %<percentage>% part if it is there, None otherwise
-        correct = "=" in mode or (match.group(1) is not None and "-" not in mode)
-        return match.group(1), Answer(text.strip(), correct)
+        # the percentage is None if there is no %<percentage>% part
+        correct = a[0] == "=" or (percentage is not None and "-" not in percentage)
+        return percentage, Answer(text.strip(), correct)
     
+    @instrumentation.timed("Question.to_gift_format")
     def to_gift_format(self):
-        gift = f"::{self.title}::" if self.title else ""
-        gift += "[html]"
-        gift += escape_special_gift_chars(self.text)
-        gift += "{\n"
+        if self._gift is None:
+            self._gift = self._build_gift_format()
+        return self._gift
+    
+    @instrumentation.timed("Question.to_gift_format (uncached)")
+    def _build_gift_format(self):
+        parts = [f"::{self.title}::" if self.title else "", "[html]", escape_special_gift_chars(self.text), "{\n"]
         for a in self.answers:
             if self.mode == Question.MODE_SINGLE:
                 mode = "=" if a.correct else "~"
             elif self.mode == Question.MODE_MULTI:
-                percentage = self._get_percentage(a)
-                percentage_str = str(round(percentage, ndigits=5)).rstrip("0")
-                if percentage_str.endswith("."):
-                    percentage_str = percentage_str[:-1]
-                mode = f"~%{percentage_str}%"
+                mode = f"~%{format_percentage(self._get_percentage(a))}%"
             else:
                 raise ValueError(f"Unknown question mode: '{self.mode}'\n\n{self}")
-            gift += f"\t{mode}{a.to_gift_format()}\n"
-        gift += "}"
-        return gift
+            parts.append(f"\t{mode}{a.to_gift_format()}\n")
+        parts.append("}")
+        return "".join(parts)
     
     def _get_percentage(self, answer: Answer):
         n = len(self.answers)
@@ -189,31 +387,247 @@ class Question:
         return NotImplemented
 
 
-def escape_special_gift_chars(s: str):
-    return handle_special_gift_chars(s, True)
+def format_percentage(percentage: float) -> str:
+    # at most 5 decimal places and without trailing zeros (e.g., "33.33333" or "-100")
+    percentage_str = str(round(percentage, ndigits=5)).rstrip("0")
+    if percentage_str.endswith("."):
+        percentage_str = percentage_str[:-1]
+    return percentage_str
 
 
-def extract_special_gift_chars(s: str):
-    return handle_special_gift_chars(s, False)
+def check_question(question: Question) -> list[tuple[str, str]]:
+    # returns all problems (rule name, message) of the question, i.e., an empty list if it is
+    # valid; these rules are shared by the Question constructor, the GUI and the validation of
+    # entire files (see validation.py); all rules are checked in a single function, since this
+    # is called for every parsed question
+    problems = []
+    if not question.answers:
+        problems.append(("no-answers", "At least one answer must be provided."))
+    if not question.text.strip():
+        problems.append(("empty-text", "Main question text must not be empty."))
+    n_correct = 0
+    empty_answer = False
+    for a in question.answers:
+        n_correct += a.correct
+        empty_answer = empty_answer or not a.text.strip()
+    if empty_answer:
+        problems.append(("empty-answer", "Answer texts must not be empty."))
+    if question.mode == Question.MODE_SINGLE and n_correct != 1:
+        problems.append(("single-correct", f"Exactly one answer must be set as correct if mode is '{question.mode}'."))
+    return problems
 
 
-def handle_special_gift_chars(s: str, escape: bool):
-    if escape:
-        # first, backslash escaping and then newline char (otherwise, manual
-        # newline chars would be mapped to "<br>" as well)
+class QuestionBank(MutableSequence):
+    # ordered collection of questions (which can be used like a list) with secondary indexes
+    # for the category, title and mode of the questions; each index maps the respective
+    # attribute value to the sorted positions of all questions with this value; if a question
+    # is changed in-place, update must be called with its position to keep the indexes valid;
+    # questions are identified by their object identity (see position), so each question object
+    # can only be contained once (a ValueError is raised otherwise)
+    
+    def __init__(self, questions: Iterable[Question] = ()):
+        self._questions: list[Question] = []
+        self._keys: list[tuple] = []  # indexed attribute values of each question (category, title, mode)
+        self._indexes: tuple[dict, dict, dict] = ({}, {}, {})  # category, title, mode
+        self._ids: dict[int, int] = {}  # id(question) -> position
+        self.extend(questions)
+    
+    def __len__(self):
+        return len(self._questions)
+    
+    def __iter__(self) -> Iterator[Question]:
+        return iter(self._questions)
+    
+    def __getitem__(self, index):
+        return self._questions[index]
+    
+    def __eq__(self, other):
+        # equal to any sequence (e.g., a list) of equal questions in the same order
+        if isinstance(other, QuestionBank):
+            return self._questions == other._questions
+        if isinstance(other, Sequence) and not isinstance(other, (str, bytes)):
+            return self._questions == list(other)
+        return NotImplemented
+    
+    def __setitem__(self, index: int, question: Question):
+        index = self._normalize_index(index)
+        if self._ids.get(id(question), index) != index:
+            raise ValueError("The question is already contained in the question bank.")
+        self._remove_from_indexes(index)
+        self._questions[index] = question
+        self._add_to_indexes(index)
+    
+    def __delitem__(self, index: int):
+        index = self._normalize_index(index)
+        self._remove_from_indexes(index)
+        del self._questions[index]
+        del self._keys[index]
+        self._shift(index, -1)
+    
+    def insert(self, index: int, question: Question):
+        # same semantics as list.insert (indices out of range are clamped)
+        index = min(max(index + len(self) if index < 0 else index, 0), len(self))
+        if id(question) in self._ids:
+            raise ValueError("The question is already contained in the question bank.")
+        self._shift(index, 1)
+        self._questions.insert(index, question)
+        self._keys.insert(index, ())
+        self._add_to_indexes(index)
+    
+    def extend(self, questions: Iterable[Question]):
+        # appended questions always have the largest positions, so the positions can simply
+        # be appended to the indexes (no sorted insertion necessary)
+        by_category, by_title, by_mode = self._indexes
+        ids = self._ids
+        for q in questions:
+            if id(q) in ids:
+                raise ValueError("The question is already contained in the question bank.")
+            index = len(self._questions)
+            keys = (q.category, q.title, q.mode)
+            self._questions.append(q)
+            self._keys.append(keys)
+            by_category.setdefault(keys[0], []).append(index)
+            by_title.setdefault(keys[1], []).append(index)
+            by_mode.setdefault(keys[2], []).append(index)
+            ids[id(q)] = index
+    
+    def update(self, index: int):
+        # must be called after the question at the specified position was changed in-place
+        index = self._normalize_index(index)
+        self._remove_from_indexes(index)
+        self._add_to_indexes(index)
+    
+    def position(self, question: Question) -> Optional[int]:
+        # position of exactly this question object (not an equal one) or None
+        return self._ids.get(id(question))
+    
+    def categories(self) -> list[Optional[Category]]:
+        return list(self._indexes[0])
+    
+    def positions_by_category(self, category: Optional[Category]) -> list[int]:
+        return list(self._indexes[0].get(category, ()))
+    
+    def positions_by_title(self, title: str) -> list[int]:
+        return list(self._indexes[1].get(title, ()))
+    
+    def position_by_title(self, title: str) -> Optional[int]:
+        positions = self._indexes[1].get(title)
+        return positions[0] if positions else None
+    
+    def positions_by_mode(self, mode: str) -> list[int]:
+        return list(self._indexes[2].get(mode, ()))
+    
+    def grouped_positions(self) -> Iterator[int]:
+        # positions in the order of inout.group_by_category, where the positions of each category
+        # are already known from the index, so only the (few) category names are sorted
+        groups = {}
+        for category in self._indexes[0]:
+            name = "" if category is None else category.name
+            groups.setdefault(name, []).append(self._indexes[0][category])
+        for name in sorted(groups):
+            positions = groups.pop(name)
+            yield from positions[0] if len(positions) == 1 else heapq.merge(*positions)
+    
+    def reorder(self, order: list[int]):
+        # rearranges the questions, where order[i] is the previous position of the question which
+        # is moved to position i (i.e., order must be a permutation of all positions)
+        if len(order) != len(self) or set(order) != set(range(len(self))):
+            raise ValueError("The order must contain each position exactly once.")
+        questions = [self._questions[i] for i in order]
+        self._questions = []
+        self._keys = []
+        self._indexes = ({}, {}, {})
+        self._ids = {}
+        self.extend(questions)
+    
+    def _normalize_index(self, index: int) -> int:
+        if not isinstance(index, int):
+            raise TypeError(f"{type(self).__name__} indices must be integers, not {type(index).__name__}")
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"{type(self).__name__} index out of range")
+        return index
+    
+    def _add_to_indexes(self, index: int):
+        q = self._questions[index]
+        keys = (q.category, q.title, q.mode)
+        self._keys[index] = keys
+        for key, positions in zip(keys, self._indexes):
+            bisect.insort(positions.setdefault(key, []), index)
+        self._ids[id(q)] = index
+    
+    def _remove_from_indexes(self, index: int):
+        for key, positions in zip(self._keys[index], self._indexes):
+            key_positions = positions[key]
+            del key_positions[bisect.bisect_left(key_positions, index)]
+            if not key_positions:
+                del positions[key]
+        del self._ids[id(self._questions[index])]
+    
+    def _shift(self, index: int, delta: int):
+        # adjusts all positions from index onwards (e.g., after inserting/removing a question)
+        if index >= len(self._questions):
+            return
+        for positions in self._indexes:
+            for key_positions in positions.values():
+                if key_positions[-1] >= index:
+                    for i in range(bisect.bisect_left(key_positions, index), len(key_positions)):
+                        key_positions[i] += delta
+        # the question list is already changed for removals but not yet for insertions
+        for i in range(index, len(self._questions)):
+            self._ids[id(self._questions[i])] = i + delta if delta > 0 else i
+
+
+# special GIFT characters that must be escaped with a backslash
+SPECIAL_GIFT_CHARS = "~=#{}:"
+
+_ESCAPE_RE = re.compile(r"[\\\n~=#{}:]")
+
+
+@instrumentation.counted("escape_special_gift_chars calls")
+def escape_special_gift_chars(s: str):
+    # fast path: most texts do not contain any special characters at all
+    if _ESCAPE_RE.search(s) is None:
+        return s
+    # first, backslash escaping and then newline char (otherwise, manual newline chars
+    # would be mapped to "<br>" as well); characters which are not contained in the
+    # string are skipped (the membership test is much cheaper than a replace pass)
+    if "\\" in s:
         s = s.replace("\\", "\\\\")
+    if "\n" in s:
         s = s.replace("\n", "<br>")
-    else:  # extract
-        # first, newline char extraction (once for "\n" and once for "<br>")
-        # and then backslash extraction (otherwise, we could not distinguish
-        # between true newline chars and manual newline chars)
-        s = re.sub(r"(?<!\\)\\n", "\n", s)
+    for c in SPECIAL_GIFT_CHARS:
+        if c in s:
+            s = s.replace(c, f"\\{c}")
+    return s
+
+
+@instrumentation.counted("extract_special_gift_chars calls")
+def extract_special_gift_chars(s: str):
+    # fast path: without backslashes and "<br>", there is nothing to extract
+    if "\\" not in s:
+        return s.replace("<br>", "\n") if "<br>" in s else s
+    # escaped backslashes are split off first, so the remaining parts can be handled
+    # independently of each other; this is equivalent to a single scan from left to right,
+    # i.e., an escaped backslash followed by "n" is not mistaken for an escaped newline
+    if "\\\\" in s:
+        return "\\".join(_extract_special_gift_chars(part) for part in s.split("\\\\"))
+    return _extract_special_gift_chars(s)
+
+
+def _extract_special_gift_chars(s: str):
+    # s must not contain any escaped backslash
+    if "<br>" in s:
         s = s.replace("<br>", "\n")
-        s = s.replace("\\\\", "\\")
-    chars = {"~", "=", "#", "{", "}", ":"}
-    for c in chars:
-        if escape:
-            s = s.replace(c, rf"\{c}")
-        else:  # extract
-            s = s.replace(rf"\{c}", c)
+    if "\\" in s:
+        if "\\n" in s:
+            s = s.replace("\\n", "\n")
+        for c in SPECIAL_GIFT_CHARS:
+            if c in s:
+                s = s.replace(f"\\{c}", c)
     return s
+
+
+def handle_special_gift_chars(s: str, escape: bool):
+    return escape_special_gift_chars(s) if escape else extract_special_gift_chars(s)
@@ -0,0 +1,213 @@
+import hashlib
+import html
+import multiprocessing
+import os
+import re
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Hashable, Iterable, Iterator
+
+import inout
+import instrumentation
+from data import Category, Question
+
+_TAG_RE = re.compile(r"<[^>]*>")
+_WORD_RE = re.compile(r"\w+")
+
+
+def words(s: str) -> list[str]:
+    # normalized words of a text, i.e., without HTML tags and entities, formatting, punctuation
+    # and case, so texts which only differ in these respects are considered the same
+    if "<" in s:
+        s = _TAG_RE.sub(" ", s)
+    if "&" in s:
+        s = html.unescape(s)
+    return _WORD_RE.findall(s.lower())
+
+
+def _normalize(question: Question) -> tuple[list[str], list[str]]:
+    # words of the text and normalized answers, where the order of the answers does not matter
+    # (see Question.to_gift_format)
+    answers = sorted(f"{'=' if a.correct else '~'} {' '.join(words(a.text))}" for a in question.answers)
+    return words(question.text), answers
+
+
+def content_key(question: Question, normalized: tuple[list[str], list[str]] = None) -> bytes:
+    # questions with the same key are exact duplicates (apart from normalization, see words); the
+    # title and the category are not part of the key, since they are not part of the content
+    text_words, answers = normalized or _normalize(question)
+    return hashlib.blake2b("\0".join([" ".join(text_words)] + answers).encode(), digest_size=16).digest()
+
+
+def shingles(question: Question, size: int = 3, normalized: tuple[list[str], list[str]] = None) -> set[tuple]:
+    # overlapping word n-grams of the text and the (sorted) answers, where each word is represented
+    # by its CRC-32 (unlike the hash of strings, it is the same in all processes)
+    text_words, answers = normalized or _normalize(question)
+    tokens = list(map(zlib.crc32, " ".join([" ".join(text_words)] + answers).encode().split()))
+    if len(tokens) <= size:
+        return {tuple(tokens)} if tokens else set()
+    return set(zip(*(tokens[i:] for i in range(size))))
+
+
+def signature(shingle_set: set[tuple], num_perm: int = 64) -> tuple[int, ...]:
+    # MinHash signature based on one permutation hashing: each shingle is hashed only once, the
+    # hash determines the bin and its value, and each bin keeps the minimum value; empty bins
+    # take the value of the next non-empty bin (densification), so the signature works with LSH;
+    # the fraction of equal bins of two signatures estimates the Jaccard similarity of the sets;
+    # the hash of tuples of integers is not randomized, i.e., it is the same in all processes
+    if not shingle_set:
+        return ()
+    # in descending order, so the minimum of each bin is assigned last
+    bins = {h % num_perm: h // num_perm for h in sorted(map(hash, shingle_set), reverse=True)}
+    if len(bins) == num_perm:
+        return tuple(bins[b] for b in range(num_perm))
+    result = [0] * num_perm
+    # the distance to the borrowed bin is added, so bins which borrow from different distances differ
+    following = min(bins) + num_perm
+    for b in range(num_perm - 1, -1, -1):
+        if b in bins:
+            following = b
+            result[b] = bins[b]
+        else:
+            result[b] = bins[following % num_perm] + ((following - b) << 64)
+    return tuple(result)
+
+
+def similarity(signature1: tuple[int, ...], signature2: tuple[int, ...]) -> float:
+    if not signature1 or not signature2:
+        return 0.0
+    return sum(1 for a, b in zip(signature1, signature2) if a == b) / len(signature1)
+
+
+def unique(questions: Iterable[Question]) -> Iterator[Question]:
+    # skips exact duplicates (see content_key), i.e., only the first occurrence is kept
+    seen = set()
+    for question in questions:
+        key = content_key(question)
+        if key not in seen:
+            seen.add(key)
+            yield question
+
+
+class DuplicateFinder:
+    # finds exact duplicates (same content key) and near duplicates (estimated Jaccard similarity
+    # of the shingles of at least the threshold) among all added questions in linear time; near
+    # duplicates are found with locality-sensitive hashing: the signatures are split into bands,
+    # and questions which are equal in any band are candidates, which are then compared; to avoid
+    # quadratic costs for large buckets, a question is only compared to the first question of each
+    # of its buckets (similar questions usually share several buckets anyway)
+    
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = None):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        # the probability of becoming a candidate is 50% at similarity (1 / bands) ^ (1 / rows),
+        # so the number of bands is chosen such that this is close to (slightly below) the threshold
+        if bands is None:
+            divisors = [b for b in range(1, num_perm + 1) if num_perm % b == 0]
+            bands = min(divisors, key=lambda b: abs((1 / b) ** (b / num_perm) - (threshold - 0.05)))
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._exact: dict[bytes, list[Hashable]] = {}  # content key -> references of all questions
+        self._signatures: dict[Hashable, tuple[int, ...]] = {}  # reference -> signature
+        self._buckets: dict[tuple, Hashable] = {}  # (band, band values) -> reference of first question
+        self._near: dict[tuple[Hashable, Hashable], float] = {}  # pair of references -> similarity
+    
+    def add(self, reference: Hashable, key: bytes, sig: tuple[int, ...]):
+        # adds a question (see fingerprint), which is identified by the given reference
+        duplicates = self._exact.setdefault(key, [])
+        duplicates.append(reference)
+        if len(duplicates) > 1 or not sig:
+            # exact duplicates are not compared again, and questions without words cannot be compared
+            return
+        self._signatures[reference] = sig
+        compared = set()
+        for band in range(self.bands):
+            bucket = (band, sig[band * self.rows:(band + 1) * self.rows])
+            first = self._buckets.setdefault(bucket, reference)
+            if first is not reference and first not in compared:
+                compared.add(first)
+                s = similarity(self._signatures[first], sig)
+                if s >= self.threshold:
+                    self._near[(first, reference)] = s
+    
+    def add_question(self, reference: Hashable, question: Question):
+        self.add(reference, *fingerprint(question, self.num_perm))
+    
+    def exact_duplicates(self) -> list[list[Hashable]]:
+        return [references for references in self._exact.values() if len(references) > 1]
+    
+    def near_duplicates(self) -> list[tuple[Hashable, Hashable, float]]:
+        return [(a, b, s) for (a, b), s in self._near.items()]
+
+
+def fingerprint(question: Question, num_perm: int = 64) -> tuple[bytes, tuple[int, ...]]:
+    normalized = _normalize(question)
+    return content_key(question, normalized), signature(shingles(question, normalized=normalized), num_perm)
+
+
+def fingerprint_file(file, num_perm: int = 64, encoding="utf8") -> tuple[list[tuple], list[str]]:
+    # returns the fingerprints of all questions of the file as (question index, line number,
+    # title (or beginning of the text), content key, signature) and the errors of invalid
+    # blocks, which are skipped (see validation.py for details about such blocks)
+    fingerprints = []
+    errors = []
+    try:
+        with open(file, encoding=encoding) as f:
+            for line, block in inout.iter_blocks(f):
+                if Category.extract_category_pattern(block) is not None:
+                    continue
+                try:
+                    question = Question.from_str(block, validate=False)
+                except ValueError as e:
+                    errors.append(f"{file}:{line}: {str(e).splitlines()[0]}")
+                    continue
+                title = question.title or question.text.split("\n", maxsplit=1)[0][:80]
+                fingerprints.append((len(fingerprints), line, title, *fingerprint(question, num_perm)))
+    except (OSError, UnicodeDecodeError) as e:
+        errors.append(f"{file}: {e}")
+    return fingerprints, errors
+
+
+def _fingerprint_file_instrumented(*args) -> tuple[tuple[list[tuple], list[str]], tuple[dict, dict]]:
+    # same as batch._process_file_instrumented
+    instrumentation.reset()
+    return fingerprint_file(*args), instrumentation.snapshot()
+
+
+def _merge_instrumented(results: Iterator[tuple]) -> Iterator:
+    for result, (timings, counters) in results:
+        instrumentation.merge(timings, counters)
+        yield result
+
+
+def find_duplicates(files: list[str], threshold: float = 0.8, num_perm: int = 64, jobs: int = None,
+                    mp_context: multiprocessing.context.BaseContext = None) -> dict:
+    # the files are fingerprinted in parallel (one file per task), only the duplicate detection
+    # itself runs in this process; returns a machine-readable report; the results of the
+    # instrumentation of the workers are merged (same as batch.run_batch)
+    finder = DuplicateFinder(threshold, num_perm)
+    locations = {}  # reference (file index, question index) -> location
+    errors = []
+    jobs = jobs or os.cpu_count() or 1
+    initializer = instrumentation.init_worker if instrumentation.enabled else None
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=mp_context, initializer=initializer) as executor:
+        chunksize = max(1, len(files) // (jobs * 4))
+        args = (files, [num_perm] * len(files))
+        if instrumentation.enabled:
+            results = _merge_instrumented(executor.map(_fingerprint_file_instrumented, *args, chunksize=chunksize))
+        else:
+            results = executor.map(fingerprint_file, *args, chunksize=chunksize)
+        for i, (fingerprints, file_errors) in enumerate(results):
+            errors.extend(file_errors)
+            for index, line, title, key, sig in fingerprints:
+                reference = (i, index)
+                locations[reference] = {"file": files[i], "index": index, "line": line, "title": title}
+                finder.add(reference, key, sig)
+    return {
+        "n_files": len(files),
+        "n_questions": len(locations),
+        "exact_duplicates": [[locations[r] for r in references] for references in finder.exact_duplicates()],
+        "near_duplicates": [{"similarity": round(s, 3), "first": locations[a], "second": locations[b]}
+                            for a, b, s in sorted(finder.near_duplicates(), key=lambda x: -x[2])],
+        "errors": errors,
+    }
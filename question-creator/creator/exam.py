@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import pickle
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import inout
+import instrumentation
+from data import Answer, Category, Question, QuestionBank
+
+
+class ExamBuilder:
+    # draws exam variants from a question bank, where each variant consists of a fixed number of
+    # questions per category; the positions of the questions of each category are determined only
+    # once, so drawing a variant only costs the sampling itself; variants are reproducible, i.e.,
+    # the same seed and variant number always result in the same questions (in the same order)
+    
+    def __init__(self, bank: QuestionBank, counts: dict[Optional[Category], int], seed=0,
+                 shuffle_answers: bool = False):
+        self.bank = bank
+        self.counts = counts
+        self.seed = seed
+        self.shuffle_answers = shuffle_answers
+        self.positions: dict[Optional[Category], list[int]] = {}  # category -> positions of its questions
+        for category, n in counts.items():
+            positions = bank.positions_by_category(category)
+            if n > len(positions):
+                raise ValueError(f"Cannot draw {n} questions from category '{category}', which only has "
+                                 f"{len(positions)} questions.")
+            self.positions[category] = positions
+    
+    def variant(self, number: int) -> list[Question]:
+        # the questions of each category are in random order, and the categories are in the order
+        # of "counts"; the seed of the variant is a string, since those are hashed deterministically
+        # (i.e., independent of the process, unlike the hash of other objects)
+        rng = random.Random(f"{self.seed}:{number}")
+        questions = []
+        for category, n in self.counts.items():
+            for position in rng.sample(self.positions[category], n):
+                question = self.bank[position]
+                if self.shuffle_answers:
+                    question = _shuffled(question, rng)
+                questions.append(question)
+        return questions
+
+
+def _shuffled(question: Question, rng: random.Random) -> Question:
+    # the answers are copied, since answers belong to a single question (see Question.answers)
+    answers = [Answer(a.text, a.correct) for a in question.answers]
+    rng.shuffle(answers)
+    return Question(question.category, question.title, question.text, answers, question.mode, validate=False)
+
+
+# builder of the worker processes (see write_variants), which is created once per process
+_builder: Optional[ExamBuilder] = None
+
+
+def _init_worker(bank: QuestionBank, counts: dict[Optional[Category], int], seed, shuffle_answers: bool):
+    global _builder
+    _builder = ExamBuilder(bank, counts, seed, shuffle_answers)
+
+
+def _write_variant(number: int, file, encoding: str) -> str:
+    inout.write_gift(file, _builder.variant(number), encoding, group_categories=False)
+    return file
+
+
+def _write_variant_instrumented(*args) -> tuple[str, tuple[dict, dict]]:
+    # same as batch._process_file_instrumented
+    instrumentation.reset()
+    return _write_variant(*args), instrumentation.snapshot()
+
+
+def variant_files(out_dir, n_variants: int) -> list[str]:
+    # file names with the same number of digits, so they are sorted by their number
+    digits = len(str(max(n_variants - 1, 0)))
+    return [os.path.join(out_dir, f"variant-{i:0{digits}d}.txt") for i in range(n_variants)]
+
+
+@instrumentation.timed("exam.write_variants")
+def write_variants(bank: QuestionBank, out_dir, n_variants: int, counts: dict[Optional[Category], int], seed=0,
+                   shuffle_answers: bool = False, jobs: int = None, encoding="utf8",
+                   mp_context: multiprocessing.context.BaseContext = None) -> list[str]:
+    # writes each variant as GIFT file (see variant_files), where the variants are distributed
+    # among worker processes; the bank is passed to each worker only once (when it is started),
+    # so it is neither parsed nor transferred again per variant; returns the written files; the
+    # results of the instrumentation of the workers are merged (same as batch.run_batch)
+    ExamBuilder(bank, counts)  # raises errors (e.g., too few questions) before any process is started
+    os.makedirs(out_dir, exist_ok=True)
+    files = variant_files(out_dir, n_variants)
+    jobs = min(jobs or os.cpu_count() or 1, max(n_variants, 1))
+    initializer, initargs = _init_worker, (bank, counts, seed, shuffle_answers)
+    if instrumentation.enabled:
+        # the bank is only loaded once the instrumentation is enabled (see instrumentation.init_worker)
+        initializer, initargs = instrumentation.init_worker, (f"{__name__}._init_worker", pickle.dumps(initargs))
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=mp_context, initializer=initializer,
+                             initargs=initargs) as executor:
+        # several variants per task to reduce the communication overhead
+        chunksize = max(1, n_variants // (jobs * 4))
+        args = (range(n_variants), files, [encoding] * n_variants)
+        if not instrumentation.enabled:
+            return list(executor.map(_write_variant, *args, chunksize=chunksize))
+        results = []
+        for result, (timings, counters) in executor.map(_write_variant_instrumented, *args, chunksize=chunksize):
+            results.append(result)
+            instrumentation.merge(timings, counters)
+        return results
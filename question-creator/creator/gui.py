@@ -1,17 +1,34 @@
+import bisect
+import os
+import queue
+import sqlite3
+import threading
 import tkinter as tk
+from collections.abc import Callable, Sequence
 from tkinter import ttk
 from tkinter.filedialog import askopenfilename, asksaveasfilename
-from tkinter.messagebox import askyesno, showerror
+from tkinter.messagebox import askyesno, showerror, showwarning
 from tkinter.scrolledtext import ScrolledText
 
 import inout
-from data import Answer, Question, Category
+import instrumentation
+from cache import ParseCache
+from data import Answer, Question, QuestionBank, Category, check_question
+from journal import Journal, read_journal, replay
+from lazy import LazyQuestionBank
+from search import SearchIndex
+from store import SUFFIX as STORE_SUFFIX, QuestionStore, export_gift
+from watch import FileWatcher
+from workspace import Workspace
 
 
 class QuestionFrame(ttk.Frame):
     
     def __init__(self, master, question: Question, **kwargs):
         super().__init__(master, **kwargs)
+        # names of the fields whose widgets were modified since the last set_state/reset_modified,
+        # so only these widgets must be read back (see get_changes)
+        self.modified: set[str] = set()
         # GUI setup
         self.frame = ttk.Frame(self.master)
         self.frame.pack(fill=tk.BOTH, side=tk.TOP, expand=True)
@@ -24,25 +41,31 @@ class QuestionFrame(ttk.Frame):
         label = ttk.Label(inner_frame, text="Mode:")
         label.pack(side=tk.TOP)
         # TODO: rename GUI elements (e.g., combobox -> mode_combobox)
-        self.combobox = ttk.Combobox(inner_frame, values=Question.MODES, state="readonly", width=6)
-        self.combobox.set(question.mode)
+        self.mode_var = tk.StringVar(inner_frame, value=question.mode)
+        self.combobox = ttk.Combobox(inner_frame, values=Question.MODES, state="readonly", width=6,
+                                     textvariable=self.mode_var)
         self.combobox.pack(side=tk.TOP)
         # category GUI elements
         label = ttk.Label(inner_frame, text="Category:")
         label.pack(side=tk.TOP)
-        self.entry = ttk.Entry(inner_frame, width=20)
-        self.entry.insert(0, "" if question.category is None else question.category.name)
+        self.category_var = tk.StringVar(inner_frame, value="" if question.category is None else question.category.name)
+        self.entry = ttk.Entry(inner_frame, width=20, textvariable=self.category_var)
         self.entry.pack(side=tk.TOP)
         # textbox for main question text
         self.textbox = ScrolledText(self.frame, width=100, height=10)
         self.textbox.insert("1.0", question.text)
         self.textbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        # modification tracking
+        self.mode_var.trace_add("write", lambda *args: self.modified.add("mode"))
+        self.category_var.trace_add("write", lambda *args: self.modified.add("category"))
+        self.textbox.bind("<<Modified>>", self._on_text_modified)
+        self.reset_modified()
     
     def set_state(self, question: Question):
-        self.entry.delete(0, tk.END)
-        self.entry.insert(0, "" if question.category is None else question.category.name)
-        self.combobox.set(question.mode)
+        self.category_var.set("" if question.category is None else question.category.name)
+        self.mode_var.set(question.mode)
         self.textbox.replace("1.0", tk.END, question.text)
+        self.reset_modified()
     
     def get_state(self):
         mode = self.combobox.get()
@@ -50,6 +73,29 @@ class QuestionFrame(ttk.Frame):
         category = None if not category_name.strip() else Category(category_name)
         text = self.textbox.get("1.0", tk.END)[:-1]  # last char = \n
         return mode, category, text
+    
+    def get_changes(self):
+        # returns only the modified fields (name -> value)
+        changes = {}
+        if "mode" in self.modified:
+            changes["mode"] = self.mode_var.get()
+        if "category" in self.modified:
+            category_name = self.category_var.get()
+            changes["category"] = None if not category_name.strip() else Category(category_name)
+        if "text" in self.modified:
+            changes["text"] = self.textbox.get("1.0", tk.END)[:-1]  # last char = \n
+        return changes
+    
+    def reset_modified(self):
+        self.modified.clear()
+        # <<Modified>> is only generated when the modified flag of the textbox changes, so it
+        # must be reset to get notified about the next modification
+        self.textbox.edit_modified(False)
+    
+    def _on_text_modified(self, event):
+        # also generated when the flag is reset, so the flag itself must be checked
+        if self.textbox.edit_modified():
+            self.modified.add("text")
 
 
 class AnswerFrame(ttk.Frame):
@@ -57,6 +103,7 @@ class AnswerFrame(ttk.Frame):
     def __init__(self, master: "AnswersFrame", answer: Answer, index: int, **kwargs):
         super().__init__(master, **kwargs)
         self.answer = answer
+        self.modified = False  # whether the text or correct checkbox was modified (see get_changes)
         # GUI setup
         self.pack(fill=tk.BOTH, side=tk.TOP, expand=True)
         self.label = ttk.Label(self, text=f"{index + 1})")
@@ -71,18 +118,34 @@ class AnswerFrame(ttk.Frame):
         self.checkbox_var = tk.BooleanVar(frame, value=answer.correct)
         checkbox = ttk.Checkbutton(frame, text="Correct", variable=self.checkbox_var)
         checkbox.pack(side=tk.TOP)
-        self.button = ttk.Button(frame, text="Remove", command=lambda: master.remove_answer(self.answer))
+        self.button = ttk.Button(frame, text="Remove", command=lambda: master.remove_frame(self))
         self.button.pack(side=tk.TOP)
+        # modification tracking (see QuestionFrame)
+        self.checkbox_var.trace_add("write", lambda *args: self._set_modified())
+        self.textbox.bind("<<Modified>>", self._on_text_modified)
+        self.reset_modified()
     
     def set_state(self, answer: Answer):
         self.answer = answer
         self.textbox.replace("1.0", tk.END, answer.text)
         self.checkbox_var.set(answer.correct)
+        self.reset_modified()
     
     def get_state(self):
         text = self.textbox.get("1.0", tk.END)[:-1]  # last char = \n
         correct = self.checkbox_var.get()
         return text, correct
+    
+    def reset_modified(self):
+        self.modified = False
+        self.textbox.edit_modified(False)
+    
+    def _set_modified(self):
+        self.modified = True
+    
+    def _on_text_modified(self, event):
+        if self.textbox.edit_modified():
+            self.modified = True
 
 
 class AnswersFrame(ttk.Frame):
@@ -90,36 +153,200 @@ class AnswersFrame(ttk.Frame):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.frames: list[AnswerFrame] = []
+        # frames of removed answers are only hidden and reused when adding answers later on,
+        # so switching between questions with different numbers of answers is cheap
+        self.pool: list[AnswerFrame] = []
+        self.modified = False  # whether answers were added or removed (see get_changes)
     
     def add_answer(self, answer: Answer = None):
-        if answer is None:
+        new = answer is None
+        if new:
             answer = Answer(text="new answer", correct=False)
-        frame = AnswerFrame(self, answer, len(self.frames))
+        if self.pool:
+            frame = self.pool.pop()
+            frame.label.config(text=f"{len(self.frames) + 1})")
+            frame.set_state(answer)
+            frame.pack(fill=tk.BOTH, side=tk.TOP, expand=True)
+        else:
+            frame = AnswerFrame(self, answer, len(self.frames))
+        # a new answer is not yet part of the question, so it must be read back
+        frame.modified = new
         self.frames.append(frame)
+        self.modified = True
     
     def remove_answer(self, answer: Answer = None):
         if self.frames and answer is None:
             # remove the last one, so we do not have to adjust the label indices
-            self.frames.pop(-1).destroy()
+            self._hide(self.frames.pop(-1))
+            self.modified = True
             return
-        # if the answer is specified, we need to search for it, remove it and
-        # adjust all following label indices (decrement by 1)
-        index_to_remove = -1
-        for i, frame in enumerate(self.frames):
+        # if the answer is specified, we need to search for its frame
+        for frame in self.frames:
             if frame.answer == answer:
-                index_to_remove = i
-                break
-        assert index_to_remove != -1, "specified answer was not found in this AnswersFrame"
-        self.frames.pop(index_to_remove).destroy()
-        # need to adjust the label indices of all following answers
+                self.remove_frame(frame)
+                return
+        assert False, "specified answer was not found in this AnswersFrame"
+    
+    def remove_frame(self, frame: AnswerFrame):
+        index_to_remove = self.frames.index(frame)
+        self._hide(self.frames.pop(index_to_remove))
+        # need to adjust the label indices of all following answers (decrement by 1)
         for i in range(index_to_remove, len(self.frames)):
             self.frames[i].label.config(text=f"{i + 1})")
+        self.modified = True
+    
+    def _hide(self, frame: AnswerFrame):
+        frame.pack_forget()
+        self.pool.append(frame)
     
     def n_answers(self):
         return len(self.frames)
     
     def get_state(self):
         return [Answer(*f.get_state()) for f in self.frames]
+    
+    def get_changes(self):
+        # returns None if the answers were not modified, otherwise all answers, where only the
+        # modified ones are read back from their widgets (all others are reused)
+        if not self.modified and not any(f.modified for f in self.frames):
+            return None
+        for frame in self.frames:
+            if frame.modified:
+                frame.answer = Answer(*frame.get_state())
+        return [f.answer for f in self.frames]
+    
+    def reset_modified(self):
+        self.modified = False
+        for frame in self.frames:
+            frame.reset_modified()
+
+
+class QuestionListFrame(ttk.Frame):
+    # list of all questions (index, title and category), where only the rows which are currently
+    # visible exist as Treeview items; scrolling just changes the values of these rows, so the
+    # costs do not depend on the number of questions
+    
+    def __init__(self, master, questions: Sequence[Question], on_select: Callable[[int], None], rows: int = 30,
+                 **kwargs):
+        super().__init__(master, **kwargs)
+        self.questions = questions
+        self.on_select = on_select
+        self.offset = 0  # index of the question in the first row
+        self.current = 0  # index of the current question (which is highlighted)
+        # GUI setup
+        self.tree = ttk.Treeview(self, columns=("index", "title", "category"), show="headings", height=rows,
+                                 selectmode="none")
+        for column, text, width in [("index", "#", 50), ("title", "Title", 200), ("category", "Category", 120)]:
+            self.tree.heading(column, text=text, anchor=tk.W)
+            self.tree.column(column, width=width, stretch=column == "title")
+        self.tree.tag_configure("current", background="lightblue")
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+        self.items = [self.tree.insert("", tk.END) for _ in range(rows)]
+        self.tree.bind("<ButtonRelease-1>", self._on_click)
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll_to(self.offset - event.delta // 120))
+        self.tree.bind("<Button-4>", lambda event: self.scroll_to(self.offset - 1))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_to(self.offset + 1))
+        self.refresh()
+    
+    def set_questions(self, questions: Sequence[Question], current: int = 0):
+        self.questions = questions
+        self.offset = 0
+        self.set_current(current)
+    
+    def set_current(self, current: int):
+        # scrolls (if necessary) so that the current question is visible
+        self.current = current
+        if not self.offset <= current < self.offset + len(self.items):
+            self.offset = current - len(self.items) // 2
+        self.scroll_to(self.offset)
+    
+    def scroll_to(self, offset: int):
+        self.offset = max(0, min(offset, len(self.questions) - len(self.items)))
+        self.refresh()
+    
+    def refresh(self):
+        n = len(self.questions)
+        for i, item in enumerate(self.items):
+            index = self.offset + i
+            if index < n:
+                try:
+                    q = self.questions[index]
+                except ValueError:
+                    # invalid question in lazy mode (see QuestionCreator._show_question)
+                    values = (index + 1, "<invalid question>", "")
+                else:
+                    # the (first line of the) text is shown if there is no title
+                    title = q.title or q.text.split("\n", maxsplit=1)[0]
+                    values = (index + 1, title, "" if q.category is None else q.category.name)
+                self.tree.item(item, values=values, tags=("current",) if index == self.current else ())
+            else:
+                self.tree.item(item, values=("", "", ""), tags=())
+        if n == 0:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.offset / n, min(self.offset + len(self.items), n) / n)
+    
+    def _on_scrollbar(self, *args):
+        if args[0] == tk.MOVETO:
+            self.scroll_to(round(float(args[1]) * len(self.questions)))
+        elif args[0] == tk.SCROLL:
+            step = int(args[1]) * (len(self.items) if args[2] == tk.PAGES else 1)
+            self.scroll_to(self.offset + step)
+    
+    def _on_click(self, event):
+        item = self.tree.identify_row(event.y)
+        if item:
+            index = self.offset + self.items.index(item)
+            if index < len(self.questions):
+                self.on_select(index)
+
+
+@instrumentation.timed("gui.load_questions")
+def load_questions(file, cache: ParseCache, results: queue.Queue, cancel: threading.Event, batch_size: int = 500):
+    # runs in a background thread and passes batches of parsed questions together with the
+    # progress (0 to 1) to the GUI; a batch is passed as soon as it is full or the GUI has
+    # processed all previous ones (e.g., the first question is passed on its own, so it can
+    # be shown immediately); finally, either None or the error is passed
+    try:
+        if cache is not None:
+            results.put((list(cache.read_gift(file)), 1.0))
+        else:
+            size = max(os.path.getsize(file), 1)
+            with open(file, encoding="utf8") as f:
+                batch = []
+                for q in inout.parse_gift(f):
+                    if cancel.is_set():
+                        return
+                    batch.append(q)
+                    if len(batch) >= batch_size or results.empty():
+                        results.put((batch, f.buffer.tell() / size))
+                        batch = []
+                results.put((batch, 1.0))
+    except (ValueError, OSError, UnicodeDecodeError) as e:
+        results.put(e)
+    else:
+        results.put(None)
+
+
+@instrumentation.timed("gui.write_questions")
+def write_questions(file, questions: list[Question] | LazyQuestionBank | QuestionStore, results: queue.Queue):
+    # runs in a background thread and passes either None or the error to the GUI; the questions
+    # are written in their order, which is already grouped by category (see
+    # QuestionCreator._group_questions); a question store is exported with its own connection
+    # (which reads a consistent snapshot), since its connection cannot be used in other threads
+    try:
+        if isinstance(questions, LazyQuestionBank):
+            questions.write(file, group_categories=False)
+        elif isinstance(questions, QuestionStore):
+            export_gift(questions.file, file)
+        else:
+            inout.write_gift(file, questions, group_categories=False)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        results.put(e)
+    else:
+        results.put(None)
 
 
 class QuestionCreator:
@@ -140,13 +367,40 @@ class QuestionCreator:
         answers = [Answer(text=f"answer {i + 1}", correct=i == 0) for i in range(n_answers)]
         return Question(category=category, text="question", answers=answers, mode=mode)
     
-    def __init__(self, file=None):
+    def __init__(self, file=None, cache: ParseCache = None, lazy: bool = False, watch: bool = False,
+                 directory=None):
         # always create one dummy question at startup so self._init_setup creates all
         # necessary GUI elements
-        self.questions: list[Question] = [QuestionCreator.create_new_question()]
+        self.questions: QuestionBank | LazyQuestionBank | QuestionStore = QuestionBank(
+            [QuestionCreator.create_new_question()])
+        # the search index is built on demand in lazy mode and for question stores (see _get_search_index), i.e.,
+        # None until the first search
+        self.search_index: SearchIndex = SearchIndex(self.questions)
         self.cqi: int = 0  # current question index
         self.file = file
+        self.cache = cache  # optional cache of parsed files (None = always parse files)
+        # whether files are opened lazily, i.e., questions are only parsed when accessed (see LazyQuestionBank)
+        self.lazy = lazy
+        # whether changes of the opened file by other programs are merged into the questions (see
+        # _poll_watcher); only GIFT files which are not opened lazily are watched
+        self.watch = watch
+        self.watcher: FileWatcher = None
         self.changes = False  # whether there are changes not yet stored to a file
+        # background loading (see _open_file) and saving (see _save_file) of files
+        self.loading: threading.Thread = None
+        self.loading_results = queue.Queue()
+        self.loading_cancel = threading.Event()
+        self.loading_previous = None  # state before loading, which is restored if loading fails
+        self.saving: threading.Thread = None
+        self.saving_results = queue.Queue()
+        self.saving_snapshot = None  # (questions, copies) which are written (see _save_file)
+        # unsaved edits are recorded in the journal of the file, so they can be recovered after a crash
+        self.journal = Journal(on_error=self._on_journal_error)
+        # workspace mode: the GIFT files of a directory, where the current file is one of them (see
+        # _select_file); the other files keep their questions (see Workspace), journals and positions
+        self.workspace: Workspace = None
+        self.journals: dict[str, Journal] = {}
+        self.positions: dict[str, int] = {}
         
         # GUI elements and containers + setup
         self.window = tk.Tk()
@@ -154,11 +408,17 @@ class QuestionCreator:
         self.window.bind("<Control-s>", lambda event: self._save_file(self.file))
         self.window.bind("<Alt-Left>", lambda event: self._prev_question())
         self.window.bind("<Alt-Right>", lambda event: self._next_question())
+        self.window.bind("<Control-f>", lambda event: self.search_entry.focus_set())
         self.window.protocol("WM_DELETE_WINDOW", self._on_close)
         self._init_setup()
+        self.window.after(1000, self._sync_journal)
+        if watch:
+            self.window.after(1000, self._poll_watcher)
         
         if file is not None:
             self._open_file(file)
+        elif directory is not None:
+            self._open_workspace(directory)
     
     def _init_setup(self):
         # buttons for opening/storing questions
@@ -171,6 +431,44 @@ class QuestionCreator:
         button_save_as = ttk.Button(button_frame, text="Save as...", width=10, command=self._save_file)
         button_save_as.pack(side=tk.LEFT)
         
+        # search GUI elements (all words must be contained in a question, words match as prefix)
+        self.search_entry = ttk.Entry(button_frame, width=30)
+        self.search_entry.bind("<Return>", lambda event: self._find_next())
+        self.search_entry.pack(side=tk.LEFT, padx=(20, 0))
+        button_find = ttk.Button(button_frame, text="Find next", width=10, command=self._find_next)
+        button_find.pack(side=tk.LEFT)
+        self.search_label = ttk.Label(button_frame, width=16)
+        self.search_label.pack(side=tk.LEFT)
+        
+        # progress bar and cancel button, which are only shown while loading a file
+        self.loading_frame = ttk.Frame(button_frame)
+        self.loading_progress = ttk.Progressbar(self.loading_frame, length=150, maximum=1.0)
+        self.loading_progress.pack(side=tk.LEFT, padx=(20, 0))
+        button_cancel = ttk.Button(self.loading_frame, text="Cancel", width=10, command=self._cancel_loading)
+        button_cancel.pack(side=tk.LEFT)
+        
+        # sidebar with the list of all questions (for directly jumping to a question)
+        self.question_list = QuestionListFrame(self.window, self.questions, self._go_to_question)
+        self.question_list.pack(side=tk.LEFT, fill=tk.Y)
+        
+        # workspace GUI elements (file selection, moving questions to other files and the category
+        # index), which are only shown in workspace mode (see _open_workspace)
+        self.workspace_frame = ttk.Frame(self.window)
+        label = ttk.Label(self.workspace_frame, text="File:")
+        label.pack(side=tk.LEFT)
+        self.file_combobox = ttk.Combobox(self.workspace_frame, state="readonly", width=40)
+        self.file_combobox.bind("<<ComboboxSelected>>", lambda event: self._select_file(
+            self.workspace.files[self.file_combobox.current()]))
+        self.file_combobox.pack(side=tk.LEFT)
+        button_move = ttk.Button(self.workspace_frame, text="Move question to:", width=18,
+                                 command=self._move_question)
+        button_move.pack(side=tk.LEFT, padx=(20, 0))
+        self.move_combobox = ttk.Combobox(self.workspace_frame, state="readonly", width=40)
+        self.move_combobox.pack(side=tk.LEFT)
+        button_categories = ttk.Button(self.workspace_frame, text="Categories...", width=14,
+                                       command=self._show_categories)
+        button_categories.pack(side=tk.LEFT, padx=(20, 0))
+        
         # GUI elements for the question
         cq = self.questions[self.cqi]
         self.question_frame = QuestionFrame(self.window, cq)
@@ -197,6 +495,7 @@ class QuestionCreator:
         button_next = ttk.Button(button_frame, text="next >", width=10, command=self._next_question)
         button_next.pack(side=tk.LEFT)
     
+    @instrumentation.timed("QuestionCreator._reload")
     def _reload(self):
         cq = self.questions[self.cqi]
         
@@ -204,53 +503,63 @@ class QuestionCreator:
         self.question_frame.set_state(cq)
         self.question_frame.id_label.config(text=f"Q {self.cqi + 1}/{len(self.questions)}:")
         
-        # question answers GUI elements updates
-        # special handling in case the new current question has fewer or more answers
-        diff = len(cq.answers) - self.answers_frame.n_answers()
-        if diff > 0:
-            # must add answer frames for the missing answers (no need to add the answers
-            # from the question here, since this is done below (setting answers) anyway)
-            for i in range(diff):
-                self.answers_frame.add_answer()
-        elif diff < 0:
-            # must remove the superfluous answer frames
-            for i in range(abs(diff)):
-                self.answers_frame.remove_answer()
-        # setting answers
-        assert len(cq.answers) == self.answers_frame.n_answers()
+        # question answers GUI elements updates; existing answer frames are reused, and
+        # missing/superfluous ones are taken from/returned to the pool of answer frames
+        n_frames = self.answers_frame.n_answers()
         for frame, answer in zip(self.answers_frame.frames, cq.answers):
             frame.set_state(answer)
+        for answer in cq.answers[n_frames:]:
+            self.answers_frame.add_answer(answer)
+        for _ in range(n_frames - len(cq.answers)):
+            self.answers_frame.remove_answer()
+        assert len(cq.answers) == self.answers_frame.n_answers()
+        self.answers_frame.reset_modified()
+        
+        self.question_list.set_current(self.cqi)
     
+    @instrumentation.timed("QuestionCreator._save_changes")
     def _save_changes(self, validate: bool = True):
+        if not self.questions:
+            return True  # nothing to save (e.g., while the first question of a file is loading)
         cq = self.questions[self.cqi]
         
-        mode, category, text = self.question_frame.get_state()
-        answers = self.answers_frame.get_state()
-        
-        # if there are not already changes, detect any changes before overwriting the current question
-        if not self.changes:
-            # TODO: maybe make a copy, overwrite the copy and compare original with changed copy using ==
-            self.changes = cq.mode != mode or cq.category != category or cq.text != text or len(cq.answers) != len(
-                answers) or any([a1 != a2 for a1, a2 in zip(cq.answers, answers)])
+        # only the modified widgets are read back, and only the modified fields are written
+        fields = self.question_frame.get_changes()
+        answers = self.answers_frame.get_changes()
         
-        cq.mode = mode
-        cq.category = category
-        cq.text = text
-        cq.answers = answers
+        modified = bool(fields) or answers is not None
+        if modified:
+            # if there are not already changes, detect any changes before overwriting the current question
+            if not self.changes:
+                self.changes = any([getattr(cq, name) != value for name, value in fields.items()]) or (
+                        answers is not None and list(cq.answers) != answers)
+            if "mode" in fields:
+                cq.mode = fields["mode"]
+            if "category" in fields:
+                cq.category = fields["category"]
+            if "text" in fields:
+                cq.text = fields["text"]
+            if answers is not None:
+                cq.answers = answers
+            # the indexes of the question bank (or the database of a question store) and the search
+            # index must reflect the changes
+            if "mode" in fields or "category" in fields or isinstance(self.questions, QuestionStore):
+                self.questions.update(self.cqi)
+            if self.search_index is not None and ("text" in fields or answers is not None):
+                self.search_index.update(cq)
+            self.question_frame.reset_modified()
+            self.answers_frame.reset_modified()
         
         if validate:
-            if cq.mode == Question.MODE_SINGLE and len([a for a in cq.answers if a.correct]) != 1:
+            # same rules as for parsing questions, where all problems are shown at once
+            problems = check_question(cq)
+            if problems:
                 showerror(title="Error: Could not save changes",
-                          message=f"Must have exactly one correct answer if question mode is '{cq.mode}'.")
+                          message="\n".join(message for _, message in problems))
                 return False
-            if not cq.text.strip():
-                showerror(title="Error: Could not save changes", message=f"Main question text must not be empty.")
-                return False
-            for answer in cq.answers:
-                if not answer.text.strip():
-                    showerror(title="Error: Could not save changes", message=f"Answer texts must not be empty.")
-                    return False
         
+        if modified:
+            self.journal.update(self.cqi, cq)
         return True
     
     def _add_new_question(self):
@@ -259,75 +568,505 @@ class QuestionCreator:
             save_successful = self._save_changes()
             if not save_successful:
                 return
-        question = QuestionCreator.create_new_question(self.questions[self.cqi])
-        self.cqi += 1  # insert it after the current question, which is more logical
+            question = QuestionCreator.create_new_question(self.questions[self.cqi])
+            self.cqi += 1  # insert it after the current question, which is more logical
+        else:
+            # no question was loaded yet (see _open_file), so the new question becomes the first one
+            question = QuestionCreator.create_new_question()
+            self.cqi = 0
         self.questions.insert(self.cqi, question)
+        if self.search_index is not None:
+            self.search_index.add(question)
+        self.journal.insert(self.cqi, question)
         self.changes = True
         self._reload()
     
     def _remove_question(self):
+        if not self.questions:
+            return  # no question was loaded yet (see _open_file)
         yes = askyesno(title="Confirmation", message="Are you sure you want to remove the current question?")
         if yes:
-            self.questions.pop(self.cqi)
-            if not self.questions:
-                # if the last question was removed, add a new empty one, so we always
-                # have one active question to avoid running out of index bounds
-                self.questions.append(QuestionCreator.create_new_question())
-            elif self.cqi > len(self.questions) - 1:
+            question = self.questions.pop(self.cqi)
+            if self.search_index is not None:
+                self.search_index.remove(question)
+            self.journal.remove(self.cqi)
+            if self.cqi > len(self.questions) - 1:
                 # if the question at the end of the list was removed, reduce the
                 # current question index by 1 to avoid running out of index bounds
                 self.cqi -= 1
+            # in lazy mode, the new current question might be invalid (see _show_question), in
+            # which case the nearest valid question is shown
+            self.cqi = self._nearest_valid_question(self.cqi)
+            if self.cqi is None:
+                # if the last (valid) question was removed, add a new empty one, so we always
+                # have one active question to avoid running out of index bounds
+                self.cqi = len(self.questions)
+                self.questions.append(QuestionCreator.create_new_question())
+                if self.search_index is not None:
+                    self.search_index.add(self.questions[self.cqi])
+                self.journal.insert(self.cqi, self.questions[self.cqi])
             self.changes = True
             self._reload()
     
+    def _has_unsaved_changes(self) -> bool:
+        if self.workspace is not None:
+            # the workspace only knows about the changes of the current file once another file is
+            # selected (see _select_file)
+            return self.changes or any(f != self.file for f in self.workspace.changed_files())
+        # changes of a question store are committed immediately (see QuestionStore)
+        return self.changes and not isinstance(self.questions, QuestionStore)
+    
     def _open_file(self, file=None):
-        if self.changes:
+        if self.workspace is not None:
+            # only files of the workspace can be opened in workspace mode
+            if file is None:
+                file = askopenfilename(initialdir=self.workspace.directory,
+                                       filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")])
+            if not file:
+                return
+            if file not in self.workspace:
+                showerror(title="Error", message=f"Only files of the workspace '{self.workspace.directory}' can "
+                                                 f"be opened.")
+                return
+            self._select_file(self.workspace.path(file))
+            return
+        if self._has_unsaved_changes():
             yes = askyesno(title="Unsaved changes", message="There are unsaved changes in the current file. Do you "
                                                             "want to open a new file anyway (changes are lost)?")
             if not yes:
                 return
         if file is None:
-            file = askopenfilename(filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")])
+            file = askopenfilename(filetypes=[("Text Files", "*.txt"), ("Question Stores", f"*{STORE_SUFFIX}"),
+                                              ("All Files", "*.*")])
         if not file:
             return
+        self._cancel_loading()
+        # the file is parsed in a background thread, and the questions are added as soon as
+        # they are available (see _poll_loading); the previous state is restored if loading fails
+        self.loading_previous = (self.file, self.questions, self.search_index, self.cqi, self.changes, self.watcher,
+                                 self.journal)
         self.file = file
-        try:
-            questions = inout.read_gift(file)
-        except (ValueError, FileNotFoundError) as e:
-            showerror(title="Error", message=f"Could not open file:\n\n{e}")
+        self.watcher = None
+        # edits while loading are buffered and only recorded once the file is loaded (see
+        # _open_journal); they can be applied to the entire file, since loading only appends
+        self.journal = Journal(on_error=self._on_journal_error)
+        self.journal.pause()
+        self.search_index = None
+        self.cqi = 0
+        self.changes = False
+        if self.lazy or file.lower().endswith(STORE_SUFFIX):
+            # only the offsets of the blocks (or the row ids of a question store) are determined, which
+            # is fast enough to not require a background thread; the first question is read right away
+            # to detect invalid files
+            try:
+                if file.lower().endswith(STORE_SUFFIX):
+                    self.questions = QuestionStore(file)
+                else:
+                    self.questions = LazyQuestionBank(file)
+                if self.questions:
+                    self.questions[0]
+            except (ValueError, OSError, sqlite3.Error) as e:
+                self._finish_loading(e)
+                return
+            self.question_list.set_questions(self.questions)
+            self._finish_loading()
+            return
+        self.questions = QuestionBank()
+        self.search_index = SearchIndex()
+        self.question_list.set_questions(self.questions)
+        self.window.title(f"QuestionCreator - {file} (loading...)")
+        self.loading_results = queue.Queue()
+        self.loading_cancel = threading.Event()
+        self.loading = threading.Thread(target=load_questions, daemon=True,
+                                        args=(file, self.cache, self.loading_results, self.loading_cancel))
+        self.loading.start()
+        self.loading_progress.config(value=0)
+        self.loading_frame.pack(side=tk.LEFT)
+        self.window.after(50, self._poll_loading, self.loading_results)
+    
+    def _poll_loading(self, results: queue.Queue, max_batches: int = 20):
+        if self.loading is None or results is not self.loading_results:
+            return  # loading was cancelled
+        # only a limited number of batches is processed at once, so the GUI stays responsive
+        for _ in range(max_batches):
+            try:
+                result = results.get_nowait()
+            except queue.Empty:
+                self.window.after(50, self._poll_loading, results)
+                return
+            if isinstance(result, tuple):
+                questions, progress = result
+                first = not self.questions
+                self.questions.extend(questions)
+                if self.search_index is not None:
+                    self.search_index.extend(questions)
+                self.loading_progress.config(value=progress)
+                if first and self.questions:
+                    self._reload()
+            else:
+                self._finish_loading(result)
+                return
+        self.question_frame.id_label.config(text=f"Q {self.cqi + 1}/{len(self.questions)}:")
+        self.question_list.refresh()
+        self.window.after(1, self._poll_loading, results)
+    
+    def _finish_loading(self, error: Exception = None):
+        self.loading = None
+        self.loading_frame.pack_forget()
+        if error is None and not self.questions:
+            error = "The requested file does not contain any questions."
+        if error is not None:
+            showerror(title="Error", message=f"Could not open file:\n\n{error}")
+            self._restore_previous()
             # set window to be focused so key binds will work again
             self.window.focus_force()
         else:
-            if not questions:
-                showerror(title="Error", message=f"The requested file does not contain any questions.")
-                # set window to be focused so key binds will work again
-                self.window.focus_force()
+            # the journal of the previous file is not needed anymore (its changes were discarded)
+            self.loading_previous[-1].discard()
+            self.loading_previous = None
+            self._open_journal()
+            self._start_watcher()
+            self.window.title(f"QuestionCreator - {self.file}")
+            self._reload()
+    
+    def _open_journal(self):
+        if isinstance(self.questions, QuestionStore):
+            # changes are committed immediately, so there is nothing to recover (and nothing to record)
+            self.journal.resume()
+            return
+        # unsaved changes of a previous session (e.g., after a crash) are recovered from the journal
+        append = False
+        try:
+            records = read_journal(self.file)
+        except (OSError, ValueError) as e:
+            records = None
+            showerror(title="Error", message=f"Could not recover unsaved changes (they are discarded):\n\n{e}")
+        # the records refer to the questions of the file, so they cannot be applied if the
+        # questions were already edited while loading; in this case, the journal is only replaced
+        # if the user agrees, otherwise, the edits are not recorded (until the file is saved)
+        if records and self.changes:
+            yes = askyesno(title="Unsaved changes", message=f"There are {len(records)} unsaved changes from a "
+                                                            f"previous session, which cannot be recovered, since "
+                                                            f"the questions were already changed while loading. Do "
+                                                            f"you want to discard them?\n\nOtherwise, they are "
+                                                            f"kept until the file is saved (e.g., to recover them "
+                                                            f"after reopening the file), and your current changes "
+                                                            f"cannot be recovered after a crash.")
+            if not yes:
+                self.journal.resume()
+                return
+        elif records:
+            yes = askyesno(title="Unsaved changes", message=f"There are {len(records)} unsaved changes from a "
+                                                            f"previous session. Do you want to recover them?")
+            if yes:
+                # applied to a copy, so the questions remain unchanged if the journal is invalid
+                if isinstance(self.questions, LazyQuestionBank):
+                    questions = self.questions.copy()
+                else:
+                    questions = QuestionBank(self.questions)
+                try:
+                    replay(records, questions)
+                except ValueError as e:
+                    showerror(title="Error", message=f"Could not recover unsaved changes (they are discarded):"
+                                                     f"\n\n{e}")
+                else:
+                    self.questions = questions
+                    self.search_index = None if isinstance(questions, LazyQuestionBank) else SearchIndex(questions)
+                    self.cqi = min(self.cqi, len(questions) - 1)
+                    self.question_list.set_questions(questions, self.cqi)
+                    self.changes = True
+                    append = True
+        self.journal.resume(self.file, append=append)
+    
+    def _open_workspace(self, directory):
+        try:
+            workspace = Workspace(directory, cache=self.cache, on_reorder=self._on_workspace_reorder)
+        except (ValueError, OSError, UnicodeDecodeError) as e:
+            showerror(title="Error", message=f"Could not open directory:\n\n{e}")
+            return
+        if not workspace.files:
+            showerror(title="Error", message="The requested directory does not contain any GIFT files.")
+            return
+        self.workspace = workspace
+        names = [os.path.relpath(f, directory) for f in workspace.files]
+        self.file_combobox.config(values=names)
+        self.move_combobox.config(values=names)
+        self.workspace_frame.pack(side=tk.TOP, before=self.question_list)
+        self._select_file(workspace.files[0])
+    
+    @instrumentation.timed("QuestionCreator._select_file")
+    def _select_file(self, file):
+        # workspace mode: shows the questions of another file of the workspace, which is only parsed
+        # when it is selected for the first time (or again after it was evicted, see Workspace); the
+        # previous file keeps its unsaved changes and its journal in the meantime
+        if file == self.file:
+            return
+        if self.file is not None:
+            if not self._save_changes():
+                self.file_combobox.current(self.workspace.files.index(self.file))
+                return
+            self._wait_for_saving()
+            self.workspace.set_bank(self.file, self.questions, self.changes)
+        try:
+            questions = self.workspace.bank(file)
+        except (ValueError, OSError, UnicodeDecodeError) as e:
+            showerror(title="Error", message=f"Could not open file:\n\n{e}")
+            if self.file is not None:
+                self.file_combobox.current(self.workspace.files.index(self.file))
+            return
+        if self.file is not None:
+            self.journals[self.file] = self.journal
+            self.positions[self.file] = self.cqi
+        self.file = file
+        self.questions = questions
+        self.search_index = None  # built on demand (see _get_search_index)
+        self.changes = self.workspace.is_changed(file)
+        self.cqi = min(self.positions.pop(file, 0), len(questions) - 1)
+        self.journal = self.journals.pop(file, None)
+        if self.journal is None:
+            # selected for the first time, so unsaved changes of a previous session can be recovered
+            self.journal = Journal(on_error=self._on_journal_error)
+            self.journal.pause()
+            self._open_journal()
+            if self.questions is not questions:
+                self.workspace.set_bank(file, self.questions, self.changes)
+        self._start_watcher()
+        self.question_list.set_questions(self.questions, self.cqi)
+        self.file_combobox.current(self.workspace.files.index(file))
+        self.window.title(f"QuestionCreator - {file}")
+        self._reload()
+    
+    @instrumentation.timed("QuestionCreator._move_question")
+    def _move_question(self):
+        # workspace mode: moves the current question to the end of the selected file, where only
+        # the two files are written (see Workspace.move)
+        index = self.move_combobox.current()
+        if index < 0:
+            showerror(title="Error", message="Select the file to move the question to.")
+            return
+        target = self.workspace.files[index]
+        if not self._save_changes():
+            return
+        yes = askyesno(title="Confirmation", message=f"Are you sure you want to move the current question to "
+                                                     f"'{target}'? Both files are saved (including all their "
+                                                     f"unsaved changes).")
+        if not yes:
+            return
+        self._wait_for_saving()
+        self.workspace.set_bank(self.file, self.questions, self.changes)
+        question = self.questions[self.cqi]
+        # the questions might be rearranged when the file is written (see Workspace._write), so the
+        # current question (or the next one if it was moved) is looked up afterwards
+        neighbour = self.questions[self.cqi + 1 if self.cqi + 1 < len(self.questions) else self.cqi - 1]
+        try:
+            self.workspace.move(self.file, [self.cqi], target)
+        except (ValueError, OSError) as e:
+            showerror(title="Error", message=f"Could not move the question:\n\n{e}")
+        position = self.questions.position(question)
+        if position is None:
+            if self.search_index is not None:
+                self.search_index.remove(question)
+            position = self.questions.position(neighbour)
+        self.cqi = position
+        # the saved files contain all changes so far, so their journals start over (see _poll_saving)
+        self.changes = self.workspace.is_changed(self.file)
+        if not self.changes:
+            self.journal.resume(self.file)
+        if target in self.journals and not self.workspace.is_changed(target):
+            self.journals[target].resume(target)
+        self._start_watcher()
+        self.question_list.set_questions(self.questions, self.cqi)
+        self._reload()
+    
+    def _show_categories(self):
+        # workspace mode: which categories are in which files (see Workspace.categories)
+        self.workspace.set_bank(self.file, self.questions, self.changes)
+        lines = []
+        for category, files in self.workspace.categories().items():
+            names = ", ".join(os.path.relpath(f, self.workspace.directory) for f in files)
+            lines.append(f"{'(no category)' if category is None else category.name}: {names}")
+        window = tk.Toplevel(self.window)
+        window.title("Categories")
+        textbox = ScrolledText(window, width=100, height=20)
+        textbox.insert("1.0", "\n".join(lines))
+        textbox.config(state=tk.DISABLED)
+        textbox.pack(fill=tk.BOTH, expand=True)
+    
+    def _start_watcher(self, questions: list[Question] = None, snapshot: list[Question] = None):
+        # the watcher is based on the current version of the file, so it is started whenever the
+        # file was read or written (see FileWatcher for the questions and the snapshot)
+        self.watcher = None
+        if not self.watch or not isinstance(self.questions, QuestionBank):
+            return
+        try:
+            self.watcher = FileWatcher(self.file, self.questions if questions is None else questions, snapshot)
+        except (ValueError, OSError, UnicodeDecodeError) as e:
+            showerror(title="Error", message=f"Could not watch the file for changes:\n\n{e}")
+    
+    @instrumentation.timed("QuestionCreator._merge_file_changes")
+    def _merge_file_changes(self, max_conflicts: int = 20):
+        # the file was changed by another program, so the changes are merged into the questions,
+        # where unsaved edits are kept (see FileWatcher.merge) and the current question remains the
+        # same (or its new version); the widgets are saved first, so their edits are kept as well
+        self._save_changes(validate=False)
+        cq = self.questions[self.cqi]
+        try:
+            merge = self.watcher.merge(self.questions)
+        except (ValueError, OSError, UnicodeDecodeError) as e:
+            showerror(title="Error", message=f"The file was changed, but could not be reloaded (the questions "
+                                             f"remain unchanged):\n\n{e}")
+            return
+        if not merge.changed:
+            return
+        previous = self.questions
+        self.questions = QuestionBank(merge.questions)
+        if self.search_index is not None:
+            merged_ids = {id(q) for q in merge.questions}
+            previous_ids = {id(q) for q in previous}
+            for q in previous:
+                if id(q) not in merged_ids:
+                    self.search_index.remove(q)
+            for q in merge.questions:
+                if id(q) not in previous_ids:
+                    self.search_index.add(q)
+        # the journal is based on the new version of the file, so it starts over with the unsaved
+        # changes, i.e., the differences between the file and the merged questions
+        self.journal.resume(self.file)
+        for j in reversed(merge.removed):
+            self.journal.remove(j)
+        for i in merge.modified:
+            if merge.origins[i] is None:
+                self.journal.insert(i, merge.questions[i])
             else:
-                self.questions = questions
-                self.window.title(f"QuestionCreator - {file}")
-                self.cqi = 0
-                self.changes = False
-                self._reload()
+                self.journal.update(i, merge.questions[i])
+        self.changes = bool(merge.modified or merge.removed)
+        if self.workspace is not None:
+            self.workspace.set_bank(self.file, self.questions, self.changes)
+        position = merge.position(cq)
+        self.cqi = min(self.cqi, len(self.questions) - 1) if position is None else position
+        self.question_list.set_questions(self.questions, self.cqi)
+        self._reload()
+        if merge.conflicts:
+            conflicts = merge.conflicts[:max_conflicts]
+            if len(merge.conflicts) > max_conflicts:
+                conflicts.append(f"... and {len(merge.conflicts) - max_conflicts} more")
+            showwarning(title="Conflicts", message="The file was changed by another program, which conflicts with "
+                                                   "unsaved changes:\n\n" + "\n".join(conflicts))
+    
+    def _cancel_loading(self):
+        if self.loading is None:
+            return
+        self.loading_cancel.set()
+        self.loading = None
+        self.loading_frame.pack_forget()
+        self._restore_previous()
+    
+    def _restore_previous(self):
+        (self.file, self.questions, self.search_index, self.cqi, self.changes, self.watcher,
+         self.journal) = self.loading_previous
+        self.loading_previous = None
+        self.question_list.set_questions(self.questions, self.cqi)
+        self.window.title("QuestionCreator" if self.file is None else f"QuestionCreator - {self.file}")
+        self._reload()
     
     def _save_file(self, file=None):
+        if self.loading is not None:
+            showerror(title="Error", message="The current file is still loading.")
+            return
         if not self.questions:
             showerror(title="Error", message=f"No questions found.")
             return
         save_successful = self._save_changes()
         if not save_successful:
             return
+        if file is None and self.workspace is not None:
+            showerror(title="Error", message="In workspace mode, questions can only be saved to their file (or "
+                                             "moved to other files of the workspace).")
+            return
         if file is None:
             file = asksaveasfilename(defaultextension="txt", filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")])
         if not file:
             return
+        self._wait_for_saving()
+        if isinstance(self.questions, QuestionStore):
+            # all changes are already stored, so saving under another name exports the questions to
+            # a GIFT file, while the store remains the opened file
+            if os.path.abspath(file) != os.path.abspath(self.questions.file):
+                self.saving_results = queue.Queue()
+                self.saving = threading.Thread(target=write_questions, args=(file, self.questions,
+                                                                             self.saving_results))
+                self.saving.start()
+                self.window.title(f"QuestionCreator - {self.file} (exporting...)")
+                self.window.after(50, self._poll_saving, self.saving_results)
+            return
         self.file = file
+        self._group_questions()
+        # the file is written in a background thread based on a snapshot of the questions, so
+        # the questions can be edited in the meantime; such changes (since the snapshot) are
+        # detected as usual, which is why there are no changes from now on (unless saving fails)
+        if isinstance(self.questions, LazyQuestionBank):
+            snapshot = self.questions.copy()
+        else:
+            snapshot = [q.copy() for q in self.questions]
+            self.saving_snapshot = (list(self.questions), snapshot)
+        self.changes = False
+        self.journal.pause()
+        self.saving_results = queue.Queue()
+        self.saving = threading.Thread(target=write_questions, args=(file, snapshot, self.saving_results))
+        self.saving.start()
+        self.window.title(f"QuestionCreator - {file} (saving...)")
+        self.window.after(50, self._poll_saving, self.saving_results)
+    
+    def _group_questions(self):
+        # files are saved grouped by category, so the questions are rearranged into this order
+        # beforehand (also in the journal), i.e., the positions of the questions in memory and
+        # those in the journal always match the saved file
+        order = list(self.questions.grouped_positions())
+        if order == list(range(len(order))):
+            return
+        self.questions.reorder(order)
+        self.journal.reorder(order)
+        self.cqi = order.index(self.cqi)
+        self.question_list.set_questions(self.questions, self.cqi)
+        self._reload()
+    
+    def _on_workspace_reorder(self, file, order: list[int]):
+        # the questions of a file of the workspace were rearranged before it was written (see
+        # Workspace._write), which is recorded in its journal (same as _group_questions)
+        journal = self.journal if file == self.file else self.journals.get(file)
+        if journal is not None:
+            journal.reorder(order)
+    
+    def _poll_saving(self, results: queue.Queue):
+        if self.saving is None or results is not self.saving_results:
+            return  # already processed (see _wait_for_saving)
         try:
-            inout.write_gift(file, self.questions)
-        except ValueError as e:
-            showerror(title="Error", message=f"Error when writing file:\n\n{e}")
+            error = results.get_nowait()
+        except queue.Empty:
+            self.window.after(50, self._poll_saving, results)
+            return
+        self.saving = None
+        if isinstance(self.questions, QuestionStore):
+            # only an export (see _save_file), which does not affect the store
+            if error is not None:
+                showerror(title="Error", message=f"Error when exporting file:\n\n{error}")
+        elif error is not None:
+            self.changes = True
+            self.journal.resume()
+            showerror(title="Error", message=f"Error when writing file:\n\n{error}")
         else:
-            self.window.title(f"QuestionCreator - {file}")
-            self.changes = False
+            # the saved file contains all edits so far, so the journal starts over (compaction)
+            self.journal.resume(self.file)
+            self._start_watcher(*self.saving_snapshot or ())
+            if self.workspace is not None:
+                self.workspace.set_bank(self.file, self.questions, self.changes)
+        self.saving_snapshot = None
+        self.window.title(f"QuestionCreator - {self.file}")
+    
+    def _wait_for_saving(self):
+        if self.saving is not None:
+            self.saving.join()
+            self._poll_saving(self.saving_results)
     
     def _prev_question(self):
         self._move_to_question(-1)
@@ -335,6 +1074,7 @@ class QuestionCreator:
     def _next_question(self):
         self._move_to_question(1)
     
+    @instrumentation.timed("QuestionCreator._move_to_question")
     def _move_to_question(self, step):
         if not self.questions:
             showerror(title="Error", message=f"No questions found.")
@@ -342,19 +1082,107 @@ class QuestionCreator:
         save_successful = self._save_changes()
         if not save_successful:
             return
-        self.cqi = (self.cqi + step) % len(self.questions)
+        self._show_question((self.cqi + step) % len(self.questions))
+    
+    def _find_next(self):
+        if not self._save_changes():
+            return
+        try:
+            search_index = self._get_search_index()
+        except ValueError as e:
+            showerror(title="Error", message=f"Could not search the questions:\n\n{e}")
+            return
+        matches = sorted(self.questions.position(q) for q in search_index.search(self.search_entry.get()))
+        if not matches:
+            self.search_label.config(text="No matches")
+            return
+        # jump to the next match after the current question (or to the first one again)
+        i = bisect.bisect_right(matches, self.cqi) % len(matches)
+        self.search_label.config(text=f"Match {i + 1}/{len(matches)}")
+        self.cqi = matches[i]
+        self._reload()
+    
+    @instrumentation.timed("QuestionCreator._go_to_question")
+    def _go_to_question(self, index: int):
+        if index == self.cqi:
+            return
+        if not self._save_changes():
+            return
+        self._show_question(index)
+    
+    def _show_question(self, index: int) -> bool:
+        # in lazy mode, questions are only parsed when they are accessed, so this is where invalid
+        # questions are detected; the current question remains unchanged in this case
+        try:
+            self.questions[index]
+        except ValueError as e:
+            showerror(title="Error", message=f"Could not show question {index + 1}:\n\n{e}")
+            return False
+        self.cqi = index
         self._reload()
+        return True
+    
+    def _nearest_valid_question(self, index: int):
+        # returns the index of the nearest question which can be parsed (see _show_question)
+        # or None if there is no such question
+        for distance in range(len(self.questions)):
+            for i in (index - distance, index + distance):
+                if 0 <= i < len(self.questions):
+                    try:
+                        self.questions[i]
+                    except ValueError:
+                        continue
+                    return i
+        return None
+    
+    def _get_search_index(self) -> SearchIndex:
+        # built on demand, since this requires all questions (i.e., parsing them in lazy mode)
+        if self.search_index is None:
+            self.search_index = SearchIndex(self.questions)
+        return self.search_index
     
     def _on_close(self):
         save_successful = self._save_changes()
         if not save_successful:
             return
-        if self.changes:
+        if self._has_unsaved_changes():
             yes = askyesno(title="Unsaved changes", message="There are unsaved changes in the current file. Do you "
                                                             "want to quit anyway (changes are lost)?")
             if not yes:
                 return
+        self.loading_cancel.set()
+        self._wait_for_saving()
+        # a clean exit, so there is nothing to recover (changes are either saved or discarded)
+        self.journal.discard()
+        for journal in self.journals.values():
+            journal.discard()
+        if isinstance(self.questions, QuestionStore):
+            self.questions.close()
         self.window.destroy()
     
+    def _on_journal_error(self, error: OSError):
+        # the journal could not be written, so it is disabled for the file (see Journal), which is
+        # only reported once, since editing is not affected otherwise
+        showwarning(title="Warning", message=f"Unsaved changes cannot be recorded, so they cannot be recovered "
+                                             f"after a crash (save regularly):\n\n{error}")
+    
+    def _sync_journal(self, interval: int = 1000):
+        # the journal is synced to disk periodically (instead of after each edit), so the costs
+        # of syncing are shared among all edits within the interval (including the last edits of
+        # the other files in workspace mode)
+        for journal in [self.journal, *self.journals.values()]:
+            try:
+                journal.sync()
+            except OSError:
+                pass  # the journal is only a safety net, so editing must not be interrupted
+        self.window.after(interval, self._sync_journal, interval)
+    
+    def _poll_watcher(self, interval: int = 1000):
+        # the file is polled (only its size and modification time, see FileWatcher.changed), which
+        # works on any platform and file system; it is not checked while loading or saving
+        if self.watcher is not None and self.loading is None and self.saving is None and self.watcher.changed():
+            self._merge_file_changes()
+        self.window.after(interval, self._poll_watcher, interval)
+    
     def start(self):
         self.window.mainloop()
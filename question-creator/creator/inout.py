@@ -1,41 +1,121 @@
-import re
+import itertools
+from typing import Iterable, Iterator
 
-from data import Question, Category
+import instrumentation
+from data import Question, QuestionBank, Category
 
 
-def read_gift(file, encoding="utf8"):
+@instrumentation.timed("inout.read_gift")
+def read_gift(file, encoding="utf8") -> QuestionBank:
+    return QuestionBank(iter_gift(file, encoding))
+
+
+def iter_gift(file, encoding="utf8") -> Iterator[Question]:
+    # lazily yields the questions of the file, so only the current block (and not the
+    # entire file content) has to be kept in memory
     with open(file, encoding=encoding) as f:
-        content = f.read()
-    questions = []
-    # TODO: currently relies on blocks being separated by newline characters
-    blocks = re.split(r"^\n+", content, flags=re.MULTILINE)
+        yield from parse_gift(f)
+
+
+def parse_gift(lines: Iterable[str]) -> Iterator[Question]:
     category = None
-    for block in blocks:
-        # skip empty blocks (e.g., due to empty lines at the end of the file)
-        if not block:
-            continue
+    for _, block in iter_blocks(lines):
+        if instrumentation.enabled:
+            instrumentation.count("blocks split")
         if Category.extract_category_pattern(block) is not None:
             category = Category.from_str(block)
         else:
             # assume it is a text block containing a question
             q = Question.from_str(block)
             q.category = category
-            questions.append(q)
-    return questions
+            if instrumentation.enabled:
+                instrumentation.count("questions parsed")
+            yield q
+
+
+def iter_blocks(lines: Iterable[str]) -> Iterator[tuple[int, str]]:
+    # yields (line number of the first block line, block) tuples, where blocks are
+    # separated by (at least) one empty line; empty blocks are skipped
+    # TODO: currently relies on blocks being separated by newline characters
+    block_lines = []
+    start = 1
+    for i, line in enumerate(lines, start=1):
+        if line == "\n":
+            if block_lines:
+                yield start, "".join(block_lines)
+                block_lines = []
+            continue
+        if not block_lines:
+            start = i
+        block_lines.append(line)
+    if block_lines:
+        yield start, "".join(block_lines)
 
 
-def write_gift(file, questions: list[Question], encoding="utf8"):
-    if len(questions) == 0:
+@instrumentation.timed("inout.write_gift")
+def write_gift(file, questions: Iterable[Question], encoding="utf8", group_categories: bool = True,
+               chunk_size: int = 1 << 20, drop_duplicates: bool = False, verbatim: bool = True):
+    # "questions" can be any iterable (e.g., a generator), which is consumed exactly once;
+    # to raise an error before the file is touched, the first question is fetched up front;
+    # with "drop_duplicates", only the first of exact duplicates is written (see dedup.unique);
+    # without "verbatim", pristine questions are converted as well (normalization)
+    if drop_duplicates:
+        # imported here, since dedup reads files with this module
+        import dedup
+        
+        questions = dedup.unique(questions)
+    if group_categories:
+        questions = group_by_category(questions)
+    questions = iter(questions)
+    first = next(questions, None)
+    if first is None:
         raise ValueError("There must at least be one question.")
-    # first sort the questions according to their categories then only print the category
-    # once and all question from this category afterwards (until the next category); the
-    # empty string is just for sorting a missing category (None); this will put questions
-    # without category at the top of the file and without any corresponding category header
-    questions = sorted(questions, key=lambda q: "" if q.category is None else q.category.name)
-    category = None
+    questions = itertools.chain([first], questions)
+    # the individual parts are collected and written in large chunks
+    chunk = []
+    size = 0
     with open(file, "w", encoding=encoding) as f:
-        for question in questions:
-            if category != question.category:
-                category = question.category
-                print(category.to_gift_format(), file=f, end="\n\n")
-            print(question.to_gift_format(), file=f, end="\n\n")
+        for part in iter_gift_parts(questions, verbatim):
+            chunk.append(part)
+            size += len(part)
+            if size >= chunk_size:
+                f.writelines(chunk)
+                chunk = []
+                size = 0
+        f.writelines(chunk)
+        if instrumentation.enabled:
+            instrumentation.count("bytes written", f.tell())
+
+
+def iter_gift_parts(questions: Iterable[Question], verbatim: bool = True) -> Iterator[str]:
+    # questions are written in the given order, and a category header is written whenever
+    # the category changes; a missing category (None) does not have any header, so such
+    # questions should be placed at the top of the file (see group_by_category); pristine
+    # questions are written as their source if "verbatim" (see Question.source)
+    category = None
+    for question in questions:
+        if category != question.category:
+            category = question.category
+            if category is not None:
+                yield category.to_gift_format()
+                yield "\n\n"
+        source = question.source
+        yield source if verbatim and source is not None else question.to_gift_format()
+        yield "\n\n"
+
+
+def group_by_category(questions: Iterable[Question]) -> Iterator[Question]:
+    # results in the same order as sorting the questions according to their categories, but
+    # only the (few) category names are sorted; the empty string is just for sorting a missing
+    # category (None); this will put questions without category at the top
+    if isinstance(questions, QuestionBank):
+        # the positions of the questions of each category are already known
+        for i in questions.grouped_positions():
+            yield questions[i]
+        return
+    # single pass which collects the questions of each category (keeping their order)
+    groups = {}
+    for q in questions:
+        groups.setdefault("" if q.category is None else q.category.name, []).append(q)
+    for name in sorted(groups):
+        yield from groups.pop(name)
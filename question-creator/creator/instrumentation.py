@@ -0,0 +1,154 @@
+import atexit
+import cProfile
+import functools
+import importlib
+import json
+import os
+import pickle
+import threading
+import time
+from typing import Optional
+
+# name of the environment variable which enables the instrumentation (value = output file)
+ENV_VAR = "QUESTION_CREATOR_PROFILE"
+
+# instrumentation is either enabled for the entire process or not at all; functions are only
+# wrapped (see timed and counted) if it is enabled when they are decorated, i.e., when their
+# module is imported, so disabled instrumentation does not cost anything; this is why enable
+# must be called before any other module of this package is imported
+enabled = False
+output: Optional[str] = None
+timings: dict[str, list] = {}  # name -> [calls, total seconds, max seconds]
+counters: dict[str, int] = {}
+_profiler: Optional[cProfile.Profile] = None
+_lock = threading.Lock()
+
+
+def enable(file: str):
+    # the results are written to the file on exit, either as JSON (timings and counters) or as
+    # cProfile statistics (if the file ends with ".prof" or ".pstats", see the pstats module);
+    # in the latter case, the functions are not wrapped, since cProfile already measures them
+    # (note that cProfile only measures the main thread, e.g., not the loading thread of the GUI)
+    global enabled, output, _profiler
+    if output is not None:
+        return
+    output = file
+    if file.endswith((".prof", ".pstats")):
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    else:
+        enabled = True
+    atexit.register(dump)
+
+
+def timed(name: str):
+    def decorator(func):
+        if not enabled:
+            return func
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add_timing(name, time.perf_counter() - start)
+        
+        return wrapper
+    
+    return decorator
+
+
+def counted(name: str):
+    def decorator(func):
+        if not enabled:
+            return func
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            count(name)
+            return func(*args, **kwargs)
+        
+        return wrapper
+    
+    return decorator
+
+
+def add_timing(name: str, seconds: float):
+    with _lock:
+        timing = timings.get(name)
+        if timing is None:
+            timings[name] = [1, seconds, seconds]
+        else:
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+
+
+def count(name: str, n: int = 1):
+    # callers in hot paths should check "enabled" first, so disabled instrumentation only
+    # costs this check
+    with _lock:
+        counters[name] = counters.get(name, 0) + n
+
+
+def snapshot() -> tuple[dict, dict]:
+    with _lock:
+        return {name: list(timing) for name, timing in timings.items()}, dict(counters)
+
+
+def merge(other_timings: dict, other_counters: dict):
+    # adds the results of another process (see snapshot)
+    with _lock:
+        for name, (calls, total, max_seconds) in other_timings.items():
+            timing = timings.setdefault(name, [0, 0.0, 0.0])
+            timing[0] += calls
+            timing[1] += total
+            timing[2] = max(timing[2], max_seconds)
+        for name, n in other_counters.items():
+            counters[name] = counters.get(name, 0) + n
+
+
+def init_worker(initializer: str = None, args: bytes = None):
+    # initializer of worker processes (see batch.run_batch), whose results are passed on to the
+    # main process (see snapshot and merge); with the "spawn" start method, workers import all
+    # modules again, so the instrumentation must be enabled before (which is why this is part of
+    # this module, which does not import any other module of this package); forked workers
+    # inherit the results of the main process, which are discarded; another initializer of the
+    # workers can be given as "module.function" with its pickled arguments, which are only
+    # loaded afterwards (see exam.write_variants)
+    global enabled
+    enabled = True
+    reset()
+    if initializer is not None:
+        module, name = initializer.rsplit(".", 1)
+        getattr(importlib.import_module(module), name)(*pickle.loads(args))
+
+
+def reset():
+    with _lock:
+        timings.clear()
+        counters.clear()
+
+
+def report() -> dict:
+    with _lock:
+        return {
+            "timings": {name: {"calls": calls, "total_seconds": total, "mean_seconds": total / calls,
+                               "max_seconds": max_seconds}
+                        for name, (calls, total, max_seconds) in sorted(timings.items())},
+            "counters": dict(sorted(counters.items())),
+        }
+
+
+def dump():
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(output)
+        return
+    with open(output, "w", encoding="utf8") as f:
+        json.dump(report(), f, indent=2)
+
+
+if os.environ.get(ENV_VAR):
+    enable(os.environ[ENV_VAR])
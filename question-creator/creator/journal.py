@@ -0,0 +1,204 @@
+import json
+import os
+from typing import Callable, Optional
+
+from data import Answer, Category, Question, QuestionBank
+
+SUFFIX = ".journal"
+
+
+def journal_path(file) -> str:
+    return f"{file}{SUFFIX}"
+
+
+def question_to_record(question: Question) -> list:
+    return [None if question.category is None else question.category.name, question.title, question.text,
+            question.mode, [[a.text, a.correct] for a in question.answers]]
+
+
+def question_from_record(record: list) -> Question:
+    category_name, title, text, mode, answers = record
+    return Question(category=None if category_name is None else Category(category_name), title=title, text=text,
+                    answers=[Answer(*a) for a in answers], mode=mode)
+
+
+def read_journal(file) -> Optional[list[dict]]:
+    # returns the edit records of the journal of the file (None if there is no journal); the
+    # journal must belong to the current version of the file (i.e., the version it was based
+    # on, see Journal._open), otherwise, its records cannot be applied and a ValueError is raised
+    path = journal_path(file)
+    try:
+        with open(path, encoding="utf8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return None
+    records = []
+    for i, line in enumerate(lines):
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # only the last record may be incomplete (crash while writing it)
+            if i == len(lines) - 1:
+                break
+            raise ValueError(f"Invalid record in line {i + 1} of journal '{path}'.")
+    if not records or records[0].get("op") != "base":
+        raise ValueError(f"Journal '{path}' does not start with a base record.")
+    stat = os.stat(file)
+    if records[0]["size"] != stat.st_size or records[0]["mtime_ns"] != stat.st_mtime_ns:
+        raise ValueError(f"Journal '{path}' does not belong to the current version of '{file}'.")
+    return records[1:]
+
+
+def replay(records: list[dict], questions: QuestionBank):
+    # applies the edit records (in order) to the questions of the file the journal belongs to
+    for record in records:
+        op = record["op"]
+        if op == "reorder":
+            try:
+                questions.reorder(record["order"])
+            except ValueError:
+                raise ValueError(f"Invalid journal record (not a permutation): {record}")
+            continue
+        index = record["index"]
+        if op == "insert":
+            if not 0 <= index <= len(questions):
+                raise ValueError(f"Invalid journal record (index out of range): {record}")
+            questions.insert(index, question_from_record(record["question"]))
+            continue
+        if not 0 <= index < len(questions):
+            raise ValueError(f"Invalid journal record (index out of range): {record}")
+        if op == "remove":
+            del questions[index]
+        elif op == "update":
+            questions[index] = question_from_record(record["question"])
+        else:
+            raise ValueError(f"Invalid journal record (unknown operation): {record}")
+
+
+class Journal:
+    # append-only sidecar file of a GIFT file, which contains one record per edit (JSON lines),
+    # so unsaved edits can be recovered after a crash (see read_journal and replay); records are
+    # written immediately but only synced to disk with sync, which is meant to be called
+    # periodically, so the costs of an edit are independent of the number of questions; if there
+    # is no file yet (None), records are dropped, since there is nothing they could be applied to;
+    # the journal is only a safety net, so if it cannot be written (e.g., in a read-only directory),
+    # it is disabled for the file instead of raising the error (see on_error)
+    
+    def __init__(self, file=None, append: bool = False, on_error: Callable[[OSError], None] = None):
+        self.file = file
+        self.path = None if file is None else journal_path(file)
+        self.append = append  # whether to continue an existing journal (see read_journal)
+        self.paused = False  # records are only buffered while paused (see pause)
+        self.on_error = on_error  # called with the error once the journal could not be written
+        self.error: Optional[OSError] = None  # the error which disabled the journal (None = enabled)
+        self._f = None
+        self._lines: list[str] = []
+        self._unsynced = False
+    
+    def insert(self, index: int, question: Question):
+        self._record({"op": "insert", "index": index, "question": question_to_record(question)})
+    
+    def remove(self, index: int):
+        self._record({"op": "remove", "index": index})
+    
+    def update(self, index: int, question: Question):
+        self._record({"op": "update", "index": index, "question": question_to_record(question)})
+    
+    def reorder(self, order: list[int]):
+        # the questions were rearranged (see QuestionBank.reorder), e.g., before they are saved
+        # grouped by category, so the indexes of subsequent records refer to the new order
+        self._record({"op": "reorder", "order": order})
+    
+    def sync(self):
+        if self._lines and not self.paused:
+            self._write()
+        if self._unsynced:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._unsynced = False
+    
+    def pause(self):
+        # the file is about to be saved; the records of subsequent edits are buffered until it
+        # is known whether the journal can be discarded (saving succeeded) or not (see resume)
+        self.paused = True
+    
+    def resume(self, saved_file=None, append: bool = False):
+        # if saving succeeded, the saved file contains all edits up to pause, so the journal is
+        # replaced by a new one based on the saved file, which only contains the buffered records;
+        # an existing journal of the saved file is removed, unless it should be continued (append)
+        if saved_file is not None:
+            self.discard()
+            if saved_file != self.file:
+                self.error = None
+            self.file = saved_file
+            self.path = journal_path(saved_file)
+            self.append = append
+            if not append:
+                self._remove()
+        self.paused = False
+        if self._lines:
+            self._write()
+    
+    def discard(self):
+        self.close()
+        self.append = False
+        self._remove()
+    
+    def close(self):
+        if self._f is not None:
+            self.sync()
+            self._f.close()
+            self._f = None
+    
+    def _remove(self):
+        if self.path is None:
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+    
+    def _record(self, record: dict):
+        if self.error is not None:
+            return
+        self._lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        if not self.paused:
+            self._write()
+    
+    def _write(self):
+        if self.file is None or self.error is not None:
+            self._lines.clear()
+            return
+        try:
+            if self._f is None:
+                self._open()
+            self._f.writelines(self._lines)
+        except OSError as e:
+            self._fail(e)
+            return
+        self._lines.clear()
+        self._unsynced = True
+    
+    def _fail(self, error: OSError):
+        # the records cannot be written, so they are dropped, and so are all further records
+        self.error = error
+        self._lines.clear()
+        self._unsynced = False
+        if self._f is not None:
+            try:
+                self._f.close()
+            except OSError:
+                pass
+            self._f = None
+        if self.on_error is not None:
+            self.on_error(error)
+    
+    def _open(self):
+        if self.append:
+            self._f = open(self.path, "a", encoding="utf8")
+            return
+        # the base record identifies the version of the file the records must be applied to
+        stat = os.stat(self.file)
+        self._f = open(self.path, "w", encoding="utf8")
+        self._f.write(json.dumps({"op": "base", "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}) + "\n")
+        self.append = True
@@ -0,0 +1,194 @@
+import mmap
+import os
+import re
+import tempfile
+from collections.abc import MutableSequence
+from typing import Iterator, Optional
+
+from data import Category, Question
+
+# a block is a maximal sequence of non-empty lines (same as inout.iter_blocks, where "\r\n" is
+# an empty line as well, since files are read with universal newlines there)
+_BLOCK_RE = re.compile(rb"(?:[^\r\n][^\n]*\n?)+")
+
+
+def scan_blocks(buffer, encoding: str = "utf8") -> tuple[list[tuple[int, int]], list[Optional[Category]]]:
+    # returns the byte spans (start, end) of all question blocks and their categories, without
+    # parsing the questions; only category blocks are decoded and parsed
+    patterns = [p.encode(encoding) for p in Category.PATTERNS]
+    spans = []
+    categories = []
+    category = None
+    for match in _BLOCK_RE.finditer(buffer):
+        start, end = match.span()
+        if any(buffer.find(p, start, end) >= 0 for p in patterns):
+            category = Category.from_str(_decode(buffer[start:end], encoding))
+        else:
+            spans.append((start, end))
+            categories.append(category)
+    return spans, categories
+
+
+def _decode(b: bytes, encoding: str) -> str:
+    s = b.decode(encoding)
+    # same result as reading with universal newlines
+    return s.replace("\r\n", "\n").replace("\r", "\n") if "\r" in s else s
+
+
+class LazyQuestionBank(MutableSequence):
+    # question bank (which can be used like a list) of a memory-mapped GIFT file, where questions
+    # are only parsed when they are accessed; initially, only the byte offsets of the blocks and
+    # the categories are determined (see scan_blocks); when writing, questions which were not
+    # changed (or not even parsed) are written as the original bytes of their blocks
+    
+    def __init__(self, file, encoding: str = "utf8"):
+        self.file = file
+        self.encoding = encoding
+        with open(file, "rb") as f:
+            # an empty file cannot be mapped (the mapping stays valid after closing the file)
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        spans, self._categories = scan_blocks(self._buffer, encoding)
+        # per position: the span of the original block (None if the question was not read from
+        # the file) and the question (None if not parsed yet)
+        self._spans: list[Optional[tuple[int, int]]] = spans
+        self._questions: list[Optional[Question]] = [None] * len(spans)
+        self._ids: Optional[dict[int, int]] = None  # id(question) -> position (built on demand, see position)
+    
+    def __len__(self):
+        return len(self._questions)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        question = self._questions[index]
+        if question is None:
+            question = self._parse(index % len(self))
+        return question
+    
+    def __setitem__(self, index: int, question: Question):
+        index = self._normalize_index(index)
+        self._questions[index] = question
+        self._spans[index] = None
+        self._categories[index] = None
+        self._ids = None
+    
+    def __delitem__(self, index: int):
+        index = self._normalize_index(index)
+        del self._questions[index]
+        del self._spans[index]
+        del self._categories[index]
+        self._ids = None
+    
+    def insert(self, index: int, question: Question):
+        # same semantics as list.insert (indices out of range are clamped)
+        index = min(max(index + len(self) if index < 0 else index, 0), len(self))
+        self._questions.insert(index, question)
+        self._spans.insert(index, None)
+        self._categories.insert(index, None)
+        self._ids = None
+    
+    def update(self, index: int):
+        # there are no indexes which must be kept up to date (same interface as QuestionBank)
+        pass
+    
+    def position(self, question: Question) -> Optional[int]:
+        # position of exactly this question object (not an equal one) or None (same as QuestionBank)
+        if self._ids is None:
+            self._ids = {id(q): i for i, q in enumerate(self._questions) if q is not None}
+        return self._ids.get(id(question))
+    
+    def category(self, index: int) -> Optional[Category]:
+        # does not parse the question
+        question = self._questions[index]
+        return self._categories[index] if question is None else question.category
+    
+    def is_parsed(self, index: int) -> bool:
+        return self._questions[index] is not None
+    
+    def is_untouched(self, index: int) -> bool:
+        # whether the question is still the same as its original block in the file
+        question = self._questions[index]
+        return self._spans[index] is not None and (question is None or question.pristine)
+    
+    def copy(self) -> "LazyQuestionBank":
+        # snapshot which shares the mapped file, where parsed questions are copied (see Question.copy)
+        bank = LazyQuestionBank.__new__(LazyQuestionBank)
+        bank.file = self.file
+        bank.encoding = self.encoding
+        bank._buffer = self._buffer
+        bank._spans = list(self._spans)
+        bank._categories = list(self._categories)
+        bank._questions = [None if q is None else q.copy() for q in self._questions]
+        bank._ids = None
+        return bank
+    
+    def write(self, file, group_categories: bool = True):
+        # same output as inout.write_gift, where untouched questions are copied from the original
+        # file without decoding and encoding them; the file is written to a temporary file first, which then
+        # replaces the target file, since the target file might be the mapped file itself
+        if not self:
+            raise ValueError("There must at least be one question.")
+        positions = self.grouped_positions() if group_categories else range(len(self))
+        directory = os.path.dirname(os.path.abspath(file))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb", buffering=1 << 20) as f:
+                category = None
+                for i in positions:
+                    if category != self.category(i):
+                        category = self.category(i)
+                        if category is not None:
+                            f.write(f"{category.to_gift_format()}\n\n".encode(self.encoding))
+                    if self.is_untouched(i):
+                        start, end = self._spans[i]
+                        # the trailing newline characters are replaced by the usual separator
+                        while end > start and self._buffer[end - 1] in b"\r\n":
+                            end -= 1
+                        f.write(self._buffer[start:end])
+                        f.write(b"\n\n")
+                    else:
+                        question = self[i]
+                        gift = question.source if question.pristine else question.to_gift_format()
+                        f.write(f"{gift}\n\n".encode(self.encoding))
+            os.replace(tmp_path, file)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    
+    def grouped_positions(self) -> Iterator[int]:
+        # same order as inout.group_by_category, but without parsing the questions
+        groups = {}
+        for i in range(len(self)):
+            category = self.category(i)
+            groups.setdefault("" if category is None else category.name, []).append(i)
+        for name in sorted(groups):
+            yield from groups.pop(name)
+    
+    def reorder(self, order: list[int]):
+        # same as QuestionBank.reorder, where unparsed questions remain unparsed
+        if len(order) != len(self) or set(order) != set(range(len(self))):
+            raise ValueError("The order must contain each position exactly once.")
+        self._questions = [self._questions[i] for i in order]
+        self._spans = [self._spans[i] for i in order]
+        self._categories = [self._categories[i] for i in order]
+        self._ids = None
+    
+    def _parse(self, index: int) -> Question:
+        start, end = self._spans[index]
+        try:
+            question = Question.from_str(_decode(self._buffer[start:end], self.encoding))
+        except ValueError as e:
+            line = self._buffer[:start].count(b"\n") + 1
+            raise ValueError(f"Invalid question in line {line} of '{self.file}':\n\n{e}") from e
+        question.category = self._categories[index]
+        self._questions[index] = question
+        if self._ids is not None:
+            self._ids[id(question)] = index
+        return question
+    
+    def _normalize_index(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("question bank index out of range")
+        return index
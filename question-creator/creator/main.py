@@ -1,9 +1,156 @@
-from gui import QuestionCreator
-
 import argparse
+import os
+import sys
 
 parser = argparse.ArgumentParser()
 parser.add_argument("-f", "--file", type=str, help="GIFT file to open with startup.")
-args = parser.parse_args()
+parser.add_argument("-d", "--directory", type=str, help="Directory of GIFT files to open as workspace with startup "
+                                                           "(files are only parsed when selected).")
+parser.add_argument("--no-cache", action="store_true", help="Always parse GIFT files instead of using the cache of "
+                                                            "previously parsed files.")
+parser.add_argument("--lazy", action="store_true", help="Open GIFT files lazily in the GUI, i.e., questions are only "
+                                                         "parsed when accessed, and unchanged questions are written "
+                                                         "back as they are.")
+parser.add_argument("--watch", action="store_true", help="Watch the GIFT file opened in the GUI for changes by other "
+                                                          "programs (e.g., a text editor) and merge them into the "
+                                                          "questions (only the changed questions are parsed again).")
+parser.add_argument("--profile", type=str, metavar="FILE", help="Record timings and counters of the hot paths and "
+                                                                "write them to FILE on exit (JSON, or cProfile "
+                                                                "statistics if FILE ends with '.prof'). Can also be "
+                                                                "enabled via the environment variable "
+                                                                "QUESTION_CREATOR_PROFILE=FILE.")
+subparsers = parser.add_subparsers(dest="command")
+batch_parser = subparsers.add_parser("batch", help="Process all GIFT files of a directory without GUI.")
+batch_parser.add_argument("directory", type=str, help="Directory which is (recursively) searched for GIFT files.")
+batch_parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes (default: number of CPUs).")
+batch_parser.add_argument("-o", "--out", type=str, help="Directory to write the normalized GIFT files to. If not "
+                                                        "specified, the files are only validated.")
+batch_parser.add_argument("-p", "--pattern", type=str, default="*.txt", help="File name pattern of GIFT files.")
+lint_parser = subparsers.add_parser("lint", help="Validate GIFT files and report all problems without GUI.")
+lint_parser.add_argument("paths", type=str, nargs="+", help="GIFT files or directories which are (recursively) "
+                                                            "searched for GIFT files.")
+lint_parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes (default: number of CPUs).")
+lint_parser.add_argument("-p", "--pattern", type=str, default="*.txt", help="File name pattern of GIFT files.")
+lint_parser.add_argument("--format", choices=["json", "text"], default="json", help="Format of the report.")
+dedup_parser = subparsers.add_parser("dedup", help="Find exact and near duplicate questions across GIFT files "
+                                                   "without GUI.")
+dedup_parser.add_argument("paths", type=str, nargs="+", help="GIFT files or directories which are (recursively) "
+                                                             "searched for GIFT files.")
+dedup_parser.add_argument("-t", "--threshold", type=float, default=0.8, help="Minimum (estimated) similarity of "
+                                                                              "near duplicates (between 0 and 1).")
+dedup_parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes (default: number of CPUs).")
+dedup_parser.add_argument("-p", "--pattern", type=str, default="*.txt", help="File name pattern of GIFT files.")
+dedup_parser.add_argument("--format", choices=["json", "text"], default="json", help="Format of the report.")
+convert_parser = subparsers.add_parser("convert", help="Convert between GIFT, Moodle XML and question stores without "
+                                                       "GUI (in constant memory).")
+convert_parser.add_argument("source", type=str, help="Input file (Moodle XML if it ends with '.xml', question store if "
+                                                     "it ends with '.sqlite', GIFT otherwise).")
+convert_parser.add_argument("target", type=str, help="Output file (same formats as the input file, where questions "
+                                                     "are appended to existing question stores).")
+exam_parser = subparsers.add_parser("exam", help="Draw randomized exam variants from a GIFT file without GUI.")
+exam_parser.add_argument("file", type=str, help="GIFT file to draw the questions from.")
+exam_parser.add_argument("-o", "--out", type=str, required=True, help="Directory to write the variants (GIFT files) "
+                                                                      "to.")
+exam_parser.add_argument("-v", "--variants", type=int, default=1, help="Number of variants.")
+exam_parser.add_argument("-n", type=int, default=1, help="Number of questions per category.")
+exam_parser.add_argument("-c", "--category", type=str, action="append", metavar="NAME[=N]",
+                         help="Only draw from this category (N questions, default: -n). Can be repeated.")
+exam_parser.add_argument("--seed", type=str, default="0", help="Seed (the same seed results in the same variants).")
+exam_parser.add_argument("--shuffle-answers", action="store_true", help="Shuffle the answers of each question.")
+exam_parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes (default: number of CPUs).")
 
-QuestionCreator(file=args.file).start()
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.profile:
+        import instrumentation
+        
+        # must be enabled before any other module is imported (see instrumentation)
+        instrumentation.enable(args.profile)
+    if args.command == "batch":
+        import batch
+        
+        summary = batch.run_batch(args.directory, out_dir=args.out, jobs=args.jobs, pattern=args.pattern,
+                                  use_cache=not args.no_cache)
+        print(summary)
+        sys.exit(1 if summary.errors else 0)
+    elif args.command == "lint":
+        import json
+        
+        import batch
+        import validation
+        
+        files = []
+        for path in args.paths:
+            files.extend(batch.find_files(path, args.pattern) if os.path.isdir(path) else [path])
+        report = validation.lint(files, jobs=args.jobs)
+        if args.format == "json":
+            print(json.dumps(report, indent=2))
+        else:
+            for issue in report["issues"]:
+                print(validation.Issue(**issue))
+            print(f"{report['n_issues']} issues in {report['n_files_with_issues']}/{report['n_files']} files")
+        sys.exit(1 if report["n_issues"] else 0)
+    elif args.command == "dedup":
+        import json
+        
+        import batch
+        import dedup
+        
+        files = []
+        for path in args.paths:
+            files.extend(batch.find_files(path, args.pattern) if os.path.isdir(path) else [path])
+        report = dedup.find_duplicates(files, threshold=args.threshold, jobs=args.jobs)
+        if args.format == "json":
+            print(json.dumps(report, indent=2))
+        else:
+            for group in report["exact_duplicates"]:
+                print("exact duplicates:")
+                for location in group:
+                    print(f"  {location['file']}:{location['line']}: {location['title']}")
+            for pair in report["near_duplicates"]:
+                print(f"near duplicates (similarity {pair['similarity']:.2f}):")
+                for location in (pair["first"], pair["second"]):
+                    print(f"  {location['file']}:{location['line']}: {location['title']}")
+            for error in report["errors"]:
+                print(f"skipped: {error}")
+            print(f"{len(report['exact_duplicates'])} groups of exact duplicates and "
+                  f"{len(report['near_duplicates'])} near duplicates among {report['n_questions']} questions "
+                  f"in {report['n_files']} files")
+        sys.exit(1 if report["exact_duplicates"] or report["near_duplicates"] else 0)
+    elif args.command == "convert":
+        import sqlite3
+        
+        import store
+        
+        try:
+            store.convert(args.source, args.target)
+        except (ValueError, OSError, UnicodeDecodeError, sqlite3.Error) as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+    elif args.command == "exam":
+        import exam
+        import inout
+        from cache import ParseCache
+        from data import Category
+        
+        try:
+            bank = inout.read_gift(args.file) if args.no_cache else ParseCache().read_gift(args.file)
+            if args.category:
+                counts = {}
+                for spec in args.category:
+                    name, _, n = spec.partition("=")
+                    counts[Category(name)] = int(n) if n else args.n
+            else:
+                counts = {category: args.n for category in bank.categories()}
+            files = exam.write_variants(bank, args.out, args.variants, counts, seed=args.seed,
+                                        shuffle_answers=args.shuffle_answers, jobs=args.jobs)
+        except (ValueError, OSError, UnicodeDecodeError) as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        print(f"{len(files)} variants with {sum(counts.values())} questions each written to '{args.out}'")
+    else:
+        from cache import ParseCache
+        from gui import QuestionCreator
+        
+        QuestionCreator(file=args.file, cache=None if args.no_cache else ParseCache(), lazy=args.lazy,
+                        watch=args.watch, directory=args.directory).start()
@@ -0,0 +1,158 @@
+import itertools
+import xml.etree.ElementTree as ET
+from typing import Iterable, Iterator
+from xml.sax.saxutils import escape
+
+import inout
+import instrumentation
+from data import Answer, Category, Question, QuestionBank, format_percentage
+
+# Moodle XML (see https://docs.moodle.org/en/Moodle_XML_format), where questions are written as
+# "multichoice" questions (the only type supported here) and categories as "category" pseudo
+# questions in front of the questions of the respective category (same as in GIFT files)
+
+# fixed settings of written questions (Moodle defaults)
+_QUESTION_SETTINGS = ("    <defaultgrade>1</defaultgrade>\n"
+                      "    <penalty>0.3333333</penalty>\n"
+                      "    <hidden>0</hidden>\n"
+                      "    <shuffleanswers>true</shuffleanswers>\n"
+                      "    <answernumbering>abc</answernumbering>\n")
+
+
+@instrumentation.timed("moodlexml.read_xml")
+def read_xml(file) -> QuestionBank:
+    return QuestionBank(iter_xml(file))
+
+
+def iter_xml(file) -> Iterator[Question]:
+    # lazily yields the questions of the file (the encoding is taken from the XML declaration);
+    # each question element is discarded as soon as it was converted (and so are all previous
+    # elements, since the root element would keep them otherwise), so only the current question
+    # element has to be kept in memory; invalid XML is reported as ValueError as well
+    category = None
+    root = None
+    events = ET.iterparse(file, events=("start", "end"))
+    while True:
+        try:
+            event, element = next(events, (None, None))
+        except ET.ParseError as e:
+            raise ValueError(f"Invalid XML in '{file}': {e}") from e
+        if event is None:
+            break
+        if root is None:
+            root = element
+        if event != "end" or element.tag != "question":
+            continue
+        question_type = element.get("type")
+        if question_type == "category":
+            path = _text(element.find("category"))
+            try:
+                category = Category.from_str(f"$CATEGORY: {path}")
+            except ValueError as e:
+                raise ValueError(f"Invalid category '{path}' in '{file}'.") from e
+        elif question_type == "multichoice":
+            q = _question_from_element(element, file)
+            q.category = category
+            if instrumentation.enabled:
+                instrumentation.count("questions parsed")
+            yield q
+        else:
+            raise ValueError(f"Unsupported question type '{question_type}' in '{file}' (only 'multichoice' and "
+                             f"'category' are supported).")
+        root.clear()
+
+
+def _question_from_element(element: ET.Element, file) -> Question:
+    title = _text(element.find("name"))
+    text = _text(element.find("questiontext"))
+    answers = [Answer(_text(a), float(a.get("fraction", "0")) > 0) for a in element.iterfind("answer")]
+    mode = Question.MODE_SINGLE if element.findtext("single", "true").strip() == "true" else Question.MODE_MULTI
+    try:
+        # same as in GIFT files, the title is not used if it is the same as the text (see write_xml)
+        return Question(title="" if title == text else title, text=text, answers=answers, mode=mode)
+    except ValueError as e:
+        raise ValueError(f"Invalid question '{title}' in '{file}':\n\n{e}") from e
+
+
+def _text(element) -> str:
+    # text of the "text" child element (e.g., of "name", "questiontext" or "answer")
+    if element is None:
+        return ""
+    return (element.findtext("text") or "").strip()
+
+
+@instrumentation.timed("moodlexml.write_xml")
+def write_xml(file, questions: Iterable[Question], group_categories: bool = True, chunk_size: int = 1 << 20):
+    # the document is written incrementally (each question is converted to its element on its
+    # own), i.e., "questions" can be any iterable (e.g., a generator), which is consumed exactly
+    # once; note that grouping the categories requires all questions at once (see
+    # inout.group_by_category), unless they are a QuestionBank; same as inout.write_gift, the
+    # first question is fetched before the file is touched; the encoding is always UTF-8 (as
+    # expected by Moodle)
+    if group_categories:
+        questions = inout.group_by_category(questions)
+    questions = iter(questions)
+    first = next(questions, None)
+    if first is None:
+        raise ValueError("There must at least be one question.")
+    # the individual parts are collected and written in large chunks (same as inout.write_gift)
+    chunk = ['<?xml version="1.0" encoding="UTF-8"?>\n<quiz>\n']
+    size = 0
+    with open(file, "w", encoding="utf8") as f:
+        category = None
+        for question in itertools.chain([first], questions):
+            if category != question.category:
+                category = question.category
+                if category is not None:
+                    part = _category_to_xml(category)
+                    chunk.append(part)
+                    size += len(part)
+            part = _question_to_xml(question)
+            chunk.append(part)
+            size += len(part)
+            if size >= chunk_size:
+                f.writelines(chunk)
+                chunk = []
+                size = 0
+        chunk.append("</quiz>\n")
+        f.writelines(chunk)
+
+
+def _category_to_xml(category: Category) -> str:
+    return (f'  <question type="category">\n'
+            f'    <category><text>{escape(f"$course$/top/{category.name}")}</text></category>\n'
+            f'  </question>\n')
+
+
+def _question_to_xml(question: Question) -> str:
+    if question.mode == Question.MODE_SINGLE:
+        fractions = ["100" if a.correct else "0" for a in question.answers]
+    elif question.mode == Question.MODE_MULTI:
+        fractions = [format_percentage(question._get_percentage(a)) for a in question.answers]
+    else:
+        raise ValueError(f"Unknown question mode: '{question.mode}'\n\n{question}")
+    # Moodle requires a name, so the text is used if there is no title (same as for GIFT files)
+    parts = [f'  <question type="multichoice">\n'
+             f'    <name><text>{escape(question.title or question.text)}</text></name>\n'
+             f'    <questiontext format="html"><text>{escape(question.text)}</text></questiontext>\n',
+             _QUESTION_SETTINGS,
+             f'    <single>{"true" if question.mode == Question.MODE_SINGLE else "false"}</single>\n']
+    for a, fraction in zip(question.answers, fractions):
+        parts.append(f'    <answer fraction="{fraction}" format="html"><text>{escape(a.text)}</text></answer>\n')
+    parts.append("  </question>\n")
+    return "".join(parts)
+
+
+def convert(source, target, encoding="utf8"):
+    # converts between GIFT and Moodle XML (depending on the file extensions, where ".xml" is
+    # Moodle XML and anything else is GIFT) in constant memory, i.e., the questions are streamed
+    # from one file to the other and therefore keep their order (the categories are not grouped);
+    # the encoding only applies to GIFT files
+    if source.lower().endswith(".xml"):
+        questions = iter_xml(source)
+    else:
+        questions = inout.iter_gift(source, encoding)
+    if target.lower().endswith(".xml"):
+        write_xml(target, questions, group_categories=False)
+    else:
+        inout.write_gift(target, questions, encoding, group_categories=False)
@@ -0,0 +1,141 @@
+import bisect
+import re
+from typing import Iterable, Optional
+
+from data import Question
+
+_TAG_RE = re.compile(r"<[^>]*>")
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(s: str) -> set[str]:
+    # HTML tags are not searchable
+    if "<" in s:
+        s = _TAG_RE.sub(" ", s)
+    return set(_TOKEN_RE.findall(s.lower()))
+
+
+class SearchIndex:
+    # inverted index which maps each token (of the question texts, titles and answer texts)
+    # to the questions containing it; questions are identified by their object identity, so
+    # they must be updated in the index whenever they change (see update)
+    
+    def __init__(self, questions: Iterable[Question] = ()):
+        self._postings: dict[str, set[int]] = {}  # token -> ids of questions
+        self._tokens: dict[int, set[str]] = {}  # id of question -> tokens
+        self._questions: dict[int, Question] = {}  # id of question -> question
+        self._vocabulary: Optional[list[str]] = None  # sorted tokens (for prefix queries), created lazily
+        self.extend(questions)
+    
+    def __len__(self):
+        return len(self._questions)
+    
+    def add(self, question: Question):
+        key = id(question)
+        if key in self._questions:
+            self.update(question)
+            return
+        tokens = SearchIndex.question_tokens(question)
+        self._questions[key] = question
+        self._tokens[key] = tokens
+        for token in tokens:
+            self._add_posting(token, key)
+    
+    def extend(self, questions: Iterable[Question]):
+        # bulk version of add (without updating the vocabulary for each new token)
+        self._vocabulary = None
+        postings = self._postings
+        for question in questions:
+            key = id(question)
+            if key in self._questions:
+                self.update(question)
+                continue
+            tokens = SearchIndex.question_tokens(question)
+            self._questions[key] = question
+            self._tokens[key] = tokens
+            for token in tokens:
+                keys = postings.get(token)
+                if keys is None:
+                    postings[token] = {key}
+                else:
+                    keys.add(key)
+    
+    def remove(self, question: Question):
+        key = id(question)
+        if self._questions.pop(key, None) is None:
+            return
+        for token in self._tokens.pop(key):
+            self._remove_posting(token, key)
+    
+    def update(self, question: Question):
+        # only the tokens which differ from the previous state of the question are updated
+        key = id(question)
+        if key not in self._questions:
+            self.add(question)
+            return
+        old_tokens = self._tokens[key]
+        new_tokens = SearchIndex.question_tokens(question)
+        for token in old_tokens - new_tokens:
+            self._remove_posting(token, key)
+        for token in new_tokens - old_tokens:
+            self._add_posting(token, key)
+        self._tokens[key] = new_tokens
+    
+    def clear(self):
+        self._postings.clear()
+        self._tokens.clear()
+        self._questions.clear()
+        self._vocabulary = None
+    
+    def search(self, query: str, prefix: bool = True) -> list[Question]:
+        # all terms of the query must be contained in a question (AND); if prefix is True, a
+        # term matches all tokens starting with it, otherwise, only the identical token
+        terms = tokenize(query)
+        if not terms:
+            return []
+        matches = []
+        for term in terms:
+            keys = self._prefix_keys(term) if prefix else self._postings.get(term, set())
+            if not keys:
+                return []
+            matches.append(keys)
+        # intersecting the smallest set first keeps the intermediate results small
+        matches.sort(key=len)
+        keys = matches[0].intersection(*matches[1:])
+        return [self._questions[key] for key in keys]
+    
+    def _prefix_keys(self, prefix: str) -> set[int]:
+        vocabulary = self._get_vocabulary()
+        start = bisect.bisect_left(vocabulary, prefix)
+        # all tokens starting with "prefix" are smaller than this one
+        end = bisect.bisect_left(vocabulary, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo=start)
+        if end - start == 1:
+            return self._postings[vocabulary[start]]
+        return set().union(*[self._postings[token] for token in vocabulary[start:end]])
+    
+    def _get_vocabulary(self) -> list[str]:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        return self._vocabulary
+    
+    def _add_posting(self, token: str, key: int):
+        keys = self._postings.get(token)
+        if keys is None:
+            self._postings[token] = {key}
+            if self._vocabulary is not None:
+                bisect.insort(self._vocabulary, token)
+        else:
+            keys.add(key)
+    
+    def _remove_posting(self, token: str, key: int):
+        keys = self._postings[token]
+        keys.discard(key)
+        if not keys:
+            del self._postings[token]
+            if self._vocabulary is not None:
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+    
+    @staticmethod
+    def question_tokens(question: Question) -> set[str]:
+        # a single string, so the tokenization (regular expressions) is only done once
+        return tokenize("\n".join([question.title, question.text, *[a.text for a in question.answers]]))
@@ -0,0 +1,379 @@
+import itertools
+import os
+import pathlib
+import sqlite3
+import weakref
+from collections import OrderedDict
+from collections.abc import MutableSequence
+from typing import Iterable, Iterator, Optional
+
+import inout
+import instrumentation
+import moodlexml
+from data import Answer, Category, Question
+
+# file extension of question stores (see QuestionStore)
+SUFFIX = ".sqlite"
+
+# the position of a question is only a sort key (see QuestionStore.insert); the category index
+# also contains the position, so the questions of a category can be read in order without sorting
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    position REAL NOT NULL,
+    category_id INTEGER REFERENCES categories (id),
+    title TEXT NOT NULL,
+    text TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS answers (
+    question_id INTEGER NOT NULL REFERENCES questions (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    correct INTEGER NOT NULL,
+    PRIMARY KEY (question_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS questions_position ON questions (position);
+CREATE INDEX IF NOT EXISTS questions_category ON questions (category_id, position);
+CREATE INDEX IF NOT EXISTS questions_mode ON questions (mode);
+"""
+
+# all columns which are needed to create questions (see _questions_from_rows), where questions
+# without answers result in a single row with NULL answer columns
+_SELECT = """
+SELECT q.id, c.name, q.title, q.text, q.mode, q.source, a.text, a.correct
+FROM questions q
+LEFT JOIN categories c ON c.id = q.category_id
+LEFT JOIN answers a ON a.question_id = q.id
+"""
+
+_UPSERT = """
+INSERT INTO questions (id, position, category_id, title, text, mode, source) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET category_id = excluded.category_id, title = excluded.title, text = excluded.text,
+                               mode = excluded.mode, source = excluded.source
+"""
+
+
+def connect(file, read_only: bool = False) -> sqlite3.Connection:
+    # creates the tables if they do not exist yet; with write-ahead logging, readers (e.g., an
+    # export in another thread) see a consistent snapshot while questions are being edited, and
+    # committing single edits is cheap; read-only connections neither create nor change the
+    # store, so it must already exist
+    if read_only:
+        if not os.path.isfile(file):
+            raise ValueError(f"Question store '{file}' does not exist.")
+        connection = sqlite3.connect(f"{pathlib.Path(file).absolute().as_uri()}?mode=ro", uri=True)
+        connection.execute("PRAGMA foreign_keys = ON")
+        return connection
+    connection = sqlite3.connect(file)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def _questions_from_rows(rows: Iterable[tuple]) -> Iterator[tuple[int, Question]]:
+    # the rows must be ordered by question (and the answers of each question by their position);
+    # yields (row id, question) tuples; questions are not validated, since edits are stored as
+    # they are (see QuestionStore.update), which might be invalid in between
+    for row_id, group in itertools.groupby(rows, key=lambda row: row[0]):
+        _, category_name, title, text, mode, source, answer_text, correct = next(group)
+        answers = [] if answer_text is None else [Answer(answer_text, bool(correct))]
+        answers.extend(Answer(row[6], bool(row[7])) for row in group)
+        yield row_id, Question(None if category_name is None else Category(category_name), title, text, answers,
+                               mode, validate=False, source=source)
+
+
+class _Writer:
+    # writes questions with a single connection, where the ids of the categories are cached
+    
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        self._category_ids: dict[str, int] = {}
+    
+    def write(self, row_id: Optional[int], position: float, question: Question) -> int:
+        # inserts (row id None) or updates the question (including its answers) and returns its
+        # row id; must be called within a transaction
+        category_id = self._category_id(question.category)
+        cursor = self.connection.execute(_UPSERT, (row_id, position, category_id, question.title, question.text,
+                                                   question.mode, question.source))
+        if row_id is None:
+            row_id = cursor.lastrowid
+        else:
+            self.connection.execute("DELETE FROM answers WHERE question_id = ?", (row_id,))
+        self.connection.executemany("INSERT INTO answers (question_id, position, text, correct) VALUES (?, ?, ?, ?)",
+                                    [(row_id, i, a.text, a.correct) for i, a in enumerate(question.answers)])
+        return row_id
+    
+    def _category_id(self, category: Optional[Category]) -> Optional[int]:
+        if category is None:
+            return None
+        category_id = self._category_ids.get(category.name)
+        if category_id is None:
+            self.connection.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", (category.name,))
+            category_id = self.connection.execute("SELECT id FROM categories WHERE name = ?",
+                                                  (category.name,)).fetchone()[0]
+            self._category_ids[category.name] = category_id
+        return category_id
+
+
+@instrumentation.timed("store.import_questions")
+def import_questions(file, questions: Iterable[Question], batch_size: int = 1000) -> int:
+    # appends the questions to the store (which is created if it does not exist), where each
+    # batch is written in its own transaction, so "questions" can be any iterable (e.g., a
+    # generator, see inout.iter_gift) and is imported in constant memory; returns the number
+    # of imported questions; to raise an error before the store is touched, the first question
+    # is fetched up front (same as inout.write_gift)
+    questions = iter(questions)
+    first = next(questions, None)
+    questions = itertools.chain(() if first is None else [first], questions)
+    connection = connect(file)
+    try:
+        writer = _Writer(connection)
+        position = connection.execute("SELECT MAX(position) FROM questions").fetchone()[0]
+        position = -1 if position is None else int(position)
+        n = 0
+        while True:
+            batch = list(itertools.islice(questions, batch_size))
+            if not batch:
+                break
+            with connection:
+                for question in batch:
+                    position += 1
+                    writer.write(None, position, question)
+            n += len(batch)
+        return n
+    finally:
+        connection.close()
+
+
+def iter_questions(file, group_categories: bool = True) -> Iterator[Question]:
+    # lazily yields all questions of the store in their order, where the questions are read with
+    # a single query (in a single transaction, i.e., a consistent snapshot); if grouped, the
+    # order is the same as for inout.group_by_category, which the indexes provide without sorting
+    connection = connect(file, read_only=True)
+    try:
+        if group_categories:
+            with connection:
+                # an explicit transaction, so all queries read the same snapshot
+                connection.execute("BEGIN")
+                # questions without category first (same as group_by_category)
+                category_ids = [None] + [row[0] for row in connection.execute("SELECT id FROM categories "
+                                                                              "ORDER BY name")]
+                for category_id in category_ids:
+                    rows = connection.execute(f"{_SELECT} WHERE q.category_id IS ? ORDER BY q.position, a.position",
+                                              (category_id,))
+                    yield from (question for _, question in _questions_from_rows(rows))
+        else:
+            rows = connection.execute(f"{_SELECT} ORDER BY q.position, a.position")
+            yield from (question for _, question in _questions_from_rows(rows))
+    finally:
+        connection.close()
+
+
+@instrumentation.timed("store.export_gift")
+def export_gift(file, gift_file, encoding="utf8"):
+    # streams all questions to the GIFT file (pristine questions are written as their source)
+    inout.write_gift(gift_file, iter_questions(file), encoding, group_categories=False)
+
+
+def convert(source, target, encoding="utf8"):
+    # converts between question stores, GIFT and Moodle XML (depending on the file extensions,
+    # see moodlexml.convert) in constant memory; questions are appended to existing stores
+    if source.lower().endswith(SUFFIX):
+        questions = iter_questions(source, group_categories=False)
+    elif source.lower().endswith(".xml"):
+        questions = moodlexml.iter_xml(source)
+    else:
+        questions = inout.iter_gift(source, encoding)
+    if target.lower().endswith(SUFFIX):
+        import_questions(target, questions)
+    elif target.lower().endswith(".xml"):
+        moodlexml.write_xml(target, questions, group_categories=False)
+    else:
+        inout.write_gift(target, questions, encoding, group_categories=False)
+
+
+class QuestionStore(MutableSequence):
+    # question bank (which can be used like a list) stored in an SQLite database, where only the
+    # row ids of the questions are read initially, and the questions themselves are read in pages
+    # when they are accessed; all changes are committed immediately (per question), i.e., there
+    # is no need to save the entire bank; questions which are changed in-place must be stored
+    # with update (same interface as QuestionBank, where update keeps the indexes valid); only
+    # the questions of the most recently used pages are kept, but questions which are still
+    # referenced elsewhere (e.g., by the GUI or a search index) are returned again as long as
+    # they exist, so there is never more than one question object per row
+    
+    def __init__(self, file, page_size: int = 200, max_pages: int = 50):
+        self.file = file
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._connection = connect(file)
+        self._writer = _Writer(self._connection)
+        rows = self._connection.execute("SELECT id, position FROM questions ORDER BY position").fetchall()
+        self._ids: list[int] = [row_id for row_id, _ in rows]  # row id per index
+        self._positions: list[float] = [position for _, position in rows]  # sort key per index
+        # row id -> question of the most recently used pages (least recently used first)
+        self._questions: OrderedDict[int, Question] = OrderedDict()
+        # row id -> question which was evicted from the above, but might still be referenced elsewhere
+        self._evicted: dict[int, weakref.ref] = {}
+        self._row_ids: dict[int, int] = {}  # id(question) -> row id (of all questions which still exist)
+        self._indexes: Optional[dict[int, int]] = None  # row id -> index (built on demand, see position)
+    
+    def __len__(self):
+        return len(self._ids)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        row_id = self._ids[index]
+        question = self._questions.get(row_id)
+        if question is not None:
+            self._questions.move_to_end(row_id)
+            return question
+        question = self._recall(row_id)
+        if question is None:
+            self._read_page(index % len(self))
+            question = self._questions[row_id]
+        return question
+    
+    @instrumentation.timed("QuestionStore.__setitem__")
+    def __setitem__(self, index: int, question: Question):
+        index = self._normalize_index(index)
+        row_id = self._ids[index]
+        with self._connection:
+            self._writer.write(row_id, self._positions[index], question)
+        self._forget(row_id)
+        self._remember(row_id, question)
+    
+    @instrumentation.timed("QuestionStore.__delitem__")
+    def __delitem__(self, index: int):
+        index = self._normalize_index(index)
+        row_id = self._ids[index]
+        with self._connection:
+            self._connection.execute("DELETE FROM questions WHERE id = ?", (row_id,))
+        del self._ids[index]
+        del self._positions[index]
+        self._forget(row_id)
+        self._indexes = None
+    
+    @instrumentation.timed("QuestionStore.insert")
+    def insert(self, index: int, question: Question):
+        # same semantics as list.insert (indices out of range are clamped); the position of the new
+        # question lies between the positions of its neighbors, so no other question is changed
+        # (unless the positions are too close, see _renumber)
+        index = min(max(index + len(self) if index < 0 else index, 0), len(self))
+        position = self._position_between(index)
+        if position is None:
+            self._renumber()
+            position = self._position_between(index)
+        with self._connection:
+            row_id = self._writer.write(None, position, question)
+        self._ids.insert(index, row_id)
+        self._positions.insert(index, position)
+        self._remember(row_id, question)
+        self._indexes = None
+    
+    @instrumentation.timed("QuestionStore.update")
+    def update(self, index: int):
+        # stores the (changed) question at the index (UPSERT of the question and its answers)
+        index = self._normalize_index(index)
+        row_id = self._ids[index]
+        question = self._questions.get(row_id)
+        if question is None:
+            question = self._recall(row_id)
+        if question is not None:
+            with self._connection:
+                self._writer.write(row_id, self._positions[index], question)
+    
+    def position(self, question: Question) -> int:
+        if self._indexes is None:
+            self._indexes = {row_id: i for i, row_id in enumerate(self._ids)}
+        return self._indexes[self._row_ids[id(question)]]
+    
+    def close(self):
+        self._connection.close()
+    
+    def _read_page(self, index: int):
+        start = index - index % self.page_size
+        row_ids = []
+        for row_id in self._ids[start:start + self.page_size]:
+            if row_id in self._questions:
+                self._questions.move_to_end(row_id)
+            elif self._recall(row_id) is None:
+                row_ids.append(row_id)
+        rows = self._connection.execute(f"{_SELECT} WHERE q.id IN ({', '.join('?' * len(row_ids))}) "
+                                        f"ORDER BY q.id, a.position", row_ids)
+        for row_id, question in _questions_from_rows(rows):
+            self._remember(row_id, question)
+        if instrumentation.enabled:
+            instrumentation.count("store pages read")
+    
+    def _remember(self, row_id: int, question: Question):
+        self._questions[row_id] = question
+        self._questions.move_to_end(row_id)
+        self._row_ids[id(question)] = row_id
+        self._evict()
+    
+    def _recall(self, row_id: int) -> Optional[Question]:
+        # the evicted question of the row if it still exists (which is kept again)
+        ref = self._evicted.pop(row_id, None)
+        question = None if ref is None else ref()
+        if question is not None:
+            self._questions[row_id] = question
+            self._evict()
+        return question
+    
+    def _forget(self, row_id: int):
+        question = self._questions.pop(row_id, None)
+        if question is None:
+            ref = self._evicted.pop(row_id, None)
+            question = None if ref is None else ref()
+        if question is not None:
+            self._row_ids.pop(id(question), None)
+    
+    def _evict(self):
+        # evicted questions are only referenced weakly, so they are released as soon as they are
+        # not used elsewhere anymore (see _release)
+        while len(self._questions) > self.max_pages * self.page_size:
+            row_id, question = self._questions.popitem(last=False)
+            self._evicted[row_id] = weakref.ref(question, lambda ref, row_id=row_id, key=id(question):
+                                                self._release(ref, row_id, key))
+    
+    def _release(self, ref: weakref.ref, row_id: int, key: int):
+        if self._evicted.get(row_id) is ref:
+            del self._evicted[row_id]
+        self._row_ids.pop(key, None)
+    
+    def _position_between(self, index: int) -> Optional[float]:
+        # position between the questions at index - 1 and index, or None if there is none
+        # (due to the limited precision of floats)
+        if not self._positions:
+            return 0.0
+        if index == 0:
+            return self._positions[0] - 1
+        if index == len(self._positions):
+            return self._positions[-1] + 1
+        before, after = self._positions[index - 1], self._positions[index]
+        position = (before + after) / 2
+        return position if before < position < after else None
+    
+    def _renumber(self):
+        # the positions of all questions are reset to their indexes
+        with self._connection:
+            self._connection.executemany("UPDATE questions SET position = ? WHERE id = ?",
+                                         [(i, row_id) for i, row_id in enumerate(self._ids)])
+        self._positions = [float(i) for i in range(len(self._ids))]
+    
+    def _normalize_index(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("question bank index out of range")
+        return index
@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional
+
+import instrumentation
+from data import Category, Question, check_question
+from inout import iter_blocks
+
+
+class Issue:
+    # a single problem of a file, where the block index and the line number refer to the block
+    # (question or category) which caused the problem
+    
+    def __init__(self, rule: str, message: str, file=None, block: int = None, line: int = None):
+        self.rule = rule
+        self.message = message
+        self.file = file
+        self.block = block
+        self.line = line
+    
+    def to_dict(self) -> dict:
+        return {"file": self.file, "block": self.block, "line": self.line, "rule": self.rule,
+                "message": self.message}
+    
+    def __str__(self):
+        location = ":".join(str(x) for x in (self.file, self.line) if x is not None)
+        return f"{location}: [{self.rule}] {self.message}" if location else f"[{self.rule}] {self.message}"
+
+
+def check_braces(block: str) -> Optional[str]:
+    try:
+        Question._tokenize(block)
+    except ValueError as e:
+        return _first_line(e)
+    return None
+
+
+def check_answers(block: str) -> Optional[str]:
+    # the answer markers must be valid and either all or none of them must have a percentage
+    # (which determines the question mode, see Question.from_str)
+    _, _, answer_blocks = Question._tokenize(block)
+    has_percentage = set()
+    for answer_block in answer_blocks:
+        try:
+            percentage, _ = Question._extract_mode_and_answer(answer_block)
+        except ValueError as e:
+            return _first_line(e)
+        has_percentage.add(percentage is not None)
+    if len(has_percentage) > 1:
+        return "Answers have mixed modes but all answer modes must be the same."
+    return None
+
+
+# rules for the syntax of question blocks (rule name -> function which returns the problem or
+# None); they are only checked if a block cannot be parsed, and the remaining rules are skipped
+# after the first problem, since they rely on the previous ones (e.g., check_answers requires
+# balanced braces)
+BLOCK_RULES = {
+    "braces": check_braces,
+    "answers": check_answers,
+}
+
+
+def validate_question(question: Question) -> list[Issue]:
+    return [Issue(rule, message) for rule, message in check_question(question)]
+
+
+def validate_blocks(blocks: Iterable[tuple[int, str]], file=None) -> list[Issue]:
+    # validates all blocks (see inout.iter_blocks) in one pass and collects all problems
+    issues = []
+    titles = {}  # title -> line number of its first occurrence
+    for i, (line, block) in enumerate(blocks):
+        if Category.extract_category_pattern(block) is not None:
+            try:
+                Category.from_str(block)
+            except ValueError as e:
+                issues.append(Issue("category", _first_line(e), file, i, line))
+            continue
+        try:
+            question = Question.from_str(block, validate=False)
+        except ValueError as e:
+            # fast path above for valid blocks; the rules are only needed to find out why
+            for rule, check in BLOCK_RULES.items():
+                message = check(block)
+                if message is not None:
+                    issues.append(Issue(rule, message, file, i, line))
+                    break
+            else:
+                issues.append(Issue("syntax", _first_line(e), file, i, line))
+            continue
+        for rule, message in check_question(question):
+            issues.append(Issue(rule, message, file, i, line))
+        if question.title:
+            if question.title in titles:
+                issues.append(Issue("duplicate-title", f"Title '{question.title}' was already used in line "
+                                                       f"{titles[question.title]}.", file, i, line))
+            else:
+                titles[question.title] = line
+    return issues
+
+
+def validate_file(file, encoding="utf8") -> list[Issue]:
+    try:
+        with open(file, encoding=encoding) as f:
+            return validate_blocks(iter_blocks(f), file)
+    except (OSError, UnicodeDecodeError) as e:
+        return [Issue("file", str(e), file)]
+
+
+def _validate_file_instrumented(*args) -> tuple[list[Issue], tuple[dict, dict]]:
+    # same as batch._process_file_instrumented
+    instrumentation.reset()
+    return validate_file(*args), instrumentation.snapshot()
+
+
+def lint(files: list[str], jobs: int = None, encoding="utf8",
+         mp_context: multiprocessing.context.BaseContext = None) -> dict:
+    # validates the files in parallel (one file per task) and returns a machine-readable report;
+    # the results of the instrumentation of the workers are merged (same as batch.run_batch)
+    jobs = jobs or os.cpu_count() or 1
+    initializer = instrumentation.init_worker if instrumentation.enabled else None
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=mp_context, initializer=initializer) as executor:
+        chunksize = max(1, len(files) // (jobs * 4))
+        args = (files, [encoding] * len(files))
+        if instrumentation.enabled:
+            results = []
+            for result, (timings, counters) in executor.map(_validate_file_instrumented, *args, chunksize=chunksize):
+                results.append(result)
+                instrumentation.merge(timings, counters)
+        else:
+            results = list(executor.map(validate_file, *args, chunksize=chunksize))
+    issues = [issue.to_dict() for file_issues in results for issue in file_issues]
+    return {
+        "n_files": len(files),
+        "n_files_with_issues": sum(1 for file_issues in results if file_issues),
+        "n_issues": len(issues),
+        "issues": issues,
+    }
+
+
+def _first_line(e: Exception) -> str:
+    # the messages of parsing errors contain the entire block after the first line
+    return str(e).split("\n", maxsplit=1)[0]
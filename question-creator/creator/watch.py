@@ -0,0 +1,284 @@
+import difflib
+import os
+import re
+from collections import deque
+from collections.abc import Sequence
+from typing import Optional
+
+import instrumentation
+from data import Category, Question
+
+
+# a block is a maximal sequence of non-empty lines (same as inout.iter_blocks)
+_BLOCK_RE = re.compile(r"(?:[^\n]+(?:\n|\Z))+")
+
+
+def block_key(category: Optional[Category], block: str) -> tuple[Optional[str], int]:
+    # blocks are identified by their category and a hash of their content (without trailing
+    # newlines, same as Question.source), so only the hashes of the blocks have to be kept; the
+    # keys are never stored outside the process, so the built-in hash is sufficient
+    return None if category is None else category.name, hash(block.rstrip("\n"))
+
+
+def question_key(question: Question) -> tuple[Optional[str], int]:
+    # key of the block the question is written as (see inout.iter_gift_parts), i.e., the key of
+    # its original block as long as the question is pristine
+    return block_key(question.category, question.source if question.pristine else question.to_gift_format())
+
+
+def read_blocks(file, encoding="utf8") -> list[tuple[int, Optional[Category], str]]:
+    # (line number, category, block) of all question blocks of the file (see inout.parse_gift);
+    # the blocks are found in the entire content at once, which is much faster than splitting
+    # it into lines first
+    blocks = []
+    category = None
+    with open(file, encoding=encoding) as f:
+        content = f.read()
+    line = 1
+    position = 0
+    for match in _BLOCK_RE.finditer(content):
+        line += content.count("\n", position, match.start())
+        position = match.start()
+        block = match.group()
+        if Category.extract_category_pattern(block) is not None:
+            try:
+                category = Category.from_str(block)
+            except ValueError as e:
+                raise ValueError(f"Invalid category in line {line} of '{file}':\n\n{e}") from e
+        else:
+            blocks.append((line, category, block))
+    return blocks
+
+
+class Merge:
+    # result of FileWatcher.merge: the questions of the changed file merged with the edits of the
+    # questions in memory
+    
+    def __init__(self, questions: list[Question], origins: list[Optional[int]], modified: list[int],
+                 conflicts: list[str], n_blocks: int, n_parsed: int, replaced: dict[int, Question],
+                 changed: bool):
+        self.questions = questions
+        self.origins = origins  # per question: the index of its block in the file (None = only in memory)
+        self.modified = modified  # positions of the questions which differ from their block (unsaved changes)
+        self.conflicts = conflicts  # messages about changes of the file which conflict with unsaved changes
+        self.n_blocks = n_blocks  # number of question blocks of the file
+        self.n_parsed = n_parsed  # number of (changed) blocks which had to be parsed
+        # indexes of the blocks of the file without a question (removed here, i.e., unsaved changes as well)
+        kept = set(origins)
+        self.removed = [j for j in range(n_blocks) if j not in kept]
+        self._replaced = replaced  # id(question) -> question which replaced it (its changed block)
+        self.changed = changed  # whether the content of the file changed (otherwise, nothing was merged)
+    
+    def position(self, question: Question) -> Optional[int]:
+        # position of the question or of the question which replaced it (None if it was removed),
+        # e.g., to keep showing the same question
+        question = self._replaced.get(id(question), question)
+        for i, q in enumerate(self.questions):
+            if q is question:
+                return i
+        return None
+
+
+class FileWatcher:
+    # watches a GIFT file for changes by other programs (e.g., a text editor) by polling its size
+    # and modification time (see changed); the blocks of the version of the file the questions
+    # correspond to (the base) are kept as keys (see block_key) together with the questions, so if
+    # the file changes, only the changed blocks are parsed again, and unsaved edits of questions
+    # are told apart from changes of the file (see merge)
+    
+    def __init__(self, file, questions: Sequence[Question], snapshot: Sequence[Question] = None,
+                 encoding="utf8"):
+        # "questions" must be the questions of the current version of the file (e.g., right after
+        # it was read or written), where the blocks are matched to the questions by their keys;
+        # if the questions were written from a snapshot (copies, see QuestionCreator._save_file),
+        # the keys are computed from the snapshot, so later edits are detected as such
+        self.file = file
+        self.encoding = encoding
+        self._stat = self._get_stat()
+        self._pending = None  # changed stat seen by the last call of changed (see there)
+        blocks = read_blocks(file, encoding)
+        self._keys = [block_key(category, block) for _, category, block in blocks]
+        candidates = {}
+        for q, s in zip(questions, questions if snapshot is None else snapshot):
+            candidates.setdefault(question_key(s), deque()).append(q)
+        # per block: the question it belongs to (None if there is no such question), and the ids of
+        # those questions which may differ from their blocks (all others are pristine questions of
+        # their blocks, unless they were changed in the meantime, see merge)
+        self._questions: list[Optional[Question]] = []
+        self._modified: set[int] = set()
+        matched = set()
+        for key in self._keys:
+            queue = candidates.get(key)
+            q = queue.popleft() if queue else None
+            if q is not None:
+                matched.add(id(q))
+            self._questions.append(q)
+        # the remaining questions were edited (e.g., while loading or by replaying a journal), so
+        # they are assigned to the remaining blocks in order
+        remaining = iter([q for q in questions if id(q) not in matched])
+        for i, q in enumerate(self._questions):
+            if q is None:
+                q = self._questions[i] = next(remaining, None)
+                if q is not None:
+                    self._modified.add(id(q))
+    
+    def changed(self) -> bool:
+        # whether the file was changed; a change is only reported once the file did not change
+        # anymore since the previous call, so files which are still being written are not read
+        try:
+            stat = self._get_stat()
+        except OSError:
+            return False  # e.g., the file is being replaced, so it is checked again later
+        if stat == self._stat:
+            self._pending = None
+            return False
+        if stat != self._pending:
+            self._pending = stat
+            return False
+        return True
+    
+    @instrumentation.timed("FileWatcher.merge")
+    def merge(self, questions: Sequence[Question]) -> Merge:
+        # merges the current version of the file with the questions in memory (the base questions
+        # including their unsaved edits, removals and insertions), which becomes the new base; the
+        # blocks are diffed against the blocks of the base by their keys, and only changed blocks
+        # are parsed; unchanged blocks keep their questions (including unsaved edits), changed
+        # blocks replace their questions unless these were edited or removed in memory as well,
+        # which is a conflict, where the edit (or removal) is kept; questions which were only
+        # inserted in memory are kept after the same question as before
+        self._stat = self._get_stat()  # invalid files are not read again until they change
+        self._pending = None
+        blocks = read_blocks(self.file, self.encoding)
+        if not blocks:
+            raise ValueError(f"'{self.file}' does not contain any questions.")
+        keys = [block_key(category, block) for _, category, block in blocks]
+        present = {id(q) for q in questions}
+        merged = []
+        origins = []
+        modified = []
+        conflicts = []
+        replaced = {}
+        n_parsed = 0
+        opcodes = _diff(self._keys, keys)
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == "equal":
+                for i, j in zip(range(i1, i2), range(j1, j2)):
+                    q = self._questions[i]
+                    if q is not None and id(q) in present:
+                        # the key only has to be computed if the question may have been changed
+                        if q.pristine and id(q) not in self._modified:
+                            unchanged = (None if q.category is None else q.category.name) == keys[j][0]
+                        else:
+                            unchanged = question_key(q) == keys[j]
+                        if not unchanged:
+                            modified.append(len(merged))
+                        merged.append(q)
+                        origins.append(j)
+                continue
+            # the changed blocks of the base are paired with the changed blocks of the file in order
+            for k in range(max(i2 - i1, j2 - j1)):
+                i = i1 + k if i1 + k < i2 else None
+                j = j1 + k if j1 + k < j2 else None
+                old = None if i is None else self._questions[i]
+                if i is not None and (old is None or id(old) not in present):
+                    if j is not None:
+                        conflicts.append(f"The question in line {blocks[j][0]} was changed in the file, but "
+                                         f"removed here (it remains removed).")
+                    continue
+                if old is not None and question_key(old) != self._keys[i]:
+                    if j is None:
+                        conflicts.append(f"The question '{_shorten(old.text)}' was removed from the file, but "
+                                         f"changed here (your version was kept).")
+                    else:
+                        conflicts.append(f"The question in line {blocks[j][0]} was changed in the file, but "
+                                         f"also here (your version was kept).")
+                    modified.append(len(merged))
+                    merged.append(old)
+                    origins.append(j)
+                    continue
+                if j is None:
+                    continue  # removed from the file
+                line, category, block = blocks[j]
+                try:
+                    q = Question.from_str(block)
+                except ValueError as e:
+                    raise ValueError(f"Invalid question in line {line} of '{self.file}':\n\n{e}") from e
+                q.category = category
+                n_parsed += 1
+                if old is not None:
+                    replaced[id(old)] = q
+                merged.append(q)
+                origins.append(j)
+        if instrumentation.enabled:
+            instrumentation.count("blocks reparsed", n_parsed)
+        merged, origins, modified = self._insert_new(questions, merged, origins, modified, replaced)
+        # the merged questions are the new base
+        self._keys = keys
+        self._questions = [None] * len(keys)
+        for q, j in zip(merged, origins):
+            if j is not None:
+                self._questions[j] = q
+        self._modified = {id(merged[i]) for i in modified}
+        changed = any(tag != "equal" for tag, *_ in opcodes)
+        return Merge(merged, origins, modified, conflicts, len(keys), n_parsed, replaced, changed)
+    
+    def _insert_new(self, questions: Sequence[Question], merged: list[Question], origins: list[Optional[int]],
+                    modified: list[int], replaced: dict[int, Question]):
+        # inserts the questions which are only in memory (i.e., not in the base) after the nearest
+        # previous question which is still there (or its replacement)
+        base = {id(q) for q in self._questions if q is not None}
+        kept = {id(q) for q in merged}
+        inserted = {}  # id of the previous question (None = at the start) -> inserted questions
+        previous = None
+        for q in questions:
+            q = replaced.get(id(q), q)
+            if id(q) in kept:
+                previous = id(q)
+            elif id(q) not in base:
+                inserted.setdefault(previous, []).append(q)
+        if not inserted:
+            return merged, origins, modified
+        modified = set(modified)
+        new_merged = []
+        new_origins = []
+        new_modified = []
+        for i, q in enumerate([None] + merged):
+            if q is not None:
+                if i - 1 in modified:
+                    new_modified.append(len(new_merged))
+                new_merged.append(q)
+                new_origins.append(origins[i - 1])
+            for new in inserted.get(None if q is None else id(q), ()):
+                new_modified.append(len(new_merged))
+                new_merged.append(new)
+                new_origins.append(None)
+        return new_merged, new_origins, new_modified
+    
+    def _get_stat(self) -> tuple[int, int]:
+        stat = os.stat(self.file)
+        return stat.st_size, stat.st_mtime_ns
+
+
+def _diff(a: list, b: list) -> list[tuple[str, int, int, int, int]]:
+    # same as difflib.SequenceMatcher.get_opcodes, but the common prefix and suffix (usually almost
+    # all blocks, since only a few blocks change at once) are skipped, which is much faster
+    n = min(len(a), len(b))
+    prefix = 0
+    while prefix < n and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < n - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    opcodes = [("equal", 0, prefix, 0, prefix)] if prefix else []
+    matcher = difflib.SequenceMatcher(None, a[prefix:len(a) - suffix], b[prefix:len(b) - suffix], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if i1 < i2 or j1 < j2:
+            opcodes.append((tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix))
+    if suffix:
+        opcodes.append(("equal", len(a) - suffix, len(a), len(b) - suffix, len(b)))
+    return opcodes
+
+
+def _shorten(s: str, width: int = 40) -> str:
+    s = " ".join(s.split())
+    return s if len(s) <= width else f"{s[:width - 3]}..."
@@ -0,0 +1,201 @@
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import inout
+import instrumentation
+from batch import find_files
+from cache import ParseCache
+from data import Category, Question, QuestionBank
+
+# estimated memory of a parsed file per byte of the file (measured with tracemalloc, where the
+# sources of the questions make up a large part, see Question.source)
+MEMORY_FACTOR = 5
+
+_HEADER_RE = re.compile("(?:" + "|".join(re.escape(p) for p in Category.PATTERNS) + r")([^\n]*)")
+
+
+def scan_categories(file, encoding="utf8") -> set[Optional[Category]]:
+    # categories of the file, which are determined from the category headers only (i.e., the file
+    # is neither split into blocks nor parsed); None if there are questions in front of the first
+    # header (same as inout.parse_gift, where blocks are separated by empty lines)
+    with open(file, encoding=encoding) as f:
+        content = f.read()
+    categories = set()
+    for match in _HEADER_RE.finditer(content):
+        if not categories:
+            # the content in front of the block of the first header
+            if content[:max(content.rfind("\n\n", 0, match.start()), 0)].strip():
+                categories.add(None)
+        categories.add(Category(match.group(1).strip()))
+    if not categories and content.strip():
+        categories.add(None)
+    return categories
+
+
+class Workspace:
+    # directory of GIFT files, where each file is only parsed when its questions are needed for the
+    # first time (see bank); the parsed files are kept in an LRU, where the least recently used
+    # files without unsaved changes are evicted as soon as the estimated memory of all parsed files
+    # exceeds "max_bytes" (changed files are never evicted); the categories of the files (see
+    # categories) are known from the start, since the category headers can be scanned quickly;
+    # files are written grouped by category, where the questions in memory are rearranged into the
+    # same order beforehand, so their positions match the written files (see on_reorder)
+    
+    def __init__(self, directory, pattern: str = "*.txt", cache: ParseCache = None,
+                 max_bytes: int = 256 * 1024 * 1024, encoding="utf8",
+                 on_reorder: Callable[[str, list[int]], None] = None):
+        self.directory = directory
+        self.cache = cache  # optional cache of parsed files (None = always parse files)
+        # called with the file and the order (see QuestionBank.reorder) whenever the questions of a
+        # file are rearranged before writing it (e.g., to record this in its journal)
+        self.on_reorder = on_reorder
+        self.max_bytes = max_bytes
+        self.encoding = encoding
+        self.files = find_files(directory, pattern)
+        self._banks: OrderedDict[str, QuestionBank] = OrderedDict()  # parsed files (least recently used first)
+        self._sizes: dict[str, int] = {}  # estimated memory of the parsed files
+        self._changed: set[str] = set()  # files with unsaved changes
+        self._categories = {file: scan_categories(file, encoding) for file in self.files}
+    
+    def __contains__(self, file) -> bool:
+        try:
+            self.path(file)
+        except ValueError:
+            return False
+        return True
+    
+    def path(self, file) -> str:
+        # files are identified by their paths as found in the directory (see find_files), so other
+        # paths of the same file are mapped to these
+        if file in self._categories:
+            return file
+        for f in self.files:
+            if f == file or os.path.abspath(f) == os.path.abspath(file):
+                return f
+        raise ValueError(f"'{file}' is not part of the workspace '{self.directory}'.")
+    
+    def bank(self, file) -> QuestionBank:
+        # the questions of the file, which is parsed if it was not parsed yet (or was evicted)
+        file = self.path(file)
+        bank = self._load(file)
+        self._evict(keep={file})
+        return bank
+    
+    def is_loaded(self, file) -> bool:
+        return self.path(file) in self._banks
+    
+    def is_changed(self, file) -> bool:
+        return self.path(file) in self._changed
+    
+    def changed_files(self) -> list[str]:
+        return [file for file in self.files if file in self._changed]
+    
+    def set_bank(self, file, questions: QuestionBank, changed: bool):
+        # the questions of the file were changed (or replaced) outside of the workspace (e.g., by
+        # editing them), which is only known to the workspace by calling this
+        file = self.path(file)
+        self._set(file, questions)
+        if changed:
+            self._changed.add(file)
+        else:
+            self._changed.discard(file)
+    
+    def categories(self) -> dict[Optional[Category], list[str]]:
+        # category -> files containing questions of the category (no category first, then sorted by name)
+        index = {}
+        for file in self.files:
+            for category in self._categories[file]:
+                index.setdefault(category, []).append(file)
+        return dict(sorted(index.items(), key=lambda item: "" if item[0] is None else item[0].name))
+    
+    def save(self, file):
+        # only parsed files can have changes, so other files are not written
+        file = self.path(file)
+        bank = self._banks.get(file)
+        if bank is not None:
+            self._write(file, bank)
+            self.set_bank(file, bank, changed=False)
+    
+    @instrumentation.timed("Workspace.move")
+    def move(self, source, positions: list[int], target) -> list[Question]:
+        # moves the questions from the source file to the end of the target file (keeping their
+        # categories), where only these two files are written (including any other unsaved changes
+        # of them); returns the moved questions
+        source = self.path(source)
+        target = self.path(target)
+        if source == target:
+            raise ValueError("Questions cannot be moved to the same file.")
+        source_bank = self._load(source)
+        positions = sorted(set(positions))
+        if len(positions) >= len(source_bank):
+            raise ValueError(f"'{source}' must at least keep one question.")
+        target_bank = self._load(target)
+        questions = [source_bank[i] for i in positions]
+        target_bank.extend(questions)
+        for i in reversed(positions):
+            del source_bank[i]
+        # both files are changed until they are written, where the target is written first, so the
+        # questions are not lost if writing the source fails
+        self._changed.update((source, target))
+        for file, bank in ((target, target_bank), (source, source_bank)):
+            self._write(file, bank)
+            self.set_bank(file, bank, changed=False)
+        self._evict(keep={source, target})
+        return questions
+    
+    def memory(self) -> int:
+        # estimated memory of all parsed files
+        return sum(self._sizes.values())
+    
+    def _load(self, file: str) -> QuestionBank:
+        bank = self._banks.get(file)
+        if bank is not None:
+            self._banks.move_to_end(file)
+            return bank
+        if self.cache is not None:
+            bank = self.cache.read_gift(file, self.encoding)
+        else:
+            bank = inout.read_gift(file, self.encoding)
+        if instrumentation.enabled:
+            instrumentation.count("workspace files parsed")
+        self._set(file, bank)
+        return bank
+    
+    def _set(self, file: str, bank: QuestionBank):
+        self._banks[file] = bank
+        self._banks.move_to_end(file)
+        self._sizes[file] = MEMORY_FACTOR * os.path.getsize(file)
+        self._categories[file] = set(bank.categories())
+    
+    def _write(self, file: str, bank: QuestionBank):
+        order = list(bank.grouped_positions())
+        if order != list(range(len(order))):
+            bank.reorder(order)
+            if self.on_reorder is not None:
+                self.on_reorder(file, order)
+        _write_file(file, bank, self.encoding)
+    
+    def _evict(self, keep: set[str]):
+        for file in list(self._banks):
+            if self.memory() <= self.max_bytes:
+                break
+            if file not in keep and file not in self._changed:
+                del self._banks[file]
+                del self._sizes[file]
+
+
+def _write_file(file, bank: QuestionBank, encoding: str):
+    # the file is written to a temporary file first, which then replaces the file, so the file is
+    # never left half-written (same as LazyQuestionBank.write)
+    directory = os.path.dirname(os.path.abspath(file))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    os.close(fd)
+    try:
+        inout.write_gift(tmp_path, bank, encoding, group_categories=False)
+        os.replace(tmp_path, file)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
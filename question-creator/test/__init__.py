@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the modules in "creator" import each other directly (e.g., "from data import Question"),
+# so the directory itself must be importable when running the tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "creator"))
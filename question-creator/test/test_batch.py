@@ -0,0 +1,82 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+import instrumentation
+from batch import find_files, process_file, run_batch
+from inout import read_gift
+from .test_inout import GIFT
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.in_dir = os.path.join(self.directory, "in")
+        self.out_dir = os.path.join(self.directory, "out")
+        os.makedirs(os.path.join(self.in_dir, "sub"))
+        for name, content in (("a.txt", GIFT), (os.path.join("sub", "b.txt"), GIFT),
+                              ("invalid.txt", GIFT.replace("Question 2.{", "Question 2.")), ("notes.md", "Notes")):
+            with open(os.path.join(self.in_dir, name), "w", encoding="utf8") as f:
+                f.write(content)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_find_files(self):
+        self.assertEqual([os.path.join(self.in_dir, name) for name in ("a.txt", "invalid.txt", "sub/b.txt")],
+                         find_files(self.in_dir))
+        self.assertEqual([os.path.join(self.in_dir, "notes.md")], find_files(self.in_dir, "*.md"))
+    
+    def test_process_file(self):
+        file = os.path.join(self.in_dir, "a.txt")
+        self.assertEqual((file, 3, None), process_file(file))
+        out_file = os.path.join(self.out_dir, "a.txt")
+        self.assertEqual((file, 3, None), process_file(file, out_file))
+        self.assertEqual(list(read_gift(file)), list(read_gift(out_file)))
+        # normalization: pristine questions are converted as well (e.g., "[html]" is added)
+        with open(out_file, encoding="utf8") as f:
+            self.assertIn("[html]Question 2.", f.read())
+    
+    def test_invalid_file(self):
+        file = os.path.join(self.in_dir, "invalid.txt")
+        out_file = os.path.join(self.out_dir, "invalid.txt")
+        _, n_questions, error = process_file(file, out_file)
+        self.assertEqual(0, n_questions)
+        self.assertIsNotNone(error)
+        self.assertFalse(os.path.exists(out_file))
+        _, _, error = process_file(os.path.join(self.in_dir, "missing.txt"))
+        self.assertIsNotNone(error)
+    
+    def test_run_batch(self):
+        summary = run_batch(self.in_dir, jobs=1)
+        self.assertEqual(3, summary.n_files)
+        self.assertEqual(6, summary.n_questions)
+        self.assertEqual([os.path.join(self.in_dir, "invalid.txt")], [file for file, _ in summary.errors])
+        self.assertFalse(os.path.exists(self.out_dir))
+    
+    def test_run_batch_out_dir(self):
+        # the output files keep their paths relative to the input directory, where invalid files are not written
+        summary = run_batch(self.in_dir, self.out_dir, jobs=2)
+        self.assertEqual(1, len(summary.errors))
+        self.assertEqual([os.path.join(self.out_dir, name) for name in ("a.txt", "sub/b.txt")],
+                         find_files(self.out_dir))
+        self.assertEqual(list(read_gift(os.path.join(self.in_dir, "sub", "b.txt"))),
+                         list(read_gift(os.path.join(self.out_dir, "sub", "b.txt"))))
+        self.assertIn("3 files (1 with errors), 6 questions", str(summary))
+    
+    def test_worker_instrumentation(self):
+        # the results of the workers are passed on to this process, even if the workers import all
+        # modules again (spawn), where the instrumentation is only enabled for this test
+        enabled = instrumentation.enabled
+        instrumentation.enabled = True
+        instrumentation.reset()
+        try:
+            run_batch(self.in_dir, jobs=1, mp_context=multiprocessing.get_context("spawn"))
+            timings, _ = instrumentation.snapshot()
+        finally:
+            instrumentation.enabled = enabled
+            instrumentation.reset()
+        self.assertGreaterEqual(timings["Question.from_str"][0], 6)
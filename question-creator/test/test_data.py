@@ -1,4 +1,6 @@
-from creator.data import Category, Question, Answer
+from creator.data import Category, Question, QuestionBank, Answer, escape_special_gift_chars, extract_special_gift_chars
+import random
+import re
 import unittest
 
 
@@ -6,16 +8,22 @@ class TestCategoryMethods(unittest.TestCase):
     
     def test_from_str(self):
         name = "some category name"
-        c = Category.from_str(f"{Category.PATTERN}{name}")
+        c = Category.from_str(f"{Category.COURSE_PATTERN}{name}")
         self.assertEqual(Category(name), c)
     
     def test_from_str_empty(self):
         name = ""
-        c = Category.from_str(f"{Category.PATTERN}{name}")
+        c = Category.from_str(f"{Category.COURSE_PATTERN}{name}")
         self.assertEqual(Category(name), c)
     
     def test_from_str_invalid(self):
         self.assertRaises(ValueError, Category.from_str, "invalid")
+    
+    def test_interning(self):
+        c = Category("some category name")
+        self.assertIs(c, Category("some category name"))
+        self.assertIsNot(c, Category("other category name"))
+        self.assertEqual({c: 1}, {Category("some category name"): 1})
 
 
 class TestQuestionMethods(unittest.TestCase):
@@ -104,6 +112,83 @@ class TestQuestionMethods(unittest.TestCase):
                 mode=Question.MODE_SINGLE
             )
     
+    def test_from_str_answers_on_one_line(self):
+        self.assertEqualQuestion(
+            question=Question.from_str("Question text.{=Correct ~Incorrect ~Incorrect}"),
+            category=None,
+            title="",
+            text="Question text.",
+            answers=[Answer("Correct", True), Answer("Incorrect", False), Answer("Incorrect", False)],
+            mode=Question.MODE_SINGLE
+        )
+    
+    def test_from_str_title_html_multi(self):
+        s = r"""::Some title::[html]Is 1 \= 1 \{really\}?{
+    ~%50%Yes\: it is
+    ~%50%a \~ b
+    ~%-100%No
+}"""
+        self.assertEqualQuestion(
+            question=Question.from_str(s),
+            category=None,
+            title="Some title",
+            text="Is 1 = 1 {really}?",
+            answers=[Answer("Yes: it is", True), Answer("a ~ b", True), Answer("No", False)],
+            mode=Question.MODE_MULTI
+        )
+    
+    def test_from_str_invalid(self):
+        strings = [
+            "No braces.",
+            "Missing closing brace.{=Correct ~Incorrect",
+            "Two {opening braces.{=Correct ~Incorrect}",
+            "Two closing braces.{=Correct ~Incorrect}}",
+            "Text before answer.{Correct ~Incorrect}",
+            "Mixed modes.{=Correct ~%-100%Incorrect}",
+        ]
+        for s in strings:
+            self.assertRaises(ValueError, Question.from_str, s)
+    
+    def test_to_gift_format_cache(self):
+        q = Question.from_str("Question text.{=Correct ~Incorrect}")
+        gift = q.to_gift_format()
+        self.assertIs(gift, q.to_gift_format())
+        # setting equal values does not invalidate the cached GIFT format
+        q.text = "Question text."
+        q.answers = [Answer("Correct", True), Answer("Incorrect", False)]
+        self.assertIs(gift, q.to_gift_format())
+        q.answers[1].text = "Changed"
+        self.assertIn("~Changed", q.to_gift_format())
+        q.mode = Question.MODE_MULTI
+        self.assertIn("~%-100%Changed", q.to_gift_format())
+        q.title = "Title"
+        self.assertTrue(q.to_gift_format().startswith("::Title::"))
+    
+    def test_pristine(self):
+        s = "::Title::Question   text.{\n=Correct\n~Incorrect\n}\n"
+        q = Question.from_str(s)
+        self.assertTrue(q.pristine)
+        self.assertEqual(s.rstrip("\n"), q.source)
+        # setting equal values or the category does not change the question itself
+        q.text = "Question   text."
+        q.category = Category("category")
+        self.assertTrue(q.copy().pristine)
+        q.answers[0].correct = False
+        self.assertFalse(q.pristine)
+        self.assertIsNone(q.source)
+        self.assertFalse(Question(text="Text", answers=[Answer("a", True)], mode=Question.MODE_SINGLE).pristine)
+    
+    def test_copy(self):
+        # changing an answer of the copy only changes the copy
+        q = Question.from_str("Question text.{\n=Correct\n~Incorrect\n}")
+        copy = q.copy()
+        self.assertEqual(q, copy)
+        copy.answers[1].text = "Changed"
+        self.assertTrue(q.pristine)
+        self.assertFalse(copy.pristine)
+        self.assertEqual("Incorrect", q.answers[1].text)
+        self.assertIn("~Changed", copy.to_gift_format())
+    
     def assertEqualQuestion(self, question: Question, category, title, text, answers, mode):
         self.assertEqual(category, question.category)
         self.assertEqual(title, question.title)
@@ -113,3 +198,121 @@ class TestQuestionMethods(unittest.TestCase):
             self.assertEqual(expected_a.text, actual_a.text)
             self.assertEqual(expected_a.correct, actual_a.correct)
         self.assertEqual(mode, question.mode)
+
+
+class TestQuestionBankMethods(unittest.TestCase):
+    
+    @staticmethod
+    def create_question(rng: random.Random):
+        category = rng.choice([None, Category("a"), Category("b")])
+        mode = rng.choice(Question.MODES)
+        return Question(category=category, title=rng.choice(["", "t1", "t2", "t3"]), text="text",
+                        answers=[Answer("correct", True), Answer("incorrect", False)], mode=mode)
+    
+    def test_random_operations(self):
+        rng = random.Random(0)
+        bank = QuestionBank()
+        questions = []
+        for _ in range(1000):
+            op = rng.random()
+            if op < 0.5 or not questions:
+                i = rng.randint(-len(questions) - 1, len(questions) + 1)
+                q = self.create_question(rng)
+                bank.insert(i, q)
+                questions.insert(i, q)
+            elif op < 0.7:
+                i = rng.randrange(len(questions))
+                del bank[i]
+                del questions[i]
+            elif op < 0.85:
+                i = rng.randrange(len(questions))
+                bank[i] = questions[i] = self.create_question(rng)
+            else:
+                i = rng.randrange(len(questions))
+                questions[i].title = rng.choice(["", "t1", "t4"])
+                questions[i].category = rng.choice([None, Category("c")])
+                bank.update(i)
+            self.assertEqualBank(questions, bank)
+    
+    def test_equality(self):
+        rng = random.Random(0)
+        questions = [self.create_question(rng) for _ in range(3)]
+        bank = QuestionBank(questions)
+        self.assertEqual(questions, bank)
+        self.assertEqual(bank, QuestionBank(q.copy() for q in questions))
+        self.assertNotEqual(questions[::-1], bank)
+        self.assertNotEqual(bank, "text")
+    
+    def test_duplicates(self):
+        # questions are identified by their object identity, so the same object cannot be contained twice
+        rng = random.Random(0)
+        question = self.create_question(rng)
+        bank = QuestionBank([question, self.create_question(rng)])
+        self.assertRaises(ValueError, bank.insert, 0, question)
+        self.assertRaises(ValueError, bank.append, question)
+        self.assertRaises(ValueError, bank.__setitem__, 1, question)
+        self.assertRaises(ValueError, QuestionBank, [question, question])
+        bank[0] = question
+        del bank[0]
+        bank.append(question)
+        self.assertEqual(1, bank.position(question))
+    
+    def test_reorder(self):
+        rng = random.Random(0)
+        questions = [self.create_question(rng) for _ in range(100)]
+        bank = QuestionBank(questions)
+        order = list(bank.grouped_positions())
+        bank.reorder(order)
+        questions = [questions[i] for i in order]
+        self.assertEqualBank(questions, bank)
+        # same order as a stable sort by category (without category first)
+        self.assertEqual(sorted(questions, key=lambda q: "" if q.category is None else q.category.name), questions)
+        self.assertRaises(ValueError, bank.reorder, [0] * len(bank))
+    
+    def assertEqualBank(self, questions, bank: QuestionBank):
+        self.assertEqual(questions, list(bank))
+        for category in [None, Category("a"), Category("b"), Category("c")]:
+            self.assertEqual([i for i, q in enumerate(questions) if q.category == category],
+                             bank.positions_by_category(category))
+        for title in ["", "t1", "t2", "t3", "t4"]:
+            self.assertEqual([i for i, q in enumerate(questions) if q.title == title], bank.positions_by_title(title))
+        for mode in Question.MODES:
+            self.assertEqual([i for i, q in enumerate(questions) if q.mode == mode], bank.positions_by_mode(mode))
+        for i, q in enumerate(questions):
+            self.assertEqual(i, bank.position(q))
+
+
+def legacy_handle_special_gift_chars(s: str, escape: bool):
+    # reference implementation (multiple passes) which the current codec must be equivalent to
+    if escape:
+        s = s.replace("\\", "\\\\")
+        s = s.replace("\n", "<br>")
+    else:
+        s = re.sub(r"(?<!\\)\\n", "\n", s)
+        s = s.replace("<br>", "\n")
+        s = s.replace("\\\\", "\\")
+    for c in {"~", "=", "#", "{", "}", ":"}:
+        if escape:
+            s = s.replace(c, rf"\{c}")
+        else:
+            s = s.replace(rf"\{c}", c)
+    return s
+
+
+class TestSpecialGiftChars(unittest.TestCase):
+    
+    def test_fuzzed_round_trip(self):
+        rng = random.Random(0)
+        alphabet = ["a", "n", " ", "\\", "\n", "<br>", "<", ">", "~", "=", "#", "{", "}", ":"]
+        for _ in range(20000):
+            s = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+            escaped = escape_special_gift_chars(s)
+            self.assertEqual(legacy_handle_special_gift_chars(s, True), escaped)
+            self.assertEqual(legacy_handle_special_gift_chars(escaped, False), extract_special_gift_chars(escaped))
+            if "<br>" not in s:
+                self.assertEqual(s, extract_special_gift_chars(escaped))
+    
+    def test_escaped_backslash(self):
+        # an escaped backslash followed by "n" is not an escaped newline character
+        self.assertEqual("\\n:", extract_special_gift_chars("\\\\n\\:"))
+        self.assertEqual("\\\n", extract_special_gift_chars("\\\\\\n"))
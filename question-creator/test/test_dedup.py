@@ -0,0 +1,83 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+import instrumentation
+from data import Answer, Question
+from dedup import DuplicateFinder, content_key, find_duplicates, shingles, signature, similarity, unique
+from inout import parse_gift, write_gift
+from .test_inout import GIFT
+
+TEXT = ("Which of the following statements about the time complexity of binary search on a sorted array "
+        "with n elements is correct, assuming that comparisons take constant time?")
+
+
+def question(text: str, answers=(("Logarithmic", True), ("Linear", False), ("Quadratic", False))) -> Question:
+    return Question(None, None, text, [Answer(a, correct) for a, correct in answers], Question.MODE_SINGLE)
+
+
+class TestDedup(unittest.TestCase):
+
+    def test_content_key(self):
+        q = question(TEXT)
+        # formatting, case, HTML and the order of the answers do not matter
+        same = question(f"<p>{TEXT.upper()}</p>", (("Quadratic", False), ("linear", False), ("Logarithmic", True)))
+        same.title = "Title"
+        self.assertEqual(content_key(q), content_key(same))
+        self.assertNotEqual(content_key(q), content_key(question(TEXT + " Explain.")))
+        self.assertNotEqual(content_key(q), content_key(question(TEXT, (("Logarithmic", False), ("Linear", True)))))
+    
+    def test_similarity(self):
+        sig = signature(shingles(question(TEXT)))
+        similar = signature(shingles(question(TEXT.replace("correct", "true"))))
+        different = signature(shingles(question("What is the capital of France?", (("Paris", True),))))
+        self.assertEqual(1.0, similarity(sig, sig))
+        self.assertGreater(similarity(sig, similar), 0.6)
+        self.assertLess(similarity(sig, different), 0.2)
+    
+    def test_finder(self):
+        finder = DuplicateFinder(threshold=0.6)
+        finder.add_question("a", question(TEXT))
+        finder.add_question("b", question("What is the capital of France?", (("Paris", True),)))
+        finder.add_question("c", question(TEXT.lower()))
+        finder.add_question("d", question(TEXT.replace("correct", "true")))
+        self.assertEqual([["a", "c"]], finder.exact_duplicates())
+        self.assertEqual([("a", "d")], [(a, b) for a, b, _ in finder.near_duplicates()])
+    
+    def test_unique(self):
+        questions = list(parse_gift(io.StringIO(GIFT)))
+        self.assertEqual(questions, list(unique(questions + [q.copy() for q in questions])))
+    
+    def test_find_duplicates(self):
+        questions = list(parse_gift(io.StringIO(GIFT)))
+        with tempfile.TemporaryDirectory() as directory:
+            files = [os.path.join(directory, name) for name in ("a.txt", "b.txt")]
+            write_gift(files[0], questions)
+            write_gift(files[1], questions[:1] + questions, drop_duplicates=True)
+            with open(files[1], encoding="utf8") as f:
+                self.assertEqual(questions, list(parse_gift(f)))
+            report = find_duplicates(files, jobs=1)
+        self.assertEqual(2 * len(questions), report["n_questions"])
+        self.assertEqual(len(questions), len(report["exact_duplicates"]))
+        self.assertEqual([files[0], files[1]], [location["file"] for location in report["exact_duplicates"][0]])
+        self.assertEqual([], report["errors"])
+    
+    def test_find_duplicates_instrumentation(self):
+        # the results of the workers are passed on to this process (same as for batch.run_batch)
+        enabled = instrumentation.enabled
+        instrumentation.enabled = True
+        instrumentation.reset()
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                file = os.path.join(directory, "a.txt")
+                with open(file, "w", encoding="utf8") as f:
+                    f.write(GIFT)
+                report = find_duplicates([file, file], jobs=1, mp_context=multiprocessing.get_context("spawn"))
+            timings, _ = instrumentation.snapshot()
+        finally:
+            instrumentation.enabled = enabled
+            instrumentation.reset()
+        self.assertEqual(6, report["n_questions"])
+        self.assertEqual(6, timings["Question.from_str"][0])
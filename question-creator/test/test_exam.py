@@ -0,0 +1,74 @@
+import multiprocessing
+import shutil
+import tempfile
+import unittest
+
+import instrumentation
+from data import Answer, Category, Question, QuestionBank
+from exam import ExamBuilder, write_variants
+from inout import read_gift
+
+
+def create_bank(n_categories: int = 3, n_questions: int = 20) -> QuestionBank:
+    return QuestionBank(Question(Category(f"category {c}"), f"Question {c}.{i}", f"Question {i}.",
+                                 [Answer(f"answer {j}", j == 0) for j in range(4)], Question.MODE_SINGLE)
+                        for c in range(n_categories) for i in range(n_questions))
+
+
+class TestExam(unittest.TestCase):
+    
+    def setUp(self):
+        self.bank = create_bank()
+        self.counts = {Category("category 0"): 2, Category("category 2"): 3}
+    
+    def test_variant(self):
+        builder = ExamBuilder(self.bank, self.counts, seed=1)
+        variant = builder.variant(0)
+        self.assertEqual([Category("category 0")] * 2 + [Category("category 2")] * 3, [q.category for q in variant])
+        self.assertEqual(5, len({q.title for q in variant}))
+        # reproducible, but different variants differ (at least for some variants)
+        self.assertEqual(variant, ExamBuilder(self.bank, self.counts, seed=1).variant(0))
+        self.assertTrue(any(builder.variant(i) != variant for i in range(1, 5)))
+        self.assertNotEqual(variant, ExamBuilder(self.bank, self.counts, seed=2).variant(0))
+    
+    def test_shuffle_answers(self):
+        variant = ExamBuilder(self.bank, self.counts, seed=1, shuffle_answers=True).variant(0)
+        original = self.bank[self.bank.position_by_title(variant[0].title)]
+        self.assertCountEqual([(a.text, a.correct) for a in original.answers],
+                              [(a.text, a.correct) for a in variant[0].answers])
+        # the questions of the bank are not changed
+        self.assertEqual([f"answer {j}" for j in range(4)], [a.text for a in original.answers])
+        self.assertIs(original, original.answers[0]._question)
+    
+    def test_too_few_questions(self):
+        self.assertRaises(ValueError, ExamBuilder, self.bank, {Category("category 0"): 21})
+        self.assertRaises(ValueError, ExamBuilder, self.bank, {Category("unknown"): 1})
+    
+    def test_write_variants(self):
+        directory = tempfile.mkdtemp()
+        try:
+            files = write_variants(self.bank, directory, 12, self.counts, seed=1, shuffle_answers=True, jobs=2)
+            self.assertEqual(12, len(files))
+            self.assertEqual(sorted(files), files)
+            builder = ExamBuilder(self.bank, self.counts, seed=1, shuffle_answers=True)
+            self.assertEqual(builder.variant(11), list(read_gift(files[11])))
+        finally:
+            shutil.rmtree(directory)
+    
+    def test_write_variants_instrumentation(self):
+        # the results of the workers are passed on to this process (same as for batch.run_batch),
+        # where the bank is only loaded by the workers once the instrumentation is enabled
+        enabled = instrumentation.enabled
+        instrumentation.enabled = True
+        instrumentation.reset()
+        directory = tempfile.mkdtemp()
+        try:
+            files = write_variants(self.bank, directory, 3, self.counts, seed=1, jobs=1,
+                                   mp_context=multiprocessing.get_context("spawn"))
+            timings, _ = instrumentation.snapshot()
+            self.assertEqual(ExamBuilder(self.bank, self.counts, seed=1).variant(2), list(read_gift(files[2])))
+        finally:
+            instrumentation.enabled = enabled
+            instrumentation.reset()
+            shutil.rmtree(directory)
+        self.assertEqual(3, timings["inout.write_gift"][0])
@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from cache import ParseCache
+from data import Category, QuestionBank
+from inout import iter_blocks, iter_gift, read_gift, write_gift
+
+GIFT = """$CATEGORY: $course$/top/first
+
+::Title 1::[html]Question 1.{
+	=Correct
+	~Incorrect
+}
+
+
+Question 2.{
+	~%50%Correct
+	~%50%Correct
+	~%-100%Incorrect
+}
+
+$CATEGORY: $module$/top/second
+
+Question 3.{
+	=Correct
+	~Incorrect
+}
+"""
+
+
+class TestInOutMethods(unittest.TestCase):
+    
+    def setUp(self):
+        fd, self.file = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(fd, "w", encoding="utf8") as f:
+            f.write(GIFT)
+    
+    def tearDown(self):
+        os.remove(self.file)
+    
+    def test_iter_blocks(self):
+        blocks = list(iter_blocks(GIFT.splitlines(keepends=True)))
+        self.assertEqual([1, 3, 9, 15, 17], [line for line, _ in blocks])
+        self.assertEqual("$CATEGORY: $course$/top/first\n", blocks[0][1])
+        self.assertTrue(blocks[-1][1].endswith("}\n"))
+    
+    def test_iter_blocks_whitespace_line(self):
+        # lines with whitespace characters only are not block separators
+        blocks = list(iter_blocks(["a\n", "  \n", "b\n", "\n", "\n", "c"]))
+        self.assertEqual([(1, "a\n  \nb\n"), (6, "c")], blocks)
+    
+    def test_iter_gift(self):
+        questions = iter_gift(self.file)
+        self.assertFalse(isinstance(questions, list))
+        questions = list(questions)
+        self.assertEqual(3, len(questions))
+        self.assertEqual(["Title 1", "", ""], [q.title for q in questions])
+        self.assertEqual([Category("first"), Category("first"), Category("second")],
+                         [q.category for q in questions])
+    
+    def test_read_gift(self):
+        questions = read_gift(self.file)
+        self.assertIsInstance(questions, QuestionBank)
+        self.assertEqual(list(iter_gift(self.file)), questions)
+    
+    def test_write_gift(self):
+        questions = read_gift(self.file)
+        write_gift(self.file, reversed(questions))
+        # questions are grouped by their categories but keep their order within a category
+        self.assertEqual([questions[1], questions[0], questions[2]], read_gift(self.file))
+    
+    def test_write_gift_ungrouped(self):
+        questions = read_gift(self.file)
+        write_gift(self.file, (q for q in reversed(questions)), group_categories=False)
+        with open(self.file, encoding="utf8") as f:
+            content = f.read()
+        self.assertEqual(2, content.count("$CATEGORY"))
+        self.assertEqual(questions[::-1], read_gift(self.file))
+    
+    def test_write_gift_verbatim(self):
+        questions = read_gift(self.file)
+        questions[2].text = "Changed question 3."
+        write_gift(self.file, questions)
+        with open(self.file, encoding="utf8") as f:
+            content = f.read()
+        # pristine questions are written as they were read (without "[html]"), changed ones are converted
+        self.assertIn("\n\nQuestion 2.{\n\t~%50%Correct\n", content)
+        self.assertIn("\n\n[html]Changed question 3.{\n", content)
+        self.assertEqual(list(questions), list(read_gift(self.file)))
+        self.assertTrue(all(q.pristine for q in read_gift(self.file)))
+        write_gift(self.file, questions, verbatim=False)
+        with open(self.file, encoding="utf8") as f:
+            self.assertIn("\n\n[html]Question 2.{\n", f.read())
+    
+    def test_write_gift_empty(self):
+        self.assertRaises(ValueError, write_gift, self.file, iter([]))
+        self.assertEqual(read_gift(self.file), list(iter_gift(self.file)))
+
+
+class TestParseCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file = os.path.join(self.directory, "questions.txt")
+        with open(self.file, "w", encoding="utf8") as f:
+            f.write(GIFT)
+        self.cache = ParseCache(os.path.join(self.directory, "cache"))
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_read_gift(self):
+        questions = read_gift(self.file)
+        self.assertEqual(questions, self.cache.read_gift(self.file))
+        self.assertEqual(2, len(os.listdir(self.cache.directory)))
+        # cache hit (path key) and cache hit (content key, since the modification time changed)
+        self.assertEqual(questions, self.cache.read_gift(self.file))
+        os.utime(self.file, ns=(0, 0))
+        self.assertEqual(questions, self.cache.read_gift(self.file))
+        self.assertEqual(3, len(os.listdir(self.cache.directory)))
+        # the sources are cached as well, so cached questions are still pristine
+        self.assertEqual([q.source for q in questions], [q.source for q in self.cache.read_gift(self.file)])
+    
+    def test_changed_file(self):
+        self.cache.read_gift(self.file)
+        with open(self.file, "a", encoding="utf8") as f:
+            f.write("\nQuestion 4.{=Correct ~Incorrect}\n")
+        self.assertEqual(read_gift(self.file), self.cache.read_gift(self.file))
+        self.assertEqual(4, len(self.cache.read_gift(self.file)))
+    
+    def test_corrupt_entry(self):
+        self.cache.read_gift(self.file)
+        for name in os.listdir(self.cache.directory):
+            with open(os.path.join(self.cache.directory, name), "wb") as f:
+                f.write(b"corrupt")
+        self.assertEqual(read_gift(self.file), self.cache.read_gift(self.file))
+    
+    def test_eviction(self):
+        self.cache.max_bytes = 0
+        self.assertEqual(read_gift(self.file), self.cache.read_gift(self.file))
+        self.assertEqual([], os.listdir(self.cache.directory))
@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data import Answer, Category, Question, QuestionBank
+from inout import read_gift, write_gift
+from journal import Journal, journal_path, read_journal, replay
+from .test_inout import GIFT
+
+
+class TestJournal(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file = os.path.join(self.directory, "questions.txt")
+        with open(self.file, "w", encoding="utf8") as f:
+            f.write(GIFT)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    @staticmethod
+    def _edit(questions, journal):
+        # same edits on the questions and in the journal
+        new = Question(text="New question", answers=[Answer("a", True), Answer("b", False)], mode=Question.MODE_SINGLE)
+        questions.insert(1, new)
+        journal.insert(1, new)
+        del questions[0]
+        journal.remove(0)
+        changed = questions[1].copy()
+        changed.text = "Changed question"
+        questions[1] = changed
+        journal.update(1, changed)
+    
+    def test_replay(self):
+        questions = read_gift(self.file)
+        journal = Journal(self.file)
+        self._edit(questions, journal)
+        journal.close()
+        recovered = read_gift(self.file)
+        replay(read_journal(self.file), recovered)
+        self.assertEqual(list(questions), list(recovered))
+    
+    def test_incomplete_record(self):
+        journal = Journal(self.file)
+        self._edit(read_gift(self.file), journal)
+        journal.close()
+        # crash while writing the last record
+        with open(journal_path(self.file), "a", encoding="utf8") as f:
+            f.write('{"op":"remove",')
+        self.assertEqual(3, len(read_journal(self.file)))
+    
+    def test_other_version(self):
+        journal = Journal(self.file)
+        journal.remove(0)
+        journal.close()
+        with open(self.file, "a", encoding="utf8") as f:
+            f.write("\nQuestion 4.{=Correct ~Incorrect}\n")
+        self.assertRaises(ValueError, read_journal, self.file)
+    
+    def test_save(self):
+        questions = read_gift(self.file)
+        journal = Journal(self.file)
+        journal.remove(0)
+        del questions[0]
+        # records of edits while saving are kept, all others are discarded with the old journal
+        journal.pause()
+        saved = list(questions)
+        questions[0] = saved[0].copy()
+        questions[0].text = "Changed question"
+        journal.update(0, questions[0])
+        write_gift(self.file, saved)
+        journal.resume(self.file)
+        journal.close()
+        records = read_journal(self.file)
+        self.assertEqual(["update"], [r["op"] for r in records])
+        recovered = read_gift(self.file)
+        replay(records, recovered)
+        self.assertEqual(list(questions), list(recovered))
+    
+    def test_grouped_save(self):
+        # the file is saved grouped by category, so the questions are rearranged accordingly
+        # beforehand (see QuestionCreator._group_questions), otherwise, the positions of the
+        # records would not match the saved file
+        questions = QuestionBank(Question(category=Category(name), text=f"Question in {name}",
+                                          answers=[Answer("a", True), Answer("b", False)], mode=Question.MODE_SINGLE)
+                                 for name in ("b", "a"))
+        write_gift(self.file, questions, group_categories=False)
+        journal = Journal(self.file)
+        order = list(questions.grouped_positions())
+        self.assertEqual([1, 0], order)
+        questions.reorder(order)
+        journal.reorder(order)
+        questions[1] = questions[1].copy()
+        questions[1].text = "Changed question"
+        journal.update(1, questions[1])
+        # recovered from the journal if saving fails
+        journal.sync()
+        recovered = read_gift(self.file)
+        replay(read_journal(self.file), recovered)
+        self.assertEqual(list(questions), list(recovered))
+        # otherwise, the journal starts over with the saved file (in the same order)
+        journal.pause()
+        write_gift(self.file, [q.copy() for q in questions], group_categories=False)
+        journal.resume(self.file)
+        questions[0] = questions[0].copy()
+        questions[0].text = "Other changed question"
+        journal.update(0, questions[0])
+        journal.close()
+        recovered = read_gift(self.file)
+        replay(read_journal(self.file), recovered)
+        self.assertEqual([("a", "Other changed question"), ("b", "Changed question")],
+                         [(q.category.name, q.text) for q in recovered])
+        self.assertEqual(list(questions), list(recovered))
+        with open(journal_path(self.file), "a", encoding="utf8") as f:
+            f.write('{"op":"reorder","order":[0,0]}\n')
+        self.assertRaises(ValueError, replay, read_journal(self.file), read_gift(self.file))
+    
+    def test_unwritable(self):
+        # the journal cannot be created (here, since there is a directory at its path), so it is
+        # disabled once, and further records are dropped
+        os.mkdir(journal_path(self.file))
+        errors = []
+        journal = Journal(self.file, on_error=errors.append)
+        journal.remove(0)
+        journal.remove(0)
+        journal.sync()
+        self.assertEqual(1, len(errors))
+        self.assertIsInstance(errors[0], OSError)
+        self.assertEqual([], journal._lines)
+        journal.close()
+    
+    def test_no_file(self):
+        journal = Journal()
+        journal.remove(0)
+        journal.sync()
+        journal.discard()
+        self.assertEqual(["questions.txt"], os.listdir(self.directory))
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data import Answer, Question
+from inout import read_gift
+from lazy import LazyQuestionBank
+from .test_inout import GIFT
+
+
+class TestLazyQuestionBank(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file = os.path.join(self.directory, "questions.txt")
+        self._write(GIFT)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def _write(self, content: str, newline=None):
+        with open(self.file, "w", encoding="utf8", newline=newline) as f:
+            f.write(content)
+    
+    def test_questions(self):
+        bank = LazyQuestionBank(self.file)
+        self.assertEqual(3, len(bank))
+        self.assertFalse(bank.is_parsed(1))
+        self.assertEqual(list(read_gift(self.file)), list(bank))
+        self.assertTrue(bank.is_parsed(1))
+    
+    def test_crlf(self):
+        self._write(GIFT, newline="\r\n")
+        self.assertEqual(list(read_gift(self.file)), list(LazyQuestionBank(self.file)))
+    
+    def test_invalid_question(self):
+        self._write(GIFT + "\nInvalid question.\n")
+        bank = LazyQuestionBank(self.file)
+        # only detected when accessing the question
+        self.assertEqual(4, len(bank))
+        self.assertRaises(ValueError, bank.__getitem__, 3)
+    
+    def test_write_untouched(self):
+        bank = LazyQuestionBank(self.file)
+        bank[0]
+        bank.write(self.file)
+        with open(self.file, encoding="utf8") as f:
+            content = f.read()
+        # the original blocks are written (e.g., "Question 2." without "[html]")
+        self.assertIn("\n\nQuestion 2.{\n", content)
+        self.assertEqual(list(LazyQuestionBank(self.file)), list(bank))
+    
+    def test_write_modified(self):
+        bank = LazyQuestionBank(self.file)
+        bank[1].text = "Changed question 2."
+        del bank[0]
+        bank.insert(0, Question(text="New question", answers=[Answer("a", True)], mode=Question.MODE_SINGLE))
+        self.assertFalse(bank.is_untouched(0))
+        self.assertFalse(bank.is_untouched(1))
+        self.assertTrue(bank.is_untouched(2))
+        copy = bank.copy()
+        copy.write(self.file, group_categories=False)
+        self.assertEqual(list(bank), list(read_gift(self.file)))
+    
+    def test_reorder(self):
+        bank = LazyQuestionBank(self.file)
+        bank[2].text = "Changed question 3."
+        bank.reorder([2, 0, 1])
+        self.assertEqual(["Changed question 3.", "Question 1.", "Question 2."], [q.text for q in bank])
+        self.assertTrue(bank.is_untouched(1))
+        self.assertEqual(0, bank.position(bank[0]))
+        self.assertIsNone(bank.position(Question(text="Other question", answers=[Answer("a", True)],
+                                                 mode=Question.MODE_SINGLE)))
+        bank.write(self.file, group_categories=False)
+        self.assertEqual(list(bank), list(read_gift(self.file)))
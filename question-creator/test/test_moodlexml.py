@@ -0,0 +1,57 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from data import Answer, Category, Question
+from inout import parse_gift, read_gift
+from moodlexml import convert, iter_xml, read_xml, write_xml
+from .test_inout import GIFT
+
+
+class TestMoodleXml(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file = os.path.join(self.directory, "questions.xml")
+        self.questions = list(parse_gift(io.StringIO(GIFT)))
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_write_read(self):
+        self.questions[0].text = "<b>Special</b> characters: & \" ' ü"
+        write_xml(self.file, iter(self.questions))
+        with open(self.file, encoding="utf8") as f:
+            content = f.read()
+        self.assertEqual(2, content.count('<question type="category">'))
+        self.assertIn("<single>false</single>", content)
+        self.assertIn('<answer fraction="-100" format="html"><text>Incorrect</text></answer>', content)
+        self.assertEqual(self.questions, list(read_xml(self.file)))
+    
+    def test_fractions(self):
+        q = Question(Category("first"), "", "Question", [Answer("a", True), Answer("b", True), Answer("c", True),
+                                                          Answer("d", False)], Question.MODE_MULTI)
+        write_xml(self.file, [q])
+        with open(self.file, encoding="utf8") as f:
+            content = f.read()
+        self.assertEqual(3, content.count('fraction="33.33333"'))
+        self.assertEqual([q], list(iter_xml(self.file)))
+    
+    def test_invalid(self):
+        with open(self.file, "w", encoding="utf8") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<quiz><question type="essay"></question></quiz>\n')
+        self.assertRaises(ValueError, list, iter_xml(self.file))
+        with open(self.file, "w", encoding="utf8") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<quiz><question type="category">\n')
+        self.assertRaises(ValueError, list, iter_xml(self.file))
+    
+    def test_convert(self):
+        gift_file = os.path.join(self.directory, "questions.txt")
+        with open(gift_file, "w", encoding="utf8") as f:
+            f.write(GIFT)
+        convert(gift_file, self.file)
+        os.remove(gift_file)
+        convert(self.file, gift_file)
+        self.assertEqual(self.questions, list(read_gift(gift_file)))
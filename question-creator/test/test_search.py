@@ -0,0 +1,49 @@
+import unittest
+
+from data import Answer, Question
+from search import SearchIndex, tokenize
+
+
+def create_question(title, text, *answers):
+    return Question(title=title, text=text, answers=[Answer(a, i == 0) for i, a in enumerate(answers)],
+                    mode=Question.MODE_SINGLE)
+
+
+class TestSearchIndexMethods(unittest.TestCase):
+    
+    def setUp(self):
+        self.questions = [
+            create_question("Loops", "What does a <b>for</b> loop do?", "Iterates", "Nothing"),
+            create_question("", "What is a variable?", "A named value", "A loop"),
+            create_question("Functions", "What does a function return?", "A value", "Nothing at all"),
+        ]
+        self.index = SearchIndex(self.questions)
+    
+    def search(self, query, prefix=True):
+        return [self.questions.index(q) for q in self.index.search(query, prefix)]
+    
+    def test_tokenize(self):
+        self.assertEqual({"what", "does", "a", "for", "loop", "do"}, tokenize("What does a <b>for</b> loop do?"))
+    
+    def test_search(self):
+        self.assertEqual([0, 1], sorted(self.search("loop")))
+        self.assertEqual([1, 2], sorted(self.search("value")))
+        self.assertEqual([0], self.search("loop iterates"))
+        self.assertEqual([], self.search("loop function"))
+        self.assertEqual([], self.search("b"))  # HTML tags are not indexed
+        self.assertEqual([], self.search(""))
+    
+    def test_search_prefix(self):
+        self.assertEqual([0, 1, 2], sorted(self.search("wha")))
+        self.assertEqual([2], self.search("func noth"))
+        self.assertEqual([], self.search("wha", prefix=False))
+    
+    def test_update(self):
+        self.questions[1].text = "What is a constant?"
+        self.index.update(self.questions[1])
+        self.assertEqual([], self.search("variable"))
+        self.assertEqual([1], self.search("const"))
+        self.index.remove(self.questions[0])
+        self.assertEqual([1], self.search("loop"))
+        self.index.add(self.questions[0])
+        self.assertEqual([0, 1], sorted(self.search("loop")))
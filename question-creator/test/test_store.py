@@ -0,0 +1,106 @@
+import gc
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from data import Answer, Category, Question
+from inout import parse_gift, read_gift
+from store import QuestionStore, convert, export_gift, import_questions, iter_questions
+from .test_inout import GIFT
+
+
+class TestQuestionStore(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file = os.path.join(self.directory, "questions.sqlite")
+        self.questions = list(parse_gift(io.StringIO(GIFT)))
+        import_questions(self.file, iter(self.questions), batch_size=2)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_import(self):
+        self.assertEqual(self.questions, list(iter_questions(self.file)))
+        # the sources are stored as well, so unchanged questions are still written as they were read
+        self.assertEqual([q.source for q in self.questions], [q.source for q in iter_questions(self.file)])
+        # questions are appended
+        self.assertEqual(3, import_questions(self.file, self.questions))
+        self.assertEqual(self.questions * 2, list(iter_questions(self.file, group_categories=False)))
+    
+    def test_paging(self):
+        store = QuestionStore(self.file, page_size=2)
+        self.assertEqual(3, len(store))
+        self.assertEqual(self.questions[2], store[-1])
+        self.assertIs(store[2], store[-1])
+        self.assertEqual(self.questions, list(store))
+        self.assertEqual(1, store.position(store[1]))
+        store.close()
+    
+    def test_cache(self):
+        # only the questions of the most recently used page are kept, unless they are used elsewhere
+        # (questions reference themselves via their answers, so they are released by the garbage collector)
+        store = QuestionStore(self.file, page_size=1, max_pages=1)
+        first = store[0]
+        self.assertEqual(self.questions[1:], [store[1], store[2]])
+        gc.collect()
+        self.assertEqual(1, len(store._questions))
+        self.assertEqual(2, len(store._row_ids))
+        self.assertIs(first, store[0])
+        first.text = "Changed question 1."
+        store[2]
+        store.update(0)
+        del first
+        store[1]
+        gc.collect()
+        self.assertEqual(1, len(store._row_ids))
+        store.close()
+        self.assertEqual("Changed question 1.", QuestionStore(self.file)[0].text)
+    
+    def test_edits(self):
+        store = QuestionStore(self.file)
+        store[1].text = "Changed question 2."
+        store[1].category = Category("second")
+        store.update(1)
+        store.insert(1, Question(None, "", "New question.", [Answer("a", True)], Question.MODE_SINGLE))
+        store.insert(1, Question(None, "", "Newer question.", [Answer("b", True)], Question.MODE_SINGLE))
+        del store[0]
+        store[-1] = Question(Category("first"), "", "Replaced.", [Answer("c", False), Answer("d", True)],
+                             Question.MODE_MULTI)
+        expected = list(store)
+        store.close()
+        # all changes were committed immediately
+        store = QuestionStore(self.file)
+        self.assertEqual(expected, list(store))
+        self.assertEqual(["Newer question.", "New question.", "Changed question 2.", "Replaced."],
+                         [q.text for q in store])
+        self.assertFalse(store[2].pristine)
+        store.close()
+    
+    def test_renumber(self):
+        store = QuestionStore(self.file)
+        # repeatedly inserting at the same index exhausts the precision of the positions
+        for i in range(100):
+            store.insert(1, Question(None, "", f"Question {i}", [Answer("a", True)], Question.MODE_SINGLE))
+        expected = [q.text for q in store]
+        store.close()
+        self.assertEqual(expected, [q.text for q in iter_questions(self.file, group_categories=False)])
+    
+    def test_export(self):
+        gift_file = os.path.join(self.directory, "questions.txt")
+        export_gift(self.file, gift_file)
+        self.assertEqual(self.questions, list(read_gift(gift_file)))
+        store_file = os.path.join(self.directory, "copy.sqlite")
+        convert(gift_file, store_file)
+        self.assertEqual(self.questions, list(iter_questions(store_file)))
+    
+    def test_missing_store(self):
+        # stores are only read, so missing stores are not created
+        missing = os.path.join(self.directory, "missing.sqlite")
+        for target in ("questions.txt", "copy.sqlite"):
+            target = os.path.join(self.directory, target)
+            self.assertRaises(ValueError, convert, missing, target)
+            self.assertFalse(os.path.exists(target))
+        self.assertFalse(os.path.exists(missing))
@@ -0,0 +1,75 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+import instrumentation
+from data import Answer, Question
+from inout import iter_blocks
+from validation import lint, validate_blocks, validate_question
+from .test_inout import GIFT
+
+INVALID_GIFT = """$CATEGORY: $course$/top/first
+
+::Title::Question 1.{
+	=Correct
+	~Incorrect
+}
+
+::Title::Question 2.{
+	=Correct
+	=Correct
+}
+
+Question 3.{
+	~%50%Correct
+	=Correct
+}
+
+Question 4 } {
+	=Correct
+}
+
+{
+	=Correct
+	~
+}
+"""
+
+
+class TestValidation(unittest.TestCase):
+    
+    def test_valid(self):
+        self.assertEqual([], validate_blocks(iter_blocks(io.StringIO(GIFT))))
+    
+    def test_collect_all(self):
+        issues = validate_blocks(iter_blocks(io.StringIO(INVALID_GIFT)), "file.txt")
+        self.assertEqual([("single-correct", 2, 8), ("duplicate-title", 2, 8), ("answers", 3, 13), ("braces", 4, 18),
+                          ("empty-text", 5, 22), ("empty-answer", 5, 22)],
+                         [(issue.rule, issue.block, issue.line) for issue in issues])
+        self.assertTrue(all(issue.file == "file.txt" for issue in issues))
+    
+    def test_question(self):
+        self.assertRaises(ValueError, Question, text="", answers=[Answer("a", True)])
+        question = Question(text="", answers=[Answer("a", True), Answer("b", True)], mode=Question.MODE_SINGLE,
+                            validate=False)
+        self.assertEqual(["empty-text", "single-correct"], [issue.rule for issue in validate_question(question)])
+    
+    def test_lint_instrumentation(self):
+        # the results of the workers are passed on to this process (same as for batch.run_batch)
+        enabled = instrumentation.enabled
+        instrumentation.enabled = True
+        instrumentation.reset()
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                file = os.path.join(directory, "questions.txt")
+                with open(file, "w", encoding="utf8") as f:
+                    f.write(INVALID_GIFT)
+                report = lint([file], jobs=1, mp_context=multiprocessing.get_context("spawn"))
+            timings, _ = instrumentation.snapshot()
+        finally:
+            instrumentation.enabled = enabled
+            instrumentation.reset()
+        self.assertGreater(report["n_issues"], 0)
+        self.assertGreaterEqual(timings["Question.from_str"][0], 3)
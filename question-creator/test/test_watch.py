@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data import Answer, Question
+from inout import read_gift, write_gift
+from watch import FileWatcher
+from .test_inout import GIFT
+
+
+class TestWatch(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file = os.path.join(self.directory, "questions.txt")
+        self._write(GIFT)
+        self.questions = list(read_gift(self.file))
+        self.watcher = FileWatcher(self.file, self.questions)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def _write(self, content: str):
+        with open(self.file, "w", encoding="utf8") as f:
+            f.write(content)
+        # a different modification time, even if the file system has a coarse resolution
+        stat = os.stat(self.file)
+        os.utime(self.file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    
+    def test_changed(self):
+        self.assertFalse(self.watcher.changed())
+        self._write(GIFT.replace("Question 2.", "Question two."))
+        # only reported once the file did not change anymore since the previous call
+        self.assertFalse(self.watcher.changed())
+        self.assertTrue(self.watcher.changed())
+        self.watcher.merge(self.questions)
+        self.assertFalse(self.watcher.changed())
+    
+    def test_unchanged(self):
+        self._write(GIFT)
+        merge = self.watcher.merge(self.questions)
+        self.assertFalse(merge.changed)
+        self.assertEqual(0, merge.n_parsed)
+        self.assertEqual(self.questions, merge.questions)
+    
+    def test_merge(self):
+        self._write(GIFT.replace("Question 2.", "Question two.") + "\nQuestion 4.{\n\t=Correct\n\t~Incorrect\n}\n")
+        merge = self.watcher.merge(self.questions)
+        # only the changed and the new block are parsed, the other questions are kept as they are
+        self.assertTrue(merge.changed)
+        self.assertEqual(2, merge.n_parsed)
+        self.assertEqual(4, len(merge.questions))
+        self.assertIs(self.questions[0], merge.questions[0])
+        self.assertIs(self.questions[2], merge.questions[2])
+        self.assertEqual("Question two.", merge.questions[1].text)
+        self.assertEqual("Question 4.", merge.questions[3].text)
+        self.assertEqual("second", merge.questions[3].category.name)
+        self.assertEqual(1, merge.position(self.questions[1]))
+        self.assertEqual([], merge.modified)
+        self.assertEqual([], merge.removed)
+        self.assertEqual([], merge.conflicts)
+    
+    def test_unsaved_changes(self):
+        # edited, inserted and removed questions are kept as they are, unless the file changed them as well
+        self.questions[0].text = "Edited question 1."
+        self.questions[1].text = "Edited question 2."
+        new = Question(text="New question", answers=[Answer("a", True), Answer("b", False)], mode=Question.MODE_SINGLE)
+        self.questions.insert(1, new)
+        del self.questions[3]
+        self._write(GIFT.replace("Question 2.", "Question two.").replace("Question 3.", "Question three."))
+        merge = self.watcher.merge(self.questions)
+        self.assertEqual(["Edited question 1.", "New question", "Edited question 2."],
+                         [q.text for q in merge.questions])
+        self.assertEqual([0, None, 1], merge.origins)
+        self.assertEqual([0, 1, 2], merge.modified)
+        self.assertEqual([2], merge.removed)
+        self.assertEqual(2, len(merge.conflicts))
+        self.assertEqual(0, merge.n_parsed)
+    
+    def test_removed(self):
+        # only removed here, which is an unsaved change even though no question is modified
+        del self.questions[0]
+        self._write(GIFT.replace("Question 3.", "Question three."))
+        merge = self.watcher.merge(self.questions)
+        self.assertEqual(["Question 2.", "Question three."], [q.text for q in merge.questions])
+        self.assertEqual([], merge.modified)
+        self.assertEqual([0], merge.removed)
+        self.assertEqual([], merge.conflicts)
+    
+    def test_saved(self):
+        # after saving, edited questions correspond to their blocks again (even if edited afterwards)
+        self.questions[1].text = "Edited question 2."
+        snapshot = [q.copy() for q in self.questions]
+        write_gift(self.file, snapshot)
+        self.questions[0].text = "Edited question 1."
+        watcher = FileWatcher(self.file, self.questions, snapshot)
+        with open(self.file, encoding="utf8") as f:
+            content = f.read()
+        self._write(content.replace("Question 3.", "Question three."))
+        merge = watcher.merge(self.questions)
+        self.assertEqual(["Edited question 1.", "Edited question 2.", "Question three."],
+                         [q.text for q in merge.questions])
+        self.assertEqual([0], merge.modified)
+        self.assertEqual([], merge.conflicts)
+        self.assertEqual(1, merge.n_parsed)
+    
+    def test_invalid(self):
+        self._write(GIFT.replace("Question 2.{", "Question 2."))
+        with self.assertRaises(ValueError):
+            self.watcher.merge(self.questions)
+        # the base remains unchanged
+        self._write(GIFT.replace("Question 3.", "Question three."))
+        merge = self.watcher.merge(self.questions)
+        self.assertEqual(1, merge.n_parsed)
+        self.assertIs(self.questions[1], merge.questions[1])
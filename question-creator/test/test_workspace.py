@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from data import Category
+from inout import read_gift
+from workspace import Workspace, scan_categories
+from .test_inout import GIFT
+
+OTHER = """$CATEGORY: $course$/top/third
+
+Question 4.{
+	=Correct
+	~Incorrect
+}
+"""
+
+
+class TestWorkspace(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.files = [os.path.join(self.directory, name) for name in ("a.txt", "b.txt", "c.txt")]
+        for file, content in zip(self.files, (GIFT, OTHER, "Question 5.{\n\t=Correct\n\t~Incorrect\n}\n\n" + OTHER)):
+            with open(file, "w", encoding="utf8") as f:
+                f.write(content)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_scan_categories(self):
+        self.assertEqual({Category("first"), Category("second")}, scan_categories(self.files[0]))
+        self.assertEqual({None, Category("third")}, scan_categories(self.files[2]))
+    
+    def test_categories(self):
+        workspace = Workspace(self.directory)
+        self.assertEqual(self.files, workspace.files)
+        # known without parsing any file
+        self.assertEqual({None: [self.files[2]], Category("first"): [self.files[0]],
+                          Category("second"): [self.files[0]], Category("third"): self.files[1:]},
+                         workspace.categories())
+        self.assertFalse(any(workspace.is_loaded(file) for file in self.files))
+    
+    def test_lru(self):
+        # only enough memory for one file, where changed files are never evicted
+        workspace = Workspace(self.directory, max_bytes=1)
+        a = workspace.bank(self.files[0])
+        self.assertEqual(3, len(a))
+        workspace.set_bank(self.files[0], a, changed=True)
+        workspace.bank(self.files[1])
+        workspace.bank(self.files[2])
+        self.assertEqual([True, False, True], [workspace.is_loaded(file) for file in self.files])
+        self.assertIs(a, workspace.bank(self.files[0]))
+        self.assertEqual([self.files[0]], workspace.changed_files())
+    
+    def test_move(self):
+        workspace = Workspace(self.directory)
+        mtime = os.stat(self.files[2]).st_mtime_ns
+        moved = workspace.move(self.files[0], [0, 2], self.files[1])
+        self.assertEqual(["Question 1.", "Question 3."], [q.text for q in moved])
+        self.assertEqual(["Question 2."], [q.text for q in read_gift(self.files[0])])
+        self.assertEqual(["Question 1.", "Question 3.", "Question 4."], [q.text for q in read_gift(self.files[1])])
+        # only the two files are written
+        self.assertEqual(mtime, os.stat(self.files[2]).st_mtime_ns)
+        self.assertEqual([], workspace.changed_files())
+        self.assertEqual([self.files[0], self.files[1]], workspace.categories()[Category("first")])
+        with self.assertRaises(ValueError):
+            workspace.move(self.files[0], [0], self.files[1])
+    
+    def test_move_reorder(self):
+        # the target is written grouped by category, where the questions in memory are rearranged
+        # accordingly (so the positions of their journals match the written file)
+        reorders = []
+        workspace = Workspace(self.directory, on_reorder=lambda file, order: reorders.append((file, order)))
+        workspace.move(self.files[2], [0], self.files[0])
+        self.assertEqual([(self.files[0], [3, 0, 1, 2])], reorders)
+        self.assertEqual(list(read_gift(self.files[0])), list(workspace.bank(self.files[0])))
+        self.assertEqual("Question 5.", workspace.bank(self.files[0])[0].text)